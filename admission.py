@@ -0,0 +1,141 @@
+"""
+Допуск запросов на запись: ограничение частоты по клиенту и сброс нагрузки.
+
+Записи выполняются по одной и занимают потоки того же пула, что и чтения
+(repository.py), поэтому скрипт массовой правки может надолго задержать
+ответы всем остальным. Перед обработчиком записи WriteAdmission проверяет:
+
+- число записей, которые выполняются сейчас: сверх предела новая запись
+  сразу отклоняется (Overloaded → 503), а не ждет в очереди пула;
+- «ведро токенов» клиента: каждая запись тратит токен, токены пополняются
+  с постоянной скоростью до размера всплеска; пустое ведро — RateLimited
+  (→ 429).
+
+В обоих случаях клиент получает, через сколько секунд повторить запрос.
+Все проверки выполняются в цикле событий, поэтому блокировки не нужны.
+
+Место записи занято, пока она выполняется в пуле, а не пока ее ждет
+обработчик: если обработчик ответил по таймауту, а запись еще идет,
+место освобождается по завершении ее future (WriteSlot.hold_until).
+"""
+import asyncio
+import math
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from time import monotonic
+from typing import Iterator, List, Optional
+
+# Через сколько секунд повторить запись, отклоненную из-за перегрузки
+SHED_RETRY_AFTER = 1.0
+# Сколько клиентов помнит ограничитель; давно не писавшие забываются
+MAX_CLIENTS = 10000
+
+
+class AdmissionRejected(Exception):
+    """Запись не допущена; retry_after — через сколько секунд повторить"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Значение заголовка Retry-After (целые секунды, не меньше 1)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RateLimited(AdmissionRejected):
+    """Клиент исчерпал свой лимит записей"""
+
+
+class Overloaded(AdmissionRejected):
+    """Сервер уже выполняет предельное число записей"""
+
+
+class TokenBuckets:
+    """Ведра токенов по клиентам: rate токенов в секунду, не больше burst"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        # клиент -> [токены, время последнего пополнения]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, client: str) -> float:
+        """Взять токен; 0, если он был, иначе через сколько секунд он появится"""
+        now = monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [self.burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+
+class WriteSlot:
+    """Место допущенной записи"""
+
+    def __init__(self):
+        # Запись, которая выполняется и после выхода из admit
+        self.pending: Optional[Future] = None
+
+    def hold_until(self, pending: Future) -> None:
+        """Не освобождать место до завершения pending (запись еще выполняется)"""
+        self.pending = pending
+
+
+class WriteAdmission:
+    """
+    Допуск записей: rate записей в секунду на клиента со всплеском до burst
+    (rate 0 — без ограничения) и не больше max_concurrent записей
+    одновременно (0 — без ограничения)
+    """
+
+    def __init__(self, rate: float, burst: float, max_concurrent: int):
+        self.buckets = TokenBuckets(rate, burst) if rate > 0 else None
+        self.max_concurrent = max_concurrent
+        # Записи, которые выполняются сейчас
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    @contextmanager
+    def admit(self, client: str) -> Iterator[WriteSlot]:
+        """
+        Выполнить запись клиента или отклонить ее (AdmissionRejected).
+        Место освобождается при выходе, а если запись продолжает выполняться
+        (WriteSlot.hold_until) — когда она закончится
+        """
+        # Сначала перегрузка: отклоненная по ней запись не тратит токен клиента
+        if self.max_concurrent and self.in_flight >= self.max_concurrent:
+            self.shed += 1
+            raise Overloaded("Сервер перегружен записями, повторите позже", SHED_RETRY_AFTER)
+        if self.buckets is not None:
+            wait = self.buckets.take(client)
+            if wait:
+                self.rate_limited += 1
+                raise RateLimited("Слишком много запросов на запись", wait)
+        self.in_flight += 1
+        slot = WriteSlot()
+        try:
+            yield slot
+        finally:
+            if slot.pending is None:
+                self.in_flight -= 1
+            else:
+                # Освобождение — тоже в цикле событий, а не в потоке пула
+                asyncio.wrap_future(slot.pending).add_done_callback(self._release)
+
+    def _release(self, future: "asyncio.Future") -> None:
+        self.in_flight -= 1
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,413 @@
+"""
+Аналитика графа терминов: PageRank, степени, компоненты связности и
+сообщества.
+
+Граф связей (related_terms между существующими терминами, без повторов и
+петель) представлен разреженной матрицей смежности — массивами NumPy
+номеров начал и концов ребер в порядке строк (CSR). Все алгоритмы —
+векторные операции над этими массивами: O(ребер) на итерацию.
+
+Расчет дорогой, поэтому результат хранится для версии данных, на которой
+посчитан, и после записей пересчитывается в фоновом потоке (с задержкой,
+чтобы серия записей дала один пересчет). Пока новый результат считается,
+запросы получают предыдущий — с его версией. Первый расчет начинается
+сразу после построения индексов (prepare), поэтому первый запрос обычно не
+ждет его целиком; пересчеты после записей включаются только после первого
+запроса аналитики. Сами алгоритмы (_metrics) получают только массивы и
+могут выполняться в другом процессе (runner).
+
+NumPy не обязателен для остального приложения; без него аналитика
+недоступна.
+"""
+import threading
+import time
+from operator import call
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy не обязателен — без него аналитика недоступна
+    np = None
+
+from graph import GraphIndex
+
+# PageRank: вероятность перехода по ссылке, точность (L1) и предел итераций
+DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-10
+PAGERANK_ITERATIONS = 100
+# Распространение меток сообществ: предел итераций и доля узлов,
+# обновляющих метку за итерацию (все сразу — метки могут колебаться)
+COMMUNITY_ITERATIONS = 30
+COMMUNITY_UPDATE_SHARE = 0.5
+# Сколько крупнейших компонент и сообществ перечислять в ответе
+SUMMARY_SIZE = 20
+# Сколько терминов с наибольшим PageRank показывать в описании сообщества
+COMMUNITY_TOP_TERMS = 5
+
+
+# Сколько секунд запрос ждет первого результата, прежде чем получить 503
+FIRST_RESULT_WAIT = 30.0
+
+
+class AnalyticsUnavailable(RuntimeError):
+    """Аналитику нельзя посчитать: не установлен NumPy или первый расчет еще идет"""
+
+
+class AnalyticsResult:
+    """
+    Метрики всех узлов графа одной версии данных.
+
+    Метрики хранятся массивами по строкам (порядок ids); словари ответа
+    собираются по запросу (to_dict).
+    """
+
+    __slots__ = (
+        "version", "graph", "ids", "pagerank", "in_degree", "out_degree",
+        "component", "community", "summary", "elapsed",
+    )
+
+    def __init__(self, version: int, graph: GraphIndex, ids: List[str], pagerank, in_degree, out_degree, component, community):
+        self.version = version
+        # Граф снимка (не меняется) — для названий терминов в ответе
+        self.graph = graph
+        self.ids = ids
+        self.pagerank = pagerank
+        self.in_degree = in_degree
+        self.out_degree = out_degree
+        self.component = component
+        self.community = community
+        # Сводка по компонентам и сообществам (часть ответа)
+        self.summary: Dict[str, Any] = {}
+        # Время расчета, с
+        self.elapsed = 0.0
+
+    def term(self, row: int) -> Dict[str, Any]:
+        """Метрики одного термина"""
+        term_id = self.ids[row]
+        return {
+            "id": term_id,
+            "title": self.graph.nodes[term_id].title,
+            "pagerank": round(float(self.pagerank[row]), 8),
+            "degree": int(self.in_degree[row] + self.out_degree[row]),
+            "in_degree": int(self.in_degree[row]),
+            "out_degree": int(self.out_degree[row]),
+            "component": int(self.component[row]),
+            "community": int(self.community[row]),
+        }
+
+    def to_dict(self, limit: int) -> Dict[str, Any]:
+        """Ответ /api/graph/analytics: сводка и limit терминов с наибольшим PageRank"""
+        top = _top_rows(self.pagerank, limit)
+        return {
+            "version": self.version,
+            **self.summary,
+            "terms": [self.term(row) for row in top.tolist()],
+        }
+
+
+def compute(version: int, graph: GraphIndex, runner: Callable[..., Any] = call) -> AnalyticsResult:
+    """
+    Посчитать метрики графа (вызывается в фоне или при первом запросе);
+    runner(функция, *аргументы) выполняет расчет по массивам
+    """
+    if np is None:
+        raise AnalyticsUnavailable("Для аналитики графа нужен NumPy")
+    started = time.perf_counter()
+    ids = list(graph.nodes)
+    count = len(ids)
+    numbers = np.fromiter(map(graph.symbols.find, ids), dtype=np.int64, count=count)
+    rows = np.full(len(graph.symbols), -1, dtype=np.int64)
+    rows[numbers] = np.arange(count)
+    sources, targets = graph.edge_numbers()
+    src = rows[np.frombuffer(sources, dtype=np.int32)] if len(sources) else np.zeros(0, dtype=np.int64)
+    dst = rows[np.frombuffer(targets, dtype=np.int32)] if len(targets) else np.zeros(0, dtype=np.int64)
+    src, dst, pagerank, in_degree, out_degree, component, community = runner(_metrics, src, dst, count)
+
+    result = AnalyticsResult(version, graph, ids, pagerank, in_degree, out_degree, component, community)
+    result.summary = {
+        "node_count": count,
+        "edge_count": int(len(src)),
+        "components": _component_summary(component),
+        "communities": _community_summary(result, src, dst),
+    }
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _metrics(src, dst, count: int):
+    """Ребра графа без повторов и метрики узлов по ним"""
+    src, dst = _simple_edges(src, dst, count)
+    out_degree = np.bincount(src, minlength=count)
+    in_degree = np.bincount(dst, minlength=count)
+    pagerank = _pagerank(src, dst, out_degree, count)
+    component = _by_size(_components(src, dst, count))
+    community = _by_size(_communities(src, dst, count))
+    return src, dst, pagerank, in_degree, out_degree, component, community
+
+
+def _simple_edges(src, dst, count: int):
+    """Ребра без петель и повторов, упорядоченные по началу (строки CSR)"""
+    keep = src != dst
+    keys = np.unique(src[keep] * max(count, 1) + dst[keep])
+    return keys // max(count, 1), keys % max(count, 1)
+
+
+def _top_rows(values, limit: int):
+    """Строки с наибольшими values (при равенстве — в порядке строк)"""
+    if limit < len(values):
+        candidates = np.argpartition(-values, limit - 1)[:limit]
+        threshold = values[candidates].min()
+        candidates = np.flatnonzero(values >= threshold)
+    else:
+        candidates = np.arange(len(values))
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order][:limit]
+
+
+def _pagerank(src, dst, out_degree, count: int):
+    """PageRank степенным методом; ранг тупиковых узлов делится поровну между всеми"""
+    if count == 0:
+        return np.zeros(0)
+    rank = np.full(count, 1.0 / count)
+    share = np.zeros(count)
+    linked = out_degree > 0
+    for _ in range(PAGERANK_ITERATIONS):
+        share[linked] = rank[linked] / out_degree[linked]
+        dangling = rank[~linked].sum()
+        updated = np.bincount(dst, share[src], count) * DAMPING
+        updated += (1 - DAMPING + DAMPING * dangling) / count
+        delta = np.abs(updated - rank).sum()
+        rank = updated
+        if delta < PAGERANK_TOLERANCE:
+            break
+    return rank
+
+
+def _components(src, dst, count: int):
+    """
+    Компоненты слабой связности: корень каждой вершины — наименьший номер
+    в компоненте. Корни соседних вершин подвешиваются к меньшему из них,
+    затем пути до корней сжимаются — пока ребра соединяют разные корни
+    """
+    parent = np.arange(count)
+    while True:
+        root_src, root_dst = parent[src], parent[dst]
+        split = root_src != root_dst
+        if not split.any():
+            return parent
+        low = np.minimum(root_src[split], root_dst[split])
+        high = np.maximum(root_src[split], root_dst[split])
+        np.minimum.at(parent, high, low)
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+
+def _communities(src, dst, count: int):
+    """
+    Сообщества распространением меток: вершина берет метку, которая чаще
+    всего встречается у ее соседей (связи без учета направления); при
+    равенстве остается своя метка, иначе — наименьшая. За итерацию метки
+    меняет случайная доля вершин, чтобы метки не колебались
+    """
+    labels = np.arange(count)
+    if not len(src):
+        return labels
+    nodes = np.concatenate([src, dst])
+    neighbors = np.concatenate([dst, src])
+    rng = np.random.default_rng(0)
+    for _ in range(COMMUNITY_ITERATIONS):
+        keys, counts = np.unique(nodes * count + labels[neighbors], return_counts=True)
+        node, label = keys // count, keys % count
+        # Своя метка выигрывает при равенстве: удвоенный счет + 1
+        score = counts * 2 + (label == labels[node])
+        # Для каждой вершины — метка с наибольшим счетом (при равенстве — наименьшая)
+        order = np.lexsort((label, -score, node))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = node[order][1:] != node[order][:-1]
+        best_node, best_label = node[order][first], label[order][first]
+        changing = labels[best_node] != best_label
+        if not changing.any():
+            break
+        moving = changing & (rng.random(len(best_node)) < COMMUNITY_UPDATE_SHARE)
+        labels[best_node[moving]] = best_label[moving]
+    return labels
+
+
+def _by_size(labels):
+    """Перенумеровать группы: 0 — самая большая (при равенстве — с меньшей первой вершиной)"""
+    if not len(labels):
+        return labels
+    unique, first, inverse, sizes = np.unique(labels, return_index=True, return_inverse=True, return_counts=True)
+    order = np.lexsort((first, -sizes))
+    rank = np.empty(len(unique), dtype=np.int64)
+    rank[order] = np.arange(len(unique))
+    return rank[inverse]
+
+
+def _component_summary(component) -> Dict[str, Any]:
+    sizes = np.bincount(component) if len(component) else np.zeros(0, dtype=np.int64)
+    return {
+        "count": int(len(sizes)),
+        # Термины без единой связи — «острова» из одного узла
+        "isolated": int((sizes == 1).sum()),
+        "largest": [
+            {"id": index, "size": int(size)}
+            for index, size in enumerate(sizes[:SUMMARY_SIZE].tolist())
+        ],
+    }
+
+
+def _community_summary(result: AnalyticsResult, src, dst) -> Dict[str, Any]:
+    community = result.community
+    if not len(community):
+        return {"count": 0, "modularity": 0.0, "largest": []}
+    sizes = np.bincount(community)
+    largest = []
+    for index, size in enumerate(sizes[:SUMMARY_SIZE].tolist()):
+        members = np.flatnonzero(community == index)
+        top = members[_top_rows(result.pagerank[members], COMMUNITY_TOP_TERMS)]
+        largest.append({"id": index, "size": size, "top_terms": [result.ids[row] for row in top.tolist()]})
+    return {
+        "count": int(len(sizes)),
+        "modularity": round(_modularity(community, src, dst), 6),
+        "largest": largest,
+    }
+
+
+def _modularity(community, src, dst) -> float:
+    """Модулярность разбиения (связи без учета направления)"""
+    if not len(src):
+        return 0.0
+    edges = len(src)
+    inside = np.bincount(community[src[community[src] == community[dst]]], minlength=community.max() + 1)
+    degree = np.bincount(community[src], minlength=community.max() + 1)
+    degree += np.bincount(community[dst], minlength=community.max() + 1)
+    return float((inside / edges - (degree / (2 * edges)) ** 2).sum())
+
+
+class GraphAnalytics:
+    """
+    Последний посчитанный результат и фоновый пересчет после записей.
+
+    Пересчет идет в одном фоновом потоке: несколько записей подряд дают
+    один расчет по самой новой версии.
+    """
+
+    def __init__(
+        self,
+        delay: float = 1.0,
+        runner: Optional[Callable[..., Any]] = None,
+        wait: float = FIRST_RESULT_WAIT,
+    ):
+        # Пауза после записи перед пересчетом (записи в паузе ее продлевают)
+        self.delay = delay
+        # Сколько запрос ждет первого результата
+        self.wait = wait
+        self._runner = runner if runner is not None else call
+        self._condition = threading.Condition()
+        self._result: Optional[AnalyticsResult] = None
+        # Версия и граф, которые нужно посчитать, и версия, которая считается сейчас
+        self._pending: Optional[tuple] = None
+        self._running: Optional[int] = None
+        self._scheduled_at = 0.0
+        # Число завершенных расчетов и последняя ошибка (номер расчета, исключение)
+        self._finished = 0
+        self._error: Optional[tuple] = None
+        # Пересчитывать после записей — только если аналитику уже запрашивали
+        self._active = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def available(self) -> bool:
+        return np is not None
+
+    @property
+    def result(self) -> Optional[AnalyticsResult]:
+        """Последний посчитанный результат (может отставать от данных)"""
+        return self._result
+
+    def prepare(self, version: int, graph: GraphIndex) -> None:
+        """Первый расчет в фоне сразу, не дожидаясь запроса аналитики"""
+        if np is not None:
+            self._enqueue(version, graph, 0)
+
+    def schedule(self, version: int, graph: GraphIndex, delay: Optional[float] = None) -> None:
+        """Пересчитать для версии version в фоне (если аналитика используется)"""
+        if self._active and np is not None:
+            self._enqueue(version, graph, delay)
+
+    def _enqueue(self, version: int, graph: GraphIndex, delay: Optional[float]) -> None:
+        with self._condition:
+            known = [
+                self._pending[0] if self._pending is not None else None,
+                self._running,
+                self._result.version if self._result is not None else None,
+            ]
+            if any(other is not None and other >= version for other in known):
+                return
+            self._pending = (version, graph)
+            self._scheduled_at = time.monotonic() + (self.delay if delay is None else delay)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="graph-analytics", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def get(self, version: int, graph: GraphIndex) -> AnalyticsResult:
+        """
+        Результат для версии version, если он готов; иначе — предыдущий, а
+        новый считается в фоне. Пока результата нет совсем, запрос ждет
+        первого расчета, но не дольше wait (AnalyticsUnavailable); если расчет
+        упал, исключение получают все ждущие его запросы
+        """
+        if np is None:
+            raise AnalyticsUnavailable("Для аналитики графа нужен NumPy")
+        self._active = True
+        result = self._result
+        if result is not None and result.version >= version:
+            return result
+        with self._condition:
+            # Ошибки расчетов, закончившихся до этого запроса, его не касаются
+            finished = self._finished
+        # Первый расчет — без паузы: его ждет запрос
+        self.schedule(version, graph, delay=0 if result is None else None)
+        if result is not None:
+            return result
+        deadline = time.monotonic() + self.wait
+        with self._condition:
+            while self._result is None:
+                if self._error is not None and self._error[0] > finished:
+                    raise self._error[1]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AnalyticsUnavailable("Аналитика графа еще считается, повторите запрос позже")
+                self._condition.wait(remaining)
+            return self._result
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None or time.monotonic() < self._scheduled_at:
+                    timeout = None if self._pending is None else max(0.0, self._scheduled_at - time.monotonic())
+                    self._condition.wait(timeout)
+                version, graph = self._pending
+                self._pending = None
+                self._running = version
+            try:
+                result = compute(version, graph, self._runner)
+            except BaseException as exc:
+                # Ошибку получат все запросы, ждущие первого результата
+                with self._condition:
+                    self._running = None
+                    self._finished += 1
+                    self._error = (self._finished, exc)
+                    self._condition.notify_all()
+                continue
+            with self._condition:
+                self._running = None
+                self._finished += 1
+                if self._result is None or result.version > self._result.version:
+                    self._result = result
+                self._condition.notify_all()
@@ -0,0 +1,125 @@
+"""
+Статические файлы фронтенда: сжатые заранее, с хешем содержимого в имени.
+
+При запуске каждый файл каталога static читается один раз, сжимается gzip и
+brotli с максимальной степенью и получает имя с хешем содержимого
+(app.js → app.1a2b3c4d5e6f7a8b.js). Содержимое по такому адресу никогда не
+меняется, поэтому он отдается с Cache-Control: immutable — браузер не
+перепроверяет файл, пока оболочка не сошлется на новую версию.
+
+Оболочка приложения (index.html) ссылается на файлы по новым именам и
+отдается прямо на / с ETag. Сервис-воркер (sw.js) получает список адресов
+оболочки и ее версию, поэтому меняется вместе с ней.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from dataclasses import replace
+from typing import Dict, List, Optional
+
+from cache import MIN_COMPRESS_SIZE, CachedResponse, brotli
+
+SHELL_NAME = "index.html"
+SERVICE_WORKER_NAME = "sw.js"
+# Адрес файла с хешем навсегда связан с его содержимым
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Ссылки оболочки на файлы: href="styles.css", src="app.js"
+_REFERENCE = re.compile(r'\b(href|src)="([^"#?]+)"')
+# Заглушки в sw.js, которые заполняет сервер
+_SHELL_VERSION = "{{SHELL_VERSION}}"
+_SHELL_URLS = '["{{SHELL_URLS}}"]'
+
+# mimetypes в разных версиях Python по-разному называет тип JavaScript
+_MEDIA_TYPES = {".html": "text/html", ".js": "text/javascript", ".css": "text/css"}
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _media_type(name: str) -> str:
+    extension = os.path.splitext(name)[1].lower()
+    return _MEDIA_TYPES.get(extension) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def _compressed(name: str, body: bytes, headers: Dict[str, str]) -> CachedResponse:
+    """Ответ с телом во всех вариантах сжатия; ETag — хеш содержимого"""
+    entry = CachedResponse(
+        version=0, etag=_digest(body), body=body, headers=headers, media_type=_media_type(name)
+    )
+    if len(body) >= MIN_COMPRESS_SIZE:
+        entry.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            entry.br_body = brotli.compress(body, quality=11)
+    return entry
+
+
+class StaticAssets:
+    """Файлы фронтенда, подготовленные к отдаче: оболочка, сервис-воркер и ресурсы"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # Имя файла (с хешем или исходное) → ответ
+        self._files: Dict[str, CachedResponse] = {}
+        # Исходное имя → адрес с хешем
+        self.urls: Dict[str, str] = {}
+
+        for name in self._walk():
+            if name in (SHELL_NAME, SERVICE_WORKER_NAME):
+                continue
+            entry = _compressed(name, self._read(name), {"Cache-Control": IMMUTABLE})
+            stem, extension = os.path.splitext(name)
+            hashed = f"{stem}.{entry.etag}{extension}"
+            self._files[hashed] = entry
+            # Старые адреса без хеша продолжают работать, но перепроверяются
+            self._files[name] = replace(entry, headers={})
+            self.urls[name] = f"/static/{hashed}"
+
+        shell = _REFERENCE.sub(self._rewrite, self._read(SHELL_NAME).decode("utf-8"))
+        self.shell = _compressed(SHELL_NAME, shell.encode("utf-8"), {})
+        self._files[SHELL_NAME] = self.shell
+        # Версия оболочки меняется вместе с любым файлом, на который она ссылается
+        self.version = self.shell.etag
+
+        service_worker = (
+            self._read(SERVICE_WORKER_NAME).decode("utf-8")
+            .replace(_SHELL_VERSION, self.version)
+            .replace(_SHELL_URLS, json.dumps(self.shell_urls))
+        )
+        self.service_worker = _compressed(SERVICE_WORKER_NAME, service_worker.encode("utf-8"), {})
+
+    @property
+    def shell_urls(self) -> List[str]:
+        """Адреса, которые сервис-воркер кэширует при установке"""
+        return ["/", *self.urls.values()]
+
+    def get(self, name: str) -> Optional[CachedResponse]:
+        """Файл по имени из адреса /static/...; None, если такого нет"""
+        return self._files.get(name)
+
+    def _walk(self) -> List[str]:
+        names = []
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                path = os.path.relpath(os.path.join(root, file), self.directory)
+                names.append(path.replace(os.sep, "/"))
+        return sorted(names)
+
+    def _read(self, name: str) -> bytes:
+        with open(os.path.join(self.directory, name), "rb") as file:
+            return file.read()
+
+    def _rewrite(self, match: "re.Match[str]") -> str:
+        reference = match.group(2)
+        for prefix in ("/static/", "./"):
+            if reference.startswith(prefix):
+                reference = reference[len(prefix):]
+                break
+        url = self.urls.get(reference)
+        if url is None:
+            return match.group(0)
+        return f'{match.group(1)}="{url}"'
@@ -0,0 +1,143 @@
+"""
+Бенчмарк сериализации /api/graph на синтетическом глоссарии.
+
+Сравнивает прежний путь (GraphNode/GraphEdge -> GraphData -> model_dump ->
+json.dumps) с текущим (словари, собранные из индекса, -> orjson) по числу
+запросов в секунду. Кэш ответов сбрасывается перед каждым запросом, чтобы
+измерялось построение ответа, а не выдача из кэша; в запросы входит и
+сжатие тела, поэтому отдельно показано время одной сериализации (build_ms).
+
+Запуск из корня проекта:
+    python benchmarks/graph_serialization.py --nodes 10000 --requests 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from database import Database  # noqa: E402
+from models import GraphData, GraphEdge, GraphNode  # noqa: E402
+from repository import ThreadedRepository  # noqa: E402
+from serialization import orjson  # noqa: E402
+from synthetic import synthetic_database  # noqa: E402
+
+# База синтетического глоссария (создается в run)
+db: Optional[Database] = None
+
+
+def current_graph_response(category: Optional[str]) -> Dict[str, Any]:
+    """Текущее построение ответа: словари узлов и ребер прямо из индекса"""
+    return db.get_graph_data(category)
+
+
+def legacy_graph_response(category: Optional[str]) -> Dict[str, Any]:
+    """Прежнее построение ответа: модели pydantic и обратно в словари"""
+    graph_data = db.get_graph_data(category)
+    nodes = [
+        GraphNode(
+            id=node["id"],
+            label=node["label"],
+            title=node["title"],
+            definition=node["definition"],
+            source=node.get("source"),
+            category=node.get("category"),
+            group=node.get("group")
+        )
+        for node in graph_data["nodes"]
+    ]
+    edges = [
+        GraphEdge.model_validate({"from": edge["from"], "to": edge["to"], "label": edge.get("label")})
+        for edge in graph_data["edges"]
+    ]
+    return GraphData(nodes=nodes, edges=edges).model_dump(mode="json", by_alias=True)
+
+
+def legacy_encode_json(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def measure_build(build, encode, repeat: int) -> float:
+    """Среднее время построения тела ответа без HTTP и сжатия, мс"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode(build(None))
+    return round((time.perf_counter() - started) / repeat * 1000, 2)
+
+
+async def measure(client: httpx.AsyncClient, url: str, requests: int, cached: bool) -> Dict[str, float]:
+    await client.get(url)  # прогрев
+    latencies = []
+    size = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        if not cached:
+            main.response_cache.clear()
+        t0 = time.perf_counter()
+        response = await client.get(url, headers={"Accept-Encoding": "identity"})
+        latencies.append(time.perf_counter() - t0)
+        response.raise_for_status()
+        size = len(response.content)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "bytes": size,
+    }
+
+
+class LegacyRepository(ThreadedRepository):
+    """Репозиторий, строящий граф прежним способом"""
+
+    async def get_graph_data(self, category: Optional[str] = None) -> Dict:
+        return await self._graph(legacy_graph_response, category)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    global db
+    db = synthetic_database(args.nodes, density=args.degree)
+    repository, legacy = ThreadedRepository(db), LegacyRepository(db)
+    transport = httpx.ASGITransport(app=main.app)
+    results: Dict[str, Any] = {
+        "nodes": args.nodes,
+        "edges": len(db.get_graph_data()["edges"]),
+        "orjson": orjson is not None,
+    }
+    current = (current_graph_response, main.encode_json)
+    results["build_ms"] = {
+        "before": measure_build(legacy_graph_response, legacy_encode_json, args.requests),
+        "after": measure_build(*current, args.requests),
+    }
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        main.app.dependency_overrides[main.get_repository] = lambda: legacy
+        main.encode_json = legacy_encode_json
+        results["before"] = await measure(client, "/api/graph", args.requests, cached=False)
+        main.app.dependency_overrides[main.get_repository] = lambda: repository
+        main.encode_json = current[1]
+        results["after"] = await measure(client, "/api/graph", args.requests, cached=False)
+        results["after_cached"] = await measure(client, "/api/graph", args.requests, cached=True)
+    results["speedup"] = round(results["after"]["rps"] / results["before"]["rps"], 2)
+    return results
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10000, help="Число терминов (узлов графа)")
+    parser.add_argument("--degree", type=int, default=3, help="Связей у каждого термина")
+    parser.add_argument("--requests", type=int, default=30, help="Запросов на каждый замер")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,488 @@
+"""
+Набор бенчмарков: методы Database и все эндпоинты API на синтетических глоссариях.
+
+Для каждого размера глоссария (по умолчанию 1k и 10k терминов; 100k и 1m —
+по запросу) в отдельном процессе, чтобы пиковая память не смешивалась:
+- строится синтетический глоссарий (benchmarks/synthetic.py);
+- замеряется каждый метод Database (задержка p50/p95/p99 и операций в секунду);
+- каждый эндпоинт вызывается в процессе через ASGI-клиент httpx при заданных
+  уровнях параллельности (задержка p50/p95/p99 и запросов в секунду);
+- фиксируется пиковая резидентная память (peak RSS).
+
+Результат — JSON (в stdout или в --output). С --baseline результат
+сравнивается с сохраненным: если медианная задержка или пропускная
+способность хуже порога --tolerance (с поправкой на скорость машины по
+калибровочной нагрузке), регрессии перечисляются и код возврата — 1.
+
+Нужен httpx (pip install -r requirements-dev.txt). Запуск из корня проекта:
+    python benchmarks/suite.py --baseline benchmarks/baseline.json
+    python benchmarks/suite.py --sizes 1k,10k,100k --concurrency 1,16 --output result.json
+    python benchmarks/suite.py --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from multiprocessing import get_context
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:  # Windows — пиковую память не измеряем
+    resource = None
+
+# Порог регрессии по умолчанию: на 50% хуже базового замера (с поправкой на
+# скорость машины). Ищем алгоритмические регрессии, а не колебания в 10–20%
+DEFAULT_TOLERANCE = 0.5
+# Разница задержки меньше этой (мс) не считается регрессией — это шум таймера
+MIN_LATENCY_DELTA_MS = 0.05
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(value: str) -> int:
+    """1000, 10k, 1m -> число терминов"""
+    value = value.strip().lower()
+    if value[-1:] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss — в килобайтах на Linux и в байтах на macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20, 1)
+
+
+def cpu_model() -> str:
+    """Название процессора (для метаданных замера)"""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def calibrate(rounds: int = 7) -> float:
+    """
+    Время (мс) фиксированной нагрузки на интерпретатор, медиана из rounds.
+    Отношение калибровок двух запусков — поправка на скорость машины
+    при сравнении с базовым замером
+    """
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        data = {f"key-{i}": i for i in range(20000)}
+        words = sorted(f"{value:08d}-{key}" for key, value in data.items())
+        sum(len(word) for word in words if word.endswith("7"))
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[rounds // 2] * 1000
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Перцентили задержки (мс) и пропускная способность"""
+    latencies = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+        return round(latencies[index] * 1000, 3)
+
+    return {
+        "iterations": len(latencies),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "ops_per_s": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def measure(operation: Callable[[], Any], min_time: float, max_iterations: int) -> Dict[str, float]:
+    """Вызывать operation, пока не пройдет min_time секунд (не меньше 3 и не больше max_iterations раз)"""
+    latencies: List[float] = []
+    started = time.perf_counter()
+    while len(latencies) < max_iterations:
+        t0 = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - t0)
+        if len(latencies) >= 3 and time.perf_counter() - started >= min_time:
+            break
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def method_benchmarks(db, size: int, rng: random.Random) -> Dict[str, Callable[[], Any]]:
+    """Операция для каждого метода Database; ключи — имена методов"""
+    from models import BatchOperation, TermCreate, TermUpdate
+    from synthetic import CATEGORIES, keyword
+
+    def existing() -> str:
+        return keyword(rng.randrange(size))
+
+    created = count()
+    # Самая частая категория при перекосе
+    category = CATEGORIES[0]
+
+    def new_term() -> TermCreate:
+        return TermCreate(
+            keyword=f"bench-{next(created)}",
+            title="Новый термин",
+            definition="Определение термина, созданного бенчмарком",
+            category=category,
+            related_terms=[existing(), existing()],
+        )
+
+    def create_and_delete():
+        term = db.create_term(new_term())
+        db.delete_term(term.keyword)
+
+    def batch():
+        term = new_term()
+        db.apply_batch([
+            BatchOperation(op="create", term=term),
+            BatchOperation(op="update", keyword=term.keyword, changes=TermUpdate(title="Изменен")),
+            BatchOperation(op="delete", keyword=term.keyword),
+        ])
+
+    def import_terms():
+        terms = [new_term() for _ in range(100)]
+        db.import_terms(terms)
+        for term in terms:
+            db.delete_term(term.keyword)
+
+    return {
+        "version": lambda: db.version,
+        "count": db.count,
+        "get_term": lambda: db.get_term(existing()),
+        "get_terms": lambda: db.get_terms([existing() for _ in range(50)]),
+        "get_related": lambda: db.get_related(db.get_term(existing())),
+        "list_terms": lambda: db.list_terms(100, sort="title"),
+        "list_terms_category": lambda: db.list_terms(100, category=category, sort="-created_at"),
+        "iter_terms": lambda: sum(len(batch) for batch in db.iter_terms()),
+        "get_all_terms": db.get_all_terms,
+        "search": lambda: db.search(rng.choice(["кэш", "offline", "манифест", "worke"])),
+        "get_backlinks": lambda: db.get_backlinks(existing()),
+        "get_graph_data": db.get_graph_data,
+        "get_graph_data_category": lambda: db.get_graph_data(category),
+        "get_neighborhood": lambda: db.get_neighborhood(existing(), 2, 200, 1000, "both"),
+        "find_path": lambda: db.find_path(existing(), existing(), 8, "both"),
+        "get_graph_analytics": db.get_graph_analytics,
+        "get_changes": lambda: db.get_changes(max(0, db.change_seq - 100)),
+        "update_term": lambda: db.update_term(existing(), TermUpdate(title=f"Изменен {rng.random()}")),
+        "create_delete_term": create_and_delete,
+        "apply_batch": batch,
+        "import_terms_100": import_terms,
+    }
+
+
+# Эндпоинт: имя -> функция (клиент, номер запроса) -> запрос
+Request = Callable[[Any, int], Awaitable[Any]]
+
+
+async def admit_all() -> None:
+    """Допуск записей без ограничений (async — без перехода в пул потоков)"""
+
+
+def endpoint_benchmarks(size: int, seed: int) -> Dict[str, Request]:
+    """Запрос для каждого эндпоинта API"""
+    import main
+    from synthetic import CATEGORIES, keyword
+
+    db = main.app.dependency_overrides[main.get_repository]().database
+    rng = random.Random(seed)
+
+    def existing() -> str:
+        return keyword(rng.randrange(size))
+
+    def new_term(n: int) -> Dict[str, Any]:
+        return {
+            "keyword": f"api-bench-{n}-{rng.randrange(10 ** 9)}",
+            "title": "Новый термин",
+            "definition": "Определение термина, созданного бенчмарком",
+            "related_terms": [existing()],
+        }
+
+    async def create_delete(client, n):
+        term = new_term(n)
+        (await client.post("/api/terms", json=term)).raise_for_status()
+        return await client.delete(f"/api/terms/{term['keyword']}")
+
+    async def batch(client, n):
+        term = new_term(n)
+        return await client.post("/api/terms/batch", json={"operations": [
+            {"op": "create", "term": term},
+            {"op": "update", "keyword": term["keyword"], "changes": {"title": "Изменен"}},
+            {"op": "delete", "keyword": term["keyword"]},
+        ]})
+
+    async def import_terms(client, n):
+        terms = [new_term(n) for _ in range(10)]
+        body = "\n".join(json.dumps(term, ensure_ascii=False) for term in terms)
+        response = await client.post("/api/terms/import?mode=upsert", content=body.encode("utf-8"))
+        response.raise_for_status()
+        return await client.post("/api/terms/batch", json={"operations": [
+            {"op": "delete", "keyword": term["keyword"]} for term in terms
+        ]})
+
+    async def second_page(client, n):
+        first = await client.get("/api/terms?limit=100&sort=title")
+        return await client.get(f"/api/terms?limit=100&sort=title&cursor={first.headers['X-Next-Cursor']}")
+
+    return {
+        "GET /api/terms": lambda client, n: client.get("/api/terms?limit=100"),
+        "GET /api/terms?cursor": second_page,
+        "GET /api/terms/{keyword}": lambda client, n: client.get(f"/api/terms/{existing()}"),
+        "GET /api/terms/{keyword}?expand=related": lambda client, n: client.get(f"/api/terms/{existing()}?expand=related"),
+        "GET /api/terms/{keyword}/backlinks": lambda client, n: client.get(f"/api/terms/{existing()}/backlinks"),
+        "POST /api/terms/batch-get": lambda client, n: client.post(
+            "/api/terms/batch-get", json={"keywords": [existing() for _ in range(50)]}),
+        "GET /api/categories": lambda client, n: client.get("/api/categories"),
+        "GET /api/search": lambda client, n: client.get("/api/search", params={"q": rng.choice(["кэш", "offline", "worke"])}),
+        "GET /api/graph": lambda client, n: client.get("/api/graph"),
+        "GET /api/graph?category": lambda client, n: client.get("/api/graph", params={"category": CATEGORIES[0]}),
+        "GET /api/graph/neighborhood/{keyword}": lambda client, n: client.get(
+            f"/api/graph/neighborhood/{existing()}?depth=2"),
+        "GET /api/graph/path": lambda client, n: client.get(
+            "/api/graph/path", params={"from": existing(), "to": existing()}),
+        "GET /api/graph/analytics": lambda client, n: client.get("/api/graph/analytics"),
+        "GET /api/changes": lambda client, n: client.get(
+            "/api/changes", params={"since": max(0, db.change_seq - 100), "log": db.changes.log_id}),
+        "GET /api/health": lambda client, n: client.get("/api/health"),
+        "GET /metrics": lambda client, n: client.get("/metrics"),
+        "GET /api/terms/export": lambda client, n: client.get("/api/terms/export"),
+        "PUT /api/terms/{keyword}": lambda client, n: client.put(
+            f"/api/terms/{existing()}", json={"title": f"Изменен {n}"}),
+        "POST+DELETE /api/terms": create_delete,
+        "POST /api/terms/batch": batch,
+        "POST /api/terms/import": import_terms,
+    }
+
+
+# Эндпоинты, которые при больших размерах отдают весь глоссарий — для них меньше запросов
+HEAVY_ENDPOINTS = {"GET /api/terms/export"}
+
+
+async def drive(client, request: Request, concurrency: int, total: int) -> Dict[str, float]:
+    """total запросов, которые выполняют concurrency параллельных клиентов"""
+    latencies: List[float] = []
+    issued = count()
+
+    async def worker():
+        while True:
+            n = next(issued)
+            if n >= total:
+                return
+            t0 = time.perf_counter()
+            response = await request(client, n)
+            latencies.append(time.perf_counter() - t0)
+            response.raise_for_status()
+
+    await request(client, -1)  # прогрев (в том числе кэша ответов)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run_endpoints(size: int, args: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    import httpx
+    import main
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, request in endpoint_benchmarks(size, args["seed"]).items():
+            if args["only"] and not any(part in name for part in args["only"]):
+                continue
+            results[name] = {}
+            for concurrency in args["concurrency"]:
+                total = args["requests"]
+                if name in HEAVY_ENDPOINTS:
+                    total = max(concurrency, min(total, 200_000 // size))
+                results[name][str(concurrency)] = await drive(client, request, concurrency, max(total, concurrency))
+    return results
+
+
+def run_size(size: int, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Все замеры для одного размера глоссария (выполняется в отдельном процессе)"""
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+    from repository import ThreadedRepository
+    from synthetic import synthetic_database
+
+    calibration_start = calibrate()
+    started = time.perf_counter()
+    db = synthetic_database(size, args["density"], args["skew"], args["seed"])
+    load_seconds = time.perf_counter() - started
+    rss_after_load = peak_rss_mb()
+    repository = ThreadedRepository(db)
+    main.app.dependency_overrides[main.get_repository] = lambda: repository
+    # Бенчмарк пишет с одного адреса и параллельно — лимиты записей его бы отклоняли
+    main.app.dependency_overrides[main.admit_write] = admit_all
+    main.response_cache.clear()
+
+    rng = random.Random(args["seed"])
+    methods = {}
+    for name, operation in method_benchmarks(db, size, rng).items():
+        if args["only"] and not any(part in name for part in args["only"]):
+            continue
+        methods[name] = measure(operation, args["min_time"], args["max_iterations"])
+
+    endpoints = asyncio.run(run_endpoints(size, args))
+    # Калибровка в начале и в конце — скорость машины могла измениться за время замеров
+    calibration_ms = round((calibration_start + calibrate()) / 2, 3)
+    return {
+        "calibration_ms": calibration_ms,
+        "terms": db.count(),
+        "edges": db.graph.edge_count,
+        "load_seconds": round(load_seconds, 2),
+        "rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": peak_rss_mb(),
+        "methods": methods,
+        "endpoints": endpoints,
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Регрессии относительно базового замера (пустой список — регрессий нет).
+    Время из базового замера масштабируется на отношение калибровок машин
+    """
+    regressions = []
+
+    def slower(current_ms: float, base_ms: float, factor: float) -> bool:
+        expected = base_ms * factor
+        return current_ms > expected * (1 + tolerance) and current_ms - expected > MIN_LATENCY_DELTA_MS
+
+    def check(where: str, current: Dict[str, float], base: Dict[str, float], factor: float):
+        # Хвосты (p95, p99) при параллельных запросах слишком шумные для порога —
+        # они только в отчете, а сравниваются медиана и пропускная способность
+        if slower(current["p50_ms"], base["p50_ms"], factor):
+            regressions.append(f"{where}: p50 {base['p50_ms']} -> {current['p50_ms']} ms")
+        # Пропускная способность сравнивается как время на одну операцию
+        if current["ops_per_s"] and base["ops_per_s"] and slower(
+                1000 / current["ops_per_s"], 1000 / base["ops_per_s"], factor):
+            regressions.append(f"{where}: throughput {base['ops_per_s']} -> {current['ops_per_s']} ops/s")
+
+    for size, sized in result["results"].items():
+        base_sized = baseline.get("results", {}).get(size)
+        if base_sized is None:
+            continue
+        factor = 1.0
+        if sized.get("calibration_ms") and base_sized.get("calibration_ms"):
+            factor = sized["calibration_ms"] / base_sized["calibration_ms"]
+        peak, base_peak = sized.get("peak_rss_mb"), base_sized.get("peak_rss_mb")
+        if peak and base_peak and peak > base_peak * (1 + tolerance):
+            regressions.append(f"{size}: peak RSS {base_peak} -> {peak} MB")
+        for name, current in sized["methods"].items():
+            if name in base_sized.get("methods", {}):
+                check(f"{size} {name}", current, base_sized["methods"][name], factor)
+        for name, levels in sized["endpoints"].items():
+            for concurrency, current in levels.items():
+                base = base_sized.get("endpoints", {}).get(name, {}).get(concurrency)
+                if base is not None:
+                    check(f"{size} {name} x{concurrency}", current, base, factor)
+    return regressions
+
+
+# Метаданные машины: эталон сравним без оговорок только с замером на такой же
+MACHINE_KEYS = ("python", "platform", "cpu", "cpu_count", "orjson", "numpy")
+
+
+def run(sizes: Sequence[int], args: Dict[str, Any]) -> Dict[str, Any]:
+    from layout import np
+    from serialization import orjson
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "recorded_at": time.strftime("%Y-%m-%d"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu": cpu_model(),
+            "cpu_count": os.cpu_count(),
+            "orjson": orjson is not None,
+            "numpy": np.__version__ if np is not None else None,
+            **{key: args[key] for key in ("density", "skew", "seed", "concurrency", "requests")},
+        },
+        "results": {},
+    }
+    context = get_context("spawn")
+    for size in sizes:
+        print(f"size {size}...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            report["results"][str(size)] = pool.submit(run_size, size, args).result()
+    return report
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,10k", help="Размеры глоссария через запятую (1k, 10k, 100k, 1m)")
+    parser.add_argument("--density", type=float, default=3.0, help="Среднее число связей у термина")
+    parser.add_argument("--skew", type=float, default=1.0, help="Перекос категорий (Ципф; 0 — равномерно)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed генератора")
+    parser.add_argument("--concurrency", default="1,8,32", help="Уровни параллельности запросов к API")
+    parser.add_argument("--requests", type=int, default=200, help="Запросов к эндпоинту на каждый уровень")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Минимальное время замера метода, с")
+    parser.add_argument("--max-iterations", type=int, default=2000, help="Максимум вызовов метода")
+    parser.add_argument("--only", default="", help="Только методы/эндпоинты, имя которых содержит одну из подстрок")
+    parser.add_argument("--output", help="Записать результат в файл (иначе — в stdout)")
+    parser.add_argument("--baseline", help="Сравнить с базовым результатом; при регрессии код возврата 1")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Допустимое ухудшение (0.5 = 50%%)")
+    parser.add_argument("--save-baseline", help="Сохранить результат как новый базовый")
+    options = parser.parse_args()
+
+    args = {
+        "density": options.density,
+        "skew": options.skew,
+        "seed": options.seed,
+        "concurrency": [int(level) for level in options.concurrency.split(",")],
+        "requests": options.requests,
+        "min_time": options.min_time,
+        "max_iterations": options.max_iterations,
+        "only": [part for part in options.only.split(",") if part],
+    }
+    report = run([parse_size(size) for size in options.sizes.split(",")], args)
+    encoded = json.dumps(report, ensure_ascii=False, indent=2)
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as output:
+            output.write(encoded + "\n")
+    else:
+        print(encoded)
+    if options.save_baseline:
+        with open(options.save_baseline, "w", encoding="utf-8") as output:
+            output.write(encoded + "\n")
+
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as source:
+            baseline = json.load(source)
+        base_meta = baseline.get("meta", {})
+        differences = [
+            f"{key}: {base_meta.get(key)} -> {report['meta'][key]}"
+            for key in MACHINE_KEYS if base_meta.get(key) != report["meta"][key]
+        ]
+        if differences:
+            # Калибровка выравнивает скорость интерпретатора, но не число ядер и библиотеки
+            print("Эталон снят на другой машине, сравнение приблизительное:", file=sys.stderr)
+            for difference in differences:
+                print(f"  {difference}", file=sys.stderr)
+        regressions = compare(report, baseline, options.tolerance)
+        if regressions:
+            print(f"РЕГРЕССИИ ({len(regressions)}):", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print("Регрессий нет", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,84 @@
+"""
+Синтетические глоссарии для бенчмарков.
+
+Генерация воспроизводима (фиксированный seed): одинаковые параметры дают
+одинаковые термины, связи и категории.
+"""
+import os
+import random
+import sys
+from typing import Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from models import TermCreate  # noqa: E402
+from storage import InMemoryStorage, StorageBackend  # noqa: E402
+
+CATEGORIES = [
+    "Концепция", "Технология", "Архитектура", "API", "Функциональность",
+    "Дизайн", "Безопасность", "Инструмент", "Характеристика", "Конфигурация",
+]
+WORDS = [
+    "кэш", "офлайн", "манифест", "сервис", "воркер", "сеть", "запрос", "ответ",
+    "push", "sync", "cache", "storage", "fetch", "install", "manifest", "worker",
+    "безопасность", "производительность", "индекс", "граф", "связь", "данные",
+]
+# Сколько терминов импортируется одной транзакцией при заполнении базы
+LOAD_BATCH_SIZE = 1000
+
+
+def category_weights(count: int, skew: float) -> List[float]:
+    """Веса категорий по закону Ципфа: skew=0 — равномерно, больше — сильнее перекос"""
+    return [1.0 / (rank + 1) ** skew for rank in range(count)]
+
+
+def keyword(index: int) -> str:
+    return f"term-{index}"
+
+
+def generate_terms(
+    count: int,
+    density: float = 3.0,
+    skew: float = 1.0,
+    categories: int = len(CATEGORIES),
+    seed: int = 1,
+) -> Iterator[TermCreate]:
+    """
+    count терминов; у каждого в среднем density связей со случайными
+    терминами, категории распределены с перекосом skew
+    """
+    rng = random.Random(seed)
+    names: List[Optional[str]] = CATEGORIES[:categories] + [None]
+    weights = category_weights(len(names), skew)
+    whole, fraction = int(density), density - int(density)
+    for i in range(count):
+        degree = whole + (1 if rng.random() < fraction else 0)
+        yield TermCreate(
+            keyword=keyword(i),
+            title=f"Термин {i} {rng.choice(WORDS)}",
+            definition=" ".join(rng.choice(WORDS) for _ in range(12)),
+            source=f"https://example.com/{i}" if rng.random() < 0.5 else None,
+            category=rng.choices(names, weights)[0],
+            related_terms=[keyword(rng.randrange(count)) for _ in range(degree)],
+        )
+
+
+def synthetic_database(
+    count: int,
+    density: float = 3.0,
+    skew: float = 1.0,
+    seed: int = 1,
+    storage: Optional[StorageBackend] = None,
+) -> Database:
+    """База с синтетическим глоссарием (по умолчанию в памяти)"""
+    database = Database(storage if storage is not None else InMemoryStorage())
+    batch: List[TermCreate] = []
+    for term in generate_terms(count, density, skew, seed=seed):
+        batch.append(term)
+        if len(batch) >= LOAD_BATCH_SIZE:
+            database.import_terms(batch, mode="upsert")
+            batch = []
+    if batch:
+        database.import_terms(batch, mode="upsert")
+    return database
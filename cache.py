@@ -0,0 +1,169 @@
+"""
+Кэш готовых (сериализованных и сжатых) ответов API.
+
+Запись кэша привязана к версии данных Database: пока данные не менялись,
+ответ отдается из кэша без обращения к хранилищу и без сериализации.
+Версию записи сообщает build — это версия снимка, из которого ответ
+прочитан, поэтому запись, параллельная построению, не попадает в ответ
+под старым ETag.
+Клиенты с актуальным ETag получают 304 Not Modified. Одновременные промахи
+по одному ключу объединяются — ответ строится один раз (single-flight).
+"""
+import asyncio
+import gzip
+import hashlib
+import inspect
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен — без него отдаем gzip
+    brotli = None
+
+# Ответы меньше этого размера не сжимаем
+MIN_COMPRESS_SIZE = 512
+
+# Результат построения ответа: версия данных, тело и доп. заголовки
+BuiltResponse = Tuple[int, bytes, Dict[str, str]]
+
+
+@dataclass
+class CachedResponse:
+    """Тело ответа во всех вариантах сжатия"""
+    version: int
+    etag: str
+    body: bytes
+    gzip_body: Optional[bytes] = None
+    br_body: Optional[bytes] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    media_type: str = "application/json"
+
+    @classmethod
+    def build(cls, key: Hashable, version: int, body: bytes,
+              headers: Optional[Dict[str, str]] = None, etag_prefix: str = "") -> "CachedResponse":
+        digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=6).hexdigest()
+        etag = f"{etag_prefix}{version}-{digest}"
+        entry = cls(version=version, etag=etag, body=body, headers=headers or {})
+        if len(body) >= MIN_COMPRESS_SIZE:
+            entry.gzip_body = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                entry.br_body = brotli.compress(body, quality=5)
+        return entry
+
+
+class ResponseCache:
+    """LRU-кэш ответов по ключу запроса с учетом версии данных"""
+
+    def __init__(self, max_entries: int = 1024, etag_prefix: str = ""):
+        self.max_entries = max_entries
+        # Отличает ETag разных экземпляров данных с одинаковыми номерами версий
+        self.etag_prefix = etag_prefix
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[Tuple[Hashable, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_build(
+        self,
+        key: Hashable,
+        version: int,
+        build: Callable[[], Union[BuiltResponse, Awaitable[BuiltResponse]]],
+    ) -> CachedResponse:
+        """
+        Вернуть ответ для key на версии version, построив его при необходимости.
+        build возвращает (версия данных, тело, доп. заголовки); версия — та,
+        из снимка которой прочитаны данные, и может оказаться новее version.
+        Корутина просто ожидается, синхронная функция выполняется в пуле
+        потоков, чтобы не блокировать цикл событий.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        flight_key = (key, version)
+        pending = self._inflight.get(flight_key)
+        if pending is not None:
+            # Ответ уже строится другим запросом — ждем его результата
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = future
+        try:
+            if inspect.iscoroutinefunction(build):
+                built_version, body, headers = await build()
+            else:
+                built_version, body, headers = await run_in_threadpool(build)
+            entry = await run_in_threadpool(
+                CachedResponse.build, key, built_version, body, headers, self.etag_prefix
+            )
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Исключение получат ожидающие; если их нет — не шумим в логах
+            future.exception()
+            raise
+        finally:
+            del self._inflight[flight_key]
+
+        current = self._entries.get(key)
+        # Построение по более старому снимку не вытесняет более новый ответ
+        if current is None or current.version <= entry.version:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        future.set_result(entry)
+        return entry
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        # Вариант сжатия — суффикс после базового ETag
+        if candidate.strip('"').split("+")[0] == etag:
+            return True
+    return False
+
+
+def cached_response(request: Request, entry: CachedResponse) -> Response:
+    """HTTP-ответ из записи кэша: 304, сжатое или несжатое тело"""
+    headers = {
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        **entry.headers,
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        headers["ETag"] = f'"{entry.etag}"'
+        return Response(status_code=304, headers=headers)
+
+    accept_encoding = request.headers.get("accept-encoding", "")
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.split(",")}
+    body = entry.body
+    if entry.br_body is not None and "br" in accepted:
+        body = entry.br_body
+        headers["Content-Encoding"] = "br"
+        headers["ETag"] = f'"{entry.etag}+br"'
+    elif entry.gzip_body is not None and "gzip" in accepted:
+        body = entry.gzip_body
+        headers["Content-Encoding"] = "gzip"
+        headers["ETag"] = f'"{entry.etag}+gzip"'
+    else:
+        headers["ETag"] = f'"{entry.etag}"'
+    return Response(content=body, media_type=entry.media_type, headers=headers)
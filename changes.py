@@ -0,0 +1,104 @@
+"""
+Журнал изменений для живого обновления клиентов.
+
+Каждое изменение термина получает возрастающий номер seq и хранится
+в ограниченном журнале уже закодированным в JSON: клиенты (GET /api/changes
+и поток SSE) получают одни и те же байты без повторной сериализации.
+
+Журнал живет в памяти процесса; изменения других воркеров с общей SQLite
+базой попадают в него, когда процесс их догоняет. Если клиент отстал
+дальше начала журнала или история изменений хранилища уже не покрывает
+пропущенное, ответ помечается как reset — клиенту нужно перечитать
+данные целиком.
+"""
+import asyncio
+import threading
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from serialization import encode_json
+
+
+class Change:
+    """Изменение одного термина"""
+
+    __slots__ = ("seq", "version", "body")
+
+    def __init__(self, seq: int, version: int, body: bytes):
+        self.seq = seq
+        # Версия данных после транзакции, в которой сделано изменение
+        self.version = version
+        # Событие в JSON: seq, version, op, id, term, node, edges
+        self.body = body
+
+
+class ChangeLog:
+    """Ограниченный журнал изменений с ожиданием новых событий"""
+
+    def __init__(self, max_entries: int = 10000):
+        # Отличает журналы разных процессов: seq сравнимы только внутри одного
+        self.log_id = uuid.uuid4().hex[:8]
+        self._entries: Deque[Change] = deque(maxlen=max_entries)
+        self._seq = 0
+        # Изменения с seq <= floor недоступны (пропущены мимо журнала)
+        self._floor = 0
+        self._lock = threading.Lock()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def seq(self) -> int:
+        """Номер последнего изменения"""
+        return self._seq
+
+    def append(self, version: int, events: List[Dict[str, Any]]) -> None:
+        """Добавить изменения одной транзакции (seq проставляется здесь)"""
+        if not events:
+            return
+        with self._lock:
+            for event in events:
+                self._seq += 1
+                body = encode_json({"seq": self._seq, "version": version, **event})
+                self._entries.append(Change(self._seq, version, body))
+            self._notify()
+
+    def reset(self) -> None:
+        """
+        Данные изменились мимо журнала: все прежние позиции недействительны,
+        клиенты получат reset
+        """
+        with self._lock:
+            self._seq += 1
+            self._floor = self._seq
+            self._entries.clear()
+            self._notify()
+
+    def since(self, seq: int) -> Optional[List[Change]]:
+        """Изменения после seq; None, если часть из них уже недоступна"""
+        with self._lock:
+            first = self._entries[0].seq if self._entries else self._seq + 1
+            if seq < max(self._floor, first - 1) or seq > self._seq:
+                return None
+            # Номера в журнале идут подряд
+            return list(self._entries)[seq - first + 1:]
+
+    async def wait(self, seq: int, timeout: float) -> None:
+        """Дождаться изменений после seq (или истечения timeout секунд)"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            if self._seq != seq:
+                return
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def _notify(self) -> None:
+        # Писатели работают в других потоках — будим циклы событий потокобезопасно
+        for loop, event in self._waiters:
+            loop.call_soon_threadsafe(event.set)
@@ -0,0 +1,51 @@
+"""
+Настройки приложения из переменных окружения (и файла .env, если он есть).
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Бэкенд хранилища: "memory" (по умолчанию), "snapshot" или "sqlite"
+STORAGE_BACKEND = os.getenv("GLOSSARY_STORAGE", "memory").lower()
+
+# Путь к файлу SQLite, размер пула соединений и сколько последних ревизий
+# помнит таблица изменений (по ней воркеры догоняют записи друг друга)
+SQLITE_PATH = os.getenv("GLOSSARY_SQLITE_PATH", "glossary.db")
+SQLITE_POOL_SIZE = int(os.getenv("GLOSSARY_SQLITE_POOL_SIZE", "8"))
+SQLITE_CHANGE_HISTORY = int(os.getenv("GLOSSARY_SQLITE_CHANGE_HISTORY", "10000"))
+
+# Бэкенд "snapshot": путь к файлу снимка (рядом — .journal и .lock), fsync
+# журнала после каждой записи, размер журнала для уплотнения (байт) и как
+# часто его проверять (с)
+SNAPSHOT_PATH = os.getenv("GLOSSARY_SNAPSHOT_PATH", "glossary.snap")
+SNAPSHOT_FSYNC = os.getenv("GLOSSARY_SNAPSHOT_FSYNC", "1").lower() not in ("0", "false", "no")
+SNAPSHOT_COMPACT_BYTES = int(os.getenv("GLOSSARY_SNAPSHOT_COMPACT_BYTES", str(64 << 20)))
+SNAPSHOT_COMPACT_INTERVAL = float(os.getenv("GLOSSARY_SNAPSHOT_COMPACT_INTERVAL", "60"))
+
+# Сколько последних изменений хранит журнал для /api/changes
+CHANGE_LOG_SIZE = int(os.getenv("GLOSSARY_CHANGE_LOG_SIZE", "10000"))
+
+# Репозиторий (repository.py): потоки для чтений и записей, потоки для
+# построения графа и аналитики, процессы для расчетов на NumPy (0 — считать
+# в потоке запроса) и таймауты операций, с (0 — без таймаута)
+REPOSITORY_THREADS = int(os.getenv("GLOSSARY_REPOSITORY_THREADS", "8"))
+GRAPH_THREADS = int(os.getenv("GLOSSARY_GRAPH_THREADS", "2"))
+GRAPH_PROCESSES = int(os.getenv("GLOSSARY_GRAPH_PROCESSES", "0"))
+READ_TIMEOUT = float(os.getenv("GLOSSARY_READ_TIMEOUT", "10")) or None
+WRITE_TIMEOUT = float(os.getenv("GLOSSARY_WRITE_TIMEOUT", "30")) or None
+GRAPH_TIMEOUT = float(os.getenv("GLOSSARY_GRAPH_TIMEOUT", "60")) or None
+
+# Допуск записей (admission.py): сколько записей в секунду разрешено одному
+# клиенту (0 — без ограничения) и размер всплеска, сколько записей может
+# выполняться одновременно (0 — без ограничения; сверх предела — 503)
+WRITE_RATE = float(os.getenv("GLOSSARY_WRITE_RATE", "10"))
+WRITE_BURST = float(os.getenv("GLOSSARY_WRITE_BURST", "50"))
+MAX_CONCURRENT_WRITES = int(os.getenv("GLOSSARY_MAX_CONCURRENT_WRITES", "4"))
+
+# Пауза после записи перед фоновым пересчетом аналитики графа, с
+ANALYTICS_DELAY = float(os.getenv("GLOSSARY_ANALYTICS_DELAY", "1.0"))
+# Считать аналитику сразу после построения индексов при старте, не дожидаясь
+# первого запроса (иначе первый запрос ждет полный расчет)
+ANALYTICS_PREPARE = os.getenv("GLOSSARY_ANALYTICS_PREPARE", "1").lower() not in ("0", "false", "no")
@@ -1,18 +1,96 @@
 """
-Простое in-memory хранилище для терминов.
-В продакшене можно заменить на реальную БД (PostgreSQL, MongoDB и т.д.)
+Хранилище терминов глоссария.
+Данные лежат в одном из бэкендов storage.py (в памяти, в памяти со
+снимком на диске или SQLite), выбор бэкенда — через переменную окружения
+GLOSSARY_STORAGE. Методы синхронные и возвращают компактные записи терминов
+(records.TermRecord); модели Term из них собираются на границе API.
+Обработчики API обращаются к базе через асинхронный репозиторий
+(repository.py).
 """
-from typing import Dict, List, Optional
+import base64
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
-from models import Term, TermCreate, TermUpdate
+import config
+from analytics import AnalyticsResult, GraphAnalytics
+from changes import Change, ChangeLog
+from metrics import GRAPH_OPERATION_DURATION, timed
+from models import BatchOperation, TermCreate, TermListItem, TermUpdate
+from graph import GraphIndex
+from layout import GraphLayout
+from records import Symbols, TermRecord, to_micros
+from search import SearchIndex
+from snapshot import Snapshot
+from storage import SORT_FIELDS, SortKey, StorageBackend, create_storage, sort_key
+
+
+def encode_cursor(key: SortKey) -> str:
+    """Непрозрачный курсор страницы из ключа (значение, id)"""
+    value, term_id = key
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, term_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> SortKey:
+    """Разобрать курсор; ValueError, если он поврежден"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, term_id = json.loads(raw)
+        if not isinstance(value, str) or not isinstance(term_id, str):
+            raise TypeError
+        if sort == "created_at":
+            value = datetime.fromisoformat(value)
+            # Даты хранятся без часового пояса: сравнение с aware-датой упало бы
+            if value.tzinfo is not None:
+                raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError("Некорректный курсор страницы")
+    return (value, term_id)
 
 
 class Database:
-    """In-memory база данных для терминов"""
+    """База данных терминов поверх выбранного бэкенда хранения"""
     
-    def __init__(self):
-        self.terms: Dict[str, Term] = {}
-        self._initialize_default_terms()
+    def __init__(self, storage: Optional[StorageBackend] = None, runner: Optional[Callable[..., Any]] = None):
+        """
+        runner(функция, *аргументы) выполняет тяжелые расчеты по массивам
+        (раскладка и аналитика графа), например в пуле процессов;
+        по умолчанию — в вызывающем потоке
+        """
+        self.storage = storage if storage is not None else create_storage()
+        # Опубликованный снимок: ревизия хранилища, его представление для
+        # чтения и производные индексы в памяти процесса. Читатели берут
+        # ссылку на снимок без блокировок, писатель готовит новый и подменяет ее.
+        # Граф и поисковый индекс нумеруют термины общей таблицей Symbols.
+        # Ревизия -1: индексы строятся при первом обращении
+        symbols = Symbols()
+        self._snapshot = Snapshot(-1, self.storage.snapshot(), GraphIndex(symbols), SearchIndex(symbols))
+        # Черновик снимка текущей транзакции записи
+        self._draft: Optional[Snapshot] = None
+        # Журнал изменений и изменения текущей транзакции (id -> операция)
+        self.changes = ChangeLog(config.CHANGE_LOG_SIZE)
+        self._pending: Dict[str, str] = {}
+        # Координаты узлов графа, пересчитываются в фоне после записей
+        self.layout = GraphLayout(runner=runner)
+        # Метрики графа, пересчитываются в фоне после записей
+        self.analytics = GraphAnalytics(config.ANALYTICS_DELAY, runner=runner)
+        # Писатели выполняются строго по одному
+        self._write_lock = threading.RLock()
+        # Снимок, закрепленный за потоком на время read()
+        self._pinned = threading.local()
+        # Базовые термины добавляются только в пустое хранилище; транзакция
+        # не дает нескольким воркерам заполнить его одновременно
+        with self._write():
+            if self.storage.count() == 0:
+                self._initialize_default_terms()
+        # Индексы опубликованы — первые раскладка и расчет аналитики идут в фоне уже сейчас
+        self.layout.schedule(self._snapshot.revision, self._snapshot.graph)
+        if config.ANALYTICS_PREPARE:
+            self.analytics.prepare(self._snapshot.revision, self._snapshot.graph)
     
     def _initialize_default_terms(self):
         """Инициализация с базовыми PWA терминами"""
@@ -143,106 +221,496 @@ class Database:
             term = TermCreate(**term_data)
             self.create_term(term)
     
-    def get_all_terms(self) -> List[Term]:
+    @timed(GRAPH_OPERATION_DURATION, "rebuild")
+    def _build_snapshot(self) -> Snapshot:
+        """Снимок с индексами, построенными заново по содержимому хранилища"""
+        with self.storage.transaction():
+            terms = self.storage.all()
+            # Новая таблица номеров — без номеров удаленных терминов
+            symbols = Symbols()
+            search_index = SearchIndex(symbols)
+            search_index.rebuild(terms)
+            graph = GraphIndex(symbols)
+            graph.rebuild(terms)
+            revision = self.storage.revision()
+        return Snapshot(revision, self.storage.snapshot(), graph, search_index)
+    
+    def _catch_up(self, base: Snapshot) -> Snapshot:
+        """
+        Снимок последней ревизии хранилища из устаревшего base. Термины,
+        измененные мимо этого процесса (другим воркером с общей SQLite базой),
+        переиндексируются в копии индексов base и попадают в журнал
+        изменений. Индексы строятся заново при первом чтении (ревизия base
+        -1) и если хранилище уже не помнит, что менялось после base, —
+        только во втором случае журнал сбрасывается
+        """
+        with self.storage.transaction():
+            if base.revision < 0:
+                # Журнал начинается с этого состояния: пропущенных изменений нет
+                return self._build_snapshot()
+            changed = self.storage.changed_since(base.revision)
+            if changed is None:
+                snapshot = self._build_snapshot()
+                self.changes.reset()
+                return snapshot
+            graph, search_index = base.graph.fork(), base.search_index.fork()
+            terms = self.storage.get_many(changed)
+            pending: Dict[str, str] = {}
+            for term_id in changed:
+                term = terms.get(term_id)
+                if term is None:
+                    search_index.remove(term_id)
+                    graph.remove(term_id)
+                    pending[term_id] = "delete"
+                else:
+                    pending[term_id] = "update" if term_id in base.graph.nodes else "create"
+                    search_index.add(term)
+                    graph.add(term)
+            revision = self.storage.revision()
+        snapshot = Snapshot(revision, self.storage.snapshot(), graph, search_index)
+        self.changes.append(revision, self._change_events(snapshot, pending))
+        self.layout.schedule(revision, graph)
+        self.analytics.schedule(revision, graph)
+        return snapshot
+    
+    def _current(self) -> Snapshot:
+        """
+        Текущий снимок для чтения. Если хранилище изменил другой процесс
+        (например, другой воркер с общей SQLite базой), снимок сначала
+        догоняет его изменения (_catch_up)
+        """
+        pinned = getattr(self._pinned, "snapshot", None)
+        if pinned is not None:
+            return pinned
+        snapshot = self._snapshot
+        # В транзакции чтения хранилище может отставать от опубликованного
+        # снимка — догонять нужно только более новое
+        if self.storage.revision() > snapshot.revision:
+            with self._write_lock:
+                snapshot = self._snapshot
+                if self.storage.revision() > snapshot.revision:
+                    snapshot = self._snapshot = self._catch_up(snapshot)
+        return snapshot
+    
+    @contextmanager
+    def read(self) -> Iterator[int]:
+        """
+        Несколько чтений в одном согласованном состоянии: внутри блока все
+        методы чтения (в этом потоке) видят один снимок. Возвращает его версию
+        """
+        if getattr(self._pinned, "snapshot", None) is not None:
+            yield self._pinned.snapshot.revision
+            return
+        while True:
+            # Хранилище без неизменяемых представлений (SQLite) читается в
+            # одной транзакции той же ревизии, что и снимок индексов
+            with self.storage.read_transaction():
+                snapshot = self._current()
+                if snapshot.revision <= self.storage.revision():
+                    self._pinned.snapshot = snapshot
+                    try:
+                        yield snapshot.revision
+                    finally:
+                        self._pinned.snapshot = None
+                    return
+            # Снимок опубликован после начала транзакции чтения — читаем заново
+    
+    @contextmanager
+    def _write(self):
+        """
+        Транзакция записи. Индексы обновляются инкрементально в копии
+        (self._draft), которая публикуется после фиксации хранилища;
+        при ошибке копия отбрасывается
+        """
+        with self._write_lock:
+            if self._draft is not None:
+                # Вложенная запись — продолжаем внешнюю транзакцию
+                yield
+                return
+            with self.storage.transaction():
+                base = self._snapshot
+                if self.storage.revision() != base.revision:
+                    base = self._snapshot = self._catch_up(base)
+                self._draft = Snapshot(base.revision, None, base.graph.fork(), base.search_index.fork())
+                self._pending = {}
+                try:
+                    yield
+                    revision = self.storage.revision()
+                finally:
+                    draft, self._draft = self._draft, None
+                    pending, self._pending = self._pending, {}
+            self._snapshot = Snapshot(revision, self.storage.snapshot(), draft.graph, draft.search_index)
+            self.changes.append(revision, self._change_events(self._snapshot, pending))
+            self.layout.schedule(revision, self._snapshot.graph)
+            self.analytics.schedule(revision, self._snapshot.graph)
+    
+    def _record(self, op: str, term_id: str):
+        """Запомнить изменение термина в текущей транзакции (для журнала)"""
+        if self._pending.get(term_id) == "create" and op == "update":
+            op = "create"
+        # Повторное изменение переносит термин в конец — порядок последних изменений
+        self._pending.pop(term_id, None)
+        self._pending[term_id] = op
+    
+    @staticmethod
+    def _change_events(snapshot: Snapshot, pending: Dict[str, str]) -> List[Dict[str, Any]]:
+        """События журнала по итоговому состоянию терминов после транзакции"""
+        terms = snapshot.storage.get_many(pending)
+        events = []
+        for term_id, op in pending.items():
+            term = terms.get(term_id)
+            if term is None:
+                events.append({"op": "delete", "id": term_id, "term": None, "node": None, "edges": []})
+                continue
+            events.append({
+                "op": "create" if op == "delete" else op,
+                "id": term_id,
+                "term": term.to_dict(),
+                "node": snapshot.graph.node(term_id),
+                "edges": snapshot.graph.incident_edges(term_id),
+            })
+        return events
+    
+    @property
+    def version(self) -> int:
+        """Версия данных: растет при каждом изменении (общая для всех воркеров)"""
+        return self._current().revision
+    
+    @property
+    def graph(self) -> GraphIndex:
+        """Индекс графа текущего снимка (только для чтения)"""
+        return self._current().graph
+    
+    @property
+    def search_index(self) -> SearchIndex:
+        """Поисковый индекс текущего снимка (только для чтения)"""
+        return self._current().search_index
+    
+    def get_all_terms(self) -> List[TermRecord]:
         """Получить все термины"""
-        return list(self.terms.values())
+        return self._current().storage.all()
     
-    def get_term(self, keyword: str) -> Optional[Term]:
+    def count(self) -> int:
+        """Количество терминов"""
+        return self._current().storage.count()
+    
+    def published_stats(self) -> Dict[str, int]:
+        """
+        Термины, ребра и версия опубликованного снимка — без догона чужих
+        изменений и без обращения к хранилищу, поэтому не ждут блокировку
+        записи (для /api/health и /metrics). Изменения других воркеров
+        видны здесь после следующего чтения, которое их догонит
+        """
+        snapshot = self._snapshot
+        graph = snapshot.graph
+        return {"terms": len(graph.nodes), "edges": graph.edge_count, "version": snapshot.revision}
+    
+    def list_terms(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+        sort: str = "id"
+    ) -> Tuple[List[TermRecord], Optional[str]]:
+        """
+        Страница терминов и курсор следующей страницы (None, если это последняя).
+        
+        sort — одно из SORT_FIELDS, с префиксом "-" для обратного порядка.
+        """
+        descending = sort.startswith("-")
+        field = sort[1:] if descending else sort
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Сортировка по полю '{field}' не поддерживается")
+        after = decode_cursor(cursor, field) if cursor else None
+        
+        # Берем на один термин больше, чтобы узнать, есть ли следующая страница
+        terms = self._current().storage.page(limit + 1, after, category, field, descending)
+        next_cursor = None
+        if len(terms) > limit:
+            terms = terms[:limit]
+            next_cursor = encode_cursor(sort_key(terms[-1], field))
+        return terms, next_cursor
+    
+    def get_term(self, keyword: str) -> Optional[TermRecord]:
         """Получить термин по ключевому слову"""
-        return self.terms.get(keyword.lower())
+        return self._current().storage.get(keyword.lower())
     
-    def create_term(self, term: TermCreate) -> Term:
-        """Создать новый термин"""
-        keyword_lower = term.keyword.lower()
-        if keyword_lower in self.terms:
-            raise ValueError(f"Термин с ключевым словом '{term.keyword}' уже существует")
+    def get_terms(self, keywords: List[str]) -> Dict[str, TermRecord]:
+        """Несколько терминов за одно обращение к хранилищу (ключ — id термина, в порядке запроса)"""
+        term_ids = list(dict.fromkeys(keyword.lower() for keyword in keywords))
+        found = self._current().storage.get_many(term_ids)
+        return {term_id: found[term_id] for term_id in term_ids if term_id in found}
+    
+    def get_related(self, term: TermRecord) -> List[TermListItem]:
+        """Краткие данные существующих связанных терминов в порядке related_terms"""
+        related_ids = list(dict.fromkeys(related.lower() for related in term.related_terms))
+        found = self._current().storage.get_many(related_ids)
+        return [
+            TermListItem(id=t.id, keyword=t.keyword, title=t.title, category=t.category)
+            for t in (found.get(term_id) for term_id in related_ids) if t is not None
+        ]
+    
+    def term_batches(self, batch_size: int = 1000) -> Callable[[Optional[TermRecord]], List[TermRecord]]:
+        """
+        Чтение пачек из текущего снимка: функция возвращает до batch_size
+        терминов (в порядке id) после термина last, None — с начала. Пачки
+        читаются независимыми вызовами, в том числе из разных потоков
+        """
+        storage = self._current().storage
         
-        now = datetime.now()
-        new_term = Term(
-            id=keyword_lower,
-            keyword=term.keyword,
-            title=term.title,
-            definition=term.definition,
-            source=term.source,
-            category=term.category,
-            related_terms=term.related_terms or [],
-            created_at=now,
-            updated_at=now
-        )
-        self.terms[keyword_lower] = new_term
+        def read_batch(last: Optional[TermRecord]) -> List[TermRecord]:
+            return storage.page(batch_size, None if last is None else sort_key(last, "id"))
+        
+        return read_batch
+    
+    def iter_terms(self, batch_size: int = 1000) -> Iterator[List[TermRecord]]:
+        """
+        Все термины пачками по batch_size (в порядке id), без загрузки целиком
+        в память. Все пачки читаются из одного снимка
+        """
+        read_batch = self.term_batches(batch_size)
+        terms = read_batch(None)
+        while terms:
+            yield terms
+            terms = read_batch(terms[-1])
+    
+    def _index_term(self, term: TermRecord, op: str):
+        """Добавить или обновить термин в индексах черновика"""
+        self._draft.search_index.add(term)
+        self._draft.graph.add(term)
+        self._record(op, term.id)
+    
+    def create_term(self, term: TermCreate) -> TermRecord:
+        """Создать новый термин"""
+        new_term = TermRecord.create(term, to_micros(datetime.now()))
+        with self._write():
+            if not self.storage.insert(new_term):
+                raise ValueError(f"Термин с ключевым словом '{term.keyword}' уже существует")
+            self._index_term(new_term, "create")
         return new_term
     
-    def update_term(self, keyword: str, term_update: TermUpdate) -> Optional[Term]:
+    def import_terms(self, terms: List[TermCreate], mode: str = "error") -> List[str]:
+        """
+        Добавить пачку терминов одной транзакцией.
+        
+        mode задает поведение для уже существующего ключевого слова:
+        "error" — оставить как есть и сообщить о конфликте, "skip" — пропустить,
+        "upsert" — заменить содержимое (дата создания сохраняется).
+        Возвращает итог по каждому термину: created, updated, skipped или conflict.
+        """
+        now = to_micros(datetime.now())
+        results = []
+        with self._write():
+            for term in terms:
+                new_term = TermRecord.create(term, now)
+                if self.storage.insert(new_term):
+                    results.append("created")
+                    self._index_term(new_term, "create")
+                elif mode == "upsert":
+                    existing_term = self.storage.get(new_term.id)
+                    new_term = new_term.replace(created_us=existing_term.created_us)
+                    self.storage.replace(new_term)
+                    results.append("updated")
+                    self._index_term(new_term, "update")
+                else:
+                    results.append("skipped" if mode == "skip" else "conflict")
+        return results
+    
+    def update_term(self, keyword: str, term_update: TermUpdate) -> Optional[TermRecord]:
         """Обновить существующий термин"""
-        keyword_lower = keyword.lower()
-        if keyword_lower not in self.terms:
+        with self._write():
+            return self._apply_update(keyword.lower(), term_update, to_micros(datetime.now()))
+    
+    def _apply_update(self, term_id: str, term_update: TermUpdate, now: int) -> Optional[TermRecord]:
+        """Обновление внутри уже открытой транзакции записи"""
+        existing_term = self.storage.get(term_id)
+        if existing_term is None:
             return None
         
-        existing_term = self.terms[keyword_lower]
         update_data = term_update.model_dump(exclude_unset=True)
-        
+        changes = {
+            field: value for field, value in update_data.items()
+            if field != "related_terms" and value is not None
+        }
         if "related_terms" in update_data:
-            existing_term.related_terms = update_data["related_terms"]
+            changes["related_terms"] = update_data["related_terms"] or []
+        changes["updated_us"] = now
         
-        for field, value in update_data.items():
-            if field != "related_terms" and value is not None:
-                setattr(existing_term, field, value)
-        
-        existing_term.updated_at = datetime.now()
-        return existing_term
+        updated_term = existing_term.replace(**changes)
+        self.storage.replace(updated_term)
+        self._index_term(updated_term, "update")
+        return updated_term
     
     def delete_term(self, keyword: str) -> bool:
         """Удалить термин"""
-        keyword_lower = keyword.lower()
-        if keyword_lower in self.terms:
-            del self.terms[keyword_lower]
-            # Удаляем связи с этим термином из других терминов
-            for term in self.terms.values():
-                if keyword_lower in term.related_terms:
-                    term.related_terms.remove(keyword_lower)
-            return True
-        return False
-    
-    def get_graph_data(self) -> Dict:
-        """Получить данные для графа"""
-        nodes = []
-        edges = []
-        category_colors = {
-            "Концепция": "#3498DB",
-            "Технология": "#4A90E2",
-            "Архитектура": "#9B59B6",
-            "API": "#F39C12",
-            "Функциональность": "#E74C3C",
-            "Дизайн": "#1ABC9C",
-            "Безопасность": "#E91E63",
-            "Инструмент": "#34495E",
-            "Характеристика": "#50C878",
-            "Конфигурация": "#607D8B",
-        }
+        with self._write():
+            return self._apply_delete(keyword.lower())
+    
+    def _apply_delete(self, term_id: str) -> bool:
+        """Удаление внутри уже открытой транзакции записи"""
+        graph = self._draft.graph
+        referrers = graph.referrers(term_id)
+        if not self.storage.delete(term_id):
+            return False
+        # Удаляем связи с этим термином из других терминов —
+        # только у тех, кто на него ссылается
+        self.storage.remove_related(term_id, referrers)
+        self._draft.search_index.remove(term_id)
+        graph.remove(term_id)
+        self._record("delete", term_id)
+        for referrer in referrers:
+            term = self.storage.get(referrer)
+            if term is not None:
+                graph.add(term)
+                self._record("update", referrer)
+        return True
+    
+    def apply_batch(self, operations: List[BatchOperation]) -> List[Optional[TermRecord]]:
+        """
+        Применить пакет операций create/update/delete одной транзакцией
+        (одно изменение версии данных).
         
-        for term in self.terms.values():
-            nodes.append({
-                "id": term.id,
-                "label": term.title,
-                "title": term.title,
-                "definition": term.definition,
-                "source": term.source,
-                "category": term.category,
-                "group": term.category or "Другое",
-                "color": category_colors.get(term.category, "#95A5A6")
-            })
+        Сначала проверяются все операции: если хоть одна невыполнима,
+        ValueError и ничего не меняется. Возвращает термин после каждой
+        операции (None для delete).
+        """
+        now = to_micros(datetime.now())
+        results: List[Optional[TermRecord]] = []
+        with self._write():
+            exists: Dict[str, bool] = {}
+            for number, operation in enumerate(operations, 1):
+                keyword = operation.term.keyword if operation.op == "create" else operation.keyword
+                term_id = keyword.lower()
+                if term_id not in exists:
+                    exists[term_id] = self.storage.get(term_id) is not None
+                if operation.op == "create":
+                    if exists[term_id]:
+                        raise ValueError(f"Операция {number}: термин с ключевым словом '{keyword}' уже существует")
+                    exists[term_id] = True
+                else:
+                    if not exists[term_id]:
+                        raise ValueError(f"Операция {number}: термин '{keyword}' не найден")
+                    if operation.op == "delete":
+                        exists[term_id] = False
             
-            for related_keyword in term.related_terms:
-                related_term = self.terms.get(related_keyword.lower())
-                if related_term:
-                    edges.append({
-                        "from": term.id,
-                        "to": related_term.id,
-                        "label": "связан с"
-                    })
-        
-        return {"nodes": nodes, "edges": edges}
-
+            for operation in operations:
+                if operation.op == "create":
+                    new_term = TermRecord.create(operation.term, now)
+                    self.storage.insert(new_term)
+                    self._index_term(new_term, "create")
+                    results.append(new_term)
+                elif operation.op == "update":
+                    results.append(self._apply_update(operation.keyword.lower(), operation.changes, now))
+                else:
+                    self._apply_delete(operation.keyword.lower())
+                    results.append(None)
+        return results
+    
+    @property
+    def change_seq(self) -> int:
+        """Номер последнего изменения в журнале (с учетом изменений других процессов)"""
+        self._current()
+        return self.changes.seq
+    
+    def get_changes(self, since: int) -> Optional[List[Change]]:
+        """
+        Изменения после номера since; None, если клиенту нужно перечитать
+        данные целиком (журнал не покрывает все изменения с since)
+        """
+        # Заодно подхватываем в журнал изменения других процессов
+        self._current()
+        return self.changes.since(since)
+    
+    def get_backlinks(self, keyword: str) -> Optional[List[TermRecord]]:
+        """Термины, ссылающиеся на данный; None, если термина нет"""
+        keyword_lower = keyword.lower()
+        snapshot = self._current()
+        if keyword_lower not in snapshot.graph.nodes:
+            return None
+        referrers = sorted(snapshot.graph.referrers(keyword_lower))
+        found = snapshot.storage.get_many(referrers)
+        return [found[term_id] for term_id in referrers if term_id in found]
+    
+    def search(self, query: str, limit: int = 20) -> List[Tuple[TermRecord, float]]:
+        """Полнотекстовый поиск: термины с релевантностью, лучшие первыми"""
+        snapshot = self._current()
+        found = snapshot.search_index.search(query, limit)
+        terms = snapshot.storage.get_many(term_id for term_id, _ in found)
+        return [(terms[term_id], score) for term_id, score in found if term_id in terms]
+    
+    def get_categories(self) -> List[Tuple[Optional[str], int]]:
+        """
+        Категории и число терминов в каждой. Индекс графа обновляет списки
+        терминов по категориям при каждой записи, поэтому подсчет не
+        перебирает термины
+        """
+        return self._current().graph.category_counts()
+    
+    @timed(GRAPH_OPERATION_DURATION, "graph_data")
+    def get_graph_data(self, category: Optional[str] = None) -> Dict:
+        """
+        Получить данные для графа (целиком или подграф одной категории)
+        с координатами узлов общей раскладки всего графа
+        """
+        snapshot = self._current()
+        positions = self.get_layout(snapshot)
+        return snapshot.graph.graph_data(category, positions)
+    
+    @timed(GRAPH_OPERATION_DURATION, "layout")
+    def get_layout(self, snapshot: Optional[Snapshot] = None) -> Optional[List[Optional[Tuple[float, float]]]]:
+        """
+        Координаты узлов по номерам из последней готовой раскладки (None,
+        если раскладка недоступна или еще не посчитана)
+        """
+        snapshot = snapshot if snapshot is not None else self._current()
+        return self.layout.positions(snapshot.revision, snapshot.graph)
+    
+    @timed(GRAPH_OPERATION_DURATION, "analytics")
+    def get_graph_analytics(self) -> AnalyticsResult:
+        """
+        Метрики графа: для текущей версии, если они готовы, иначе последние
+        посчитанные (новые считаются в фоне). Без NumPy — AnalyticsUnavailable
+        """
+        snapshot = self._current()
+        return self.analytics.get(snapshot.revision, snapshot.graph)
+    
+    @timed(GRAPH_OPERATION_DURATION, "neighborhood")
+    def get_neighborhood(
+        self,
+        keyword: str,
+        depth: int,
+        max_nodes: int,
+        max_edges: int,
+        direction: str = "both"
+    ) -> Optional[Tuple[Dict, bool]]:
+        """
+        Подграф вокруг термина радиусом depth и признак обрезки по лимитам;
+        None, если термина нет
+        """
+        keyword_lower = keyword.lower()
+        graph = self._current().graph
+        if keyword_lower not in graph.nodes:
+            return None
+        return graph.neighborhood(keyword_lower, depth, max_nodes, max_edges, direction)
+    
+    @timed(GRAPH_OPERATION_DURATION, "path")
+    def find_path(
+        self,
+        source: str,
+        target: str,
+        max_depth: int,
+        direction: str = "both"
+    ) -> Optional[Dict]:
+        """
+        Кратчайший путь между терминами в виде подграфа (пустого, если пути нет);
+        None, если одного из терминов нет
+        """
+        source_lower, target_lower = source.lower(), target.lower()
+        graph = self._current().graph
+        if source_lower not in graph.nodes or target_lower not in graph.nodes:
+            return None
+        path = graph.shortest_path(source_lower, target_lower, max_depth, direction)
+        if path is None:
+            return {"nodes": [], "edges": []}
+        return graph.path_subgraph(path)
 
-# Глобальный экземпляр базы данных
-db = Database()
@@ -0,0 +1,457 @@
+"""
+Индекс семантического графа терминов.
+
+Хранит прямые связи (related_terms), обратные ссылки и множества узлов по
+категориям. Все структуры обновляются за O(степени узла) при каждом
+изменении термина, поэтому удаление и чтение графа не зависят от размера
+всего глоссария. Индекс копируется при записи (fork), опубликованная копия
+не меняется — ее читают без блокировок.
+
+Связи хранятся компактно: узлы пронумерованы (records.Symbols), списки
+смежности — массивы номеров в формате CSR (Adjacency). Словари узлов и
+ребер в формате ответа собираются при чтении графа.
+"""
+import copy
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from records import Symbols, TermRecord
+from snapshot import CopyOnWrite, CowDict, CowOrderedDict, CowSortedList
+
+CATEGORY_COLORS = {
+    "Концепция": "#3498DB",
+    "Технология": "#4A90E2",
+    "Архитектура": "#9B59B6",
+    "API": "#F39C12",
+    "Функциональность": "#E74C3C",
+    "Дизайн": "#1ABC9C",
+    "Безопасность": "#E91E63",
+    "Инструмент": "#34495E",
+    "Характеристика": "#50C878",
+    "Конфигурация": "#607D8B",
+}
+DEFAULT_COLOR = "#95A5A6"
+DEFAULT_GROUP = "Другое"
+EDGE_LABEL = "связан с"
+
+# Направления обхода: по исходящим связям, по входящим или в обе стороны
+DIRECTIONS = ("out", "in", "both")
+
+
+def node_dict(term: TermRecord, position: Optional[Tuple[float, float]] = None) -> Dict:
+    """Узел графа для термина (с координатами раскладки, если они есть)"""
+    x, y = position if position is not None else (None, None)
+    return {
+        "id": term.id,
+        "label": term.title,
+        "title": term.title,
+        "definition": term.definition,
+        "source": term.source,
+        "category": term.category,
+        "group": term.category or DEFAULT_GROUP,
+        "color": CATEGORY_COLORS.get(term.category, DEFAULT_COLOR),
+        "x": x,
+        "y": y
+    }
+
+
+_EMPTY = array("i")
+
+
+class Adjacency:
+    """
+    Списки смежности по номерам узлов в формате CSR: все списки подряд
+    в массиве targets, список узла n — targets[offsets[n]:offsets[n + 1]].
+
+    Массивы после сборки не меняются, поэтому копия (copy.copy) разделяет их
+    с оригиналом. Измененные списки хранятся отдельно (changed) и, когда их
+    становится много, вливаются в новые массивы (compact) — в среднем
+    O(1) на изменение.
+    """
+
+    __slots__ = ("_offsets", "_targets", "_changed", "_owned")
+
+    # Массивы пересобираются, когда измененных списков больше этой доли узлов
+    COMPACT_RATIO = 0.5
+    COMPACT_MIN = 4096
+
+    def __init__(self):
+        self._offsets = array("q", [0])
+        self._targets = array("i")
+        # номер узла -> новый список
+        self._changed: CowDict = CowDict()
+        # узлы, чьи списки в changed созданы этой копией (их можно менять на месте)
+        self._owned: Set[int] = set()
+
+    def __copy__(self) -> "Adjacency":
+        clone = Adjacency.__new__(Adjacency)
+        clone._offsets = self._offsets
+        clone._targets = self._targets
+        clone._changed = copy.copy(self._changed)
+        clone._owned = set()
+        # Списки теперь общие: менять их на месте нельзя ни одной из сторон
+        self._owned = set()
+        return clone
+
+    def get(self, node: int) -> array:
+        """Список узла (пустой, если его нет); менять его нельзя"""
+        changed = self._changed.get(node)
+        if changed is not None:
+            return changed
+        offsets = self._offsets
+        if node + 1 < len(offsets):
+            return self._targets[offsets[node]:offsets[node + 1]]
+        return _EMPTY
+
+    def set(self, node: int, targets: array) -> None:
+        """Заменить список узла"""
+        self._maybe_compact()
+        self._changed[node] = targets
+        self._owned.add(node)
+
+    def _writable(self, node: int) -> array:
+        if node in self._owned:
+            return self._changed[node]
+        targets = array("i", self.get(node))
+        self.set(node, targets)
+        return targets
+
+    def insert_sorted(self, node: int, target: int) -> None:
+        """Добавить target в упорядоченный список без повторов"""
+        targets = self._writable(node)
+        index = bisect_left(targets, target)
+        if index == len(targets) or targets[index] != target:
+            targets.insert(index, target)
+
+    def discard_sorted(self, node: int, target: int) -> None:
+        """Убрать target из упорядоченного списка"""
+        current = self.get(node)
+        index = bisect_left(current, target)
+        if index < len(current) and current[index] == target:
+            del self._writable(node)[index]
+
+    def _maybe_compact(self) -> None:
+        nodes = len(self._offsets) - 1
+        if len(self._changed) >= max(self.COMPACT_MIN, nodes * self.COMPACT_RATIO):
+            self.compact()
+
+    def compact(self) -> None:
+        """Собрать новые массивы из прежних и измененных списков"""
+        changed = self._changed
+        if not changed:
+            return
+        base_offsets, base_targets = self._offsets, self._targets
+        size = max(len(base_offsets) - 1, max(changed) + 1)
+        offsets = array("q", [0])
+        targets = array("i")
+        for node in range(size):
+            node_targets = changed.get(node)
+            if node_targets is not None:
+                targets.extend(node_targets)
+            elif node + 1 < len(base_offsets):
+                targets.extend(base_targets[base_offsets[node]:base_offsets[node + 1]])
+            offsets.append(len(targets))
+        self._offsets = offsets
+        self._targets = targets
+        self._changed = CowDict()
+        self._owned = set()
+
+
+class GraphIndex(CopyOnWrite):
+    """Списки смежности, обратные ссылки и узлы по категориям"""
+
+    def __init__(self, symbols: Optional[Symbols] = None):
+        # Номера узлов (общие с поисковым индексом того же снимка)
+        self.symbols = symbols if symbols is not None else Symbols()
+        # id -> запись термина (порядок вставки = порядок узлов в ответе)
+        self.nodes: CowOrderedDict = CowOrderedDict()
+        # номер -> номера связанных (в порядке related_terms, в том числе еще не созданных)
+        self.forward = Adjacency()
+        # номер -> номера терминов, которые на него ссылаются (по возрастанию)
+        self.backlinks = Adjacency()
+        # категория -> id узлов по возрастанию (списки копируются по блокам)
+        self.categories: Dict[Optional[str], CowSortedList] = {}
+        # общее число ребер между существующими узлами
+        self.edge_count = 0
+
+    def rebuild(self, terms: Iterable[TermRecord]) -> None:
+        """Построить индекс заново"""
+        self.__init__(self.symbols)
+        for term in terms:
+            self.add(term)
+        self.forward.compact()
+        self.backlinks.compact()
+
+    def category_counts(self) -> List[Tuple[Optional[str], int]]:
+        """Число терминов в каждой категории (None — без категории), по названию"""
+        return sorted(
+            ((category, len(members)) for category, members in self.categories.items()),
+            key=lambda item: (item[0] is None, item[0] or ""),
+        )
+
+    def node(self, term_id: str) -> Optional[Dict]:
+        """Узел графа в формате ответа (None, если узла нет)"""
+        term = self.nodes.get(term_id)
+        return node_dict(term) if term is not None else None
+
+    def _targets(self, term_id: str) -> List[str]:
+        """Существующие узлы, на которые ссылается term_id (в порядке related_terms)"""
+        number = self.symbols.find(term_id)
+        if number is None:
+            return []
+        names, nodes = self.symbols.names, self.nodes
+        return [name for name in map(names.__getitem__, self.forward.get(number)) if name in nodes]
+
+    def _edges(self, term_id: str) -> List[Dict]:
+        """Ребра от term_id к существующим узлам"""
+        return [{"from": term_id, "to": target, "label": EDGE_LABEL} for target in self._targets(term_id)]
+
+    def _incoming(self, term_id: str) -> int:
+        """Число ребер к term_id от других существующих узлов"""
+        number = self.symbols.find(term_id)
+        return sum(
+            self.forward.get(self.symbols.find(source)).count(number)
+            for source in self.referrers(term_id)
+        )
+
+    def _unlink(self, term_id: str) -> None:
+        """Убрать исходящие связи и категорию узла"""
+        number = self.symbols.find(term_id)
+        backlinks = self._own("backlinks")
+        for target in set(self.forward.get(number)):
+            backlinks.discard_sorted(target, number)
+        self._own("forward").set(number, _EMPTY)
+        category = self.nodes[term_id].category
+        members = self._own_item("categories", category, CowSortedList)
+        members.remove(term_id)
+        if not members:
+            del self.categories[category]
+
+    def add(self, term: TermRecord) -> None:
+        """Добавить термин или обновить уже существующий"""
+        is_new = term.id not in self.nodes
+        if not is_new:
+            self.edge_count -= len(self._targets(term.id))
+            self._unlink(term.id)
+
+        number = self.symbols.number(term.id)
+        self._own("nodes")[term.id] = term
+        targets = array("i", [self.symbols.number(related.lower()) for related in term.related_terms])
+        self._own("forward").set(number, targets)
+        backlinks = self._own("backlinks")
+        for target in set(targets):
+            backlinks.insert_sorted(target, number)
+        self._own_item("categories", term.category, CowSortedList).add(term.id)
+        self.edge_count += len(self._targets(term.id))
+
+        if is_new:
+            # Ссылки на этот термин, сделанные до его создания, становятся ребрами
+            self.edge_count += self._incoming(term.id)
+
+    def remove(self, term_id: str) -> None:
+        """Удалить термин"""
+        if term_id not in self.nodes:
+            return
+        self.edge_count -= len(self._targets(term_id)) + self._incoming(term_id)
+        self._unlink(term_id)
+        del self._own("nodes")[term_id]
+
+    def referrers(self, term_id: str) -> Set[str]:
+        """Существующие термины, ссылающиеся на term_id (кроме него самого)"""
+        number = self.symbols.find(term_id)
+        if number is None:
+            return set()
+        names, nodes = self.symbols.names, self.nodes
+        return {
+            names[source] for source in self.backlinks.get(number)
+            if source != number and names[source] in nodes
+        }
+
+    def incident_edges(self, term_id: str) -> List[Dict]:
+        """Ребра от узла и к нему (пусто, если узла нет)"""
+        if term_id not in self.nodes:
+            return []
+        edges = self._edges(term_id)
+        for source in sorted(self.referrers(term_id)):
+            edges.extend(edge for edge in self._edges(source) if edge["to"] == term_id)
+        return edges
+
+    def graph_data(
+        self,
+        category: Optional[str] = None,
+        positions: Optional[List[Optional[Tuple[float, float]]]] = None,
+    ) -> Dict:
+        """
+        Узлы и ребра всего графа или подграфа одной категории.
+        positions — координаты узлов по номерам (layout.GraphLayout)
+        """
+        nodes = self.nodes
+        ids: Iterable[str] = nodes if category is None else self.categories.get(category, ())
+        # Проверка по обычному множеству заметно быстрее, чем по сегментам nodes
+        members = set(ids)
+        # Самый частый путь чтения: номера разворачиваются в id без промежуточных списков
+        names, find, get = self.symbols.names, self.symbols.find, self.forward.get
+        edges: List[Dict] = []
+        append = edges.append
+        for term_id in ids:
+            for target in map(names.__getitem__, get(find(term_id))):
+                if target in members:
+                    append({"from": term_id, "to": target, "label": EDGE_LABEL})
+        if positions is None:
+            return {"nodes": [node_dict(nodes[term_id]) for term_id in ids], "edges": edges}
+        placed = [
+            node_dict(nodes[term_id], positions[number] if number < len(positions) else None)
+            for term_id, number in zip(ids, map(find, ids))
+        ]
+        return {"nodes": placed, "edges": edges}
+
+    def edge_numbers(self) -> Tuple[array, array]:
+        """Ребра между существующими узлами: номера начал и номера концов"""
+        find = self.symbols.find
+        present = {find(term_id) for term_id in self.nodes}
+        sources, targets = array("i"), array("i")
+        for number in present:
+            for target in self.forward.get(number):
+                if target in present:
+                    sources.append(number)
+                    targets.append(target)
+        return sources, targets
+
+    def neighbors(self, term_id: str, direction: str = "both") -> List[str]:
+        """Соседние существующие узлы"""
+        result: List[str] = []
+        if direction in ("out", "both"):
+            result.extend(self._targets(term_id))
+        if direction in ("in", "both"):
+            result.extend(sorted(self.referrers(term_id)))
+        return list(dict.fromkeys(result))
+
+    def _subgraph(self, ids: List[str], max_edges: int) -> Tuple[Dict, bool]:
+        """Узлы ids и ребра между ними (не больше max_edges)"""
+        members = set(ids)
+        edges: List[Dict] = []
+        truncated = False
+        for term_id in ids:
+            for edge in self._edges(term_id):
+                if edge["to"] in members:
+                    if len(edges) >= max_edges:
+                        truncated = True
+                        break
+                    edges.append(edge)
+            if truncated:
+                break
+        return {"nodes": [node_dict(self.nodes[term_id]) for term_id in ids], "edges": edges}, truncated
+
+    def neighborhood(
+        self,
+        term_id: str,
+        depth: int,
+        max_nodes: int,
+        max_edges: int,
+        direction: str = "both",
+    ) -> Tuple[Dict, bool]:
+        """
+        Окрестность узла радиусом depth (обход в ширину), ближайшие узлы первыми.
+        Возвращает подграф и признак того, что он обрезан по лимитам.
+        """
+        visited = {term_id: 0}
+        order = [term_id]
+        frontier = [term_id]
+        truncated = False
+        for level in range(1, depth + 1):
+            next_frontier = []
+            for current in frontier:
+                for neighbor in self.neighbors(current, direction):
+                    if neighbor in visited:
+                        continue
+                    if len(order) >= max_nodes:
+                        truncated = True
+                        break
+                    visited[neighbor] = level
+                    order.append(neighbor)
+                    next_frontier.append(neighbor)
+                if truncated:
+                    break
+            if truncated or not next_frontier:
+                break
+            frontier = next_frontier
+        subgraph, edges_truncated = self._subgraph(order, max_edges)
+        return subgraph, truncated or edges_truncated
+
+    def shortest_path(
+        self,
+        source: str,
+        target: str,
+        max_depth: int,
+        direction: str = "both",
+    ) -> Optional[List[str]]:
+        """
+        Кратчайший путь от source к target (двунаправленный обход в ширину).
+        None, если пути длиной не больше max_depth нет.
+        """
+        if source == target:
+            return [source]
+        # Со стороны target идем против направления связей
+        reverse = {"out": "in", "in": "out", "both": "both"}[direction]
+        parents_forward: Dict[str, Optional[str]] = {source: None}
+        parents_backward: Dict[str, Optional[str]] = {target: None}
+        frontier_forward, frontier_backward = [source], [target]
+
+        for _ in range(max_depth):
+            if not frontier_forward or not frontier_backward:
+                return None
+            # Расширяем меньший фронт — так обход затрагивает меньше узлов
+            expand_forward = len(frontier_forward) <= len(frontier_backward)
+            if expand_forward:
+                frontier, parents, other, step = frontier_forward, parents_forward, parents_backward, direction
+            else:
+                frontier, parents, other, step = frontier_backward, parents_backward, parents_forward, reverse
+
+            next_frontier = []
+            meeting = None
+            for current in frontier:
+                for neighbor in self.neighbors(current, step):
+                    if neighbor in parents:
+                        continue
+                    parents[neighbor] = current
+                    if neighbor in other:
+                        meeting = neighbor
+                        break
+                    next_frontier.append(neighbor)
+                if meeting is not None:
+                    break
+
+            if meeting is not None:
+                path = []
+                node: Optional[str] = meeting
+                while node is not None:
+                    path.append(node)
+                    node = parents_forward[node]
+                path.reverse()
+                node = parents_backward[meeting]
+                while node is not None:
+                    path.append(node)
+                    node = parents_backward[node]
+                return path
+
+            if expand_forward:
+                frontier_forward = next_frontier
+            else:
+                frontier_backward = next_frontier
+        return None
+
+    def path_subgraph(self, path: List[str]) -> Dict:
+        """Узлы пути и ребра между соседними узлами пути (в их настоящем направлении)"""
+        edges = []
+        for a, b in zip(path, path[1:]):
+            for edge in self._edges(a):
+                if edge["to"] == b:
+                    edges.append(edge)
+                    break
+            else:
+                for edge in self._edges(b):
+                    if edge["to"] == a:
+                        edges.append(edge)
+                        break
+        return {"nodes": [node_dict(self.nodes[term_id]) for term_id in path], "edges": edges}
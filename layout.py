@@ -0,0 +1,414 @@
+"""
+Раскладка графа на сервере: координаты узлов для /api/graph.
+
+Силовой алгоритм Фрюхтермана — Рейнгольда, векторизованный на NumPy:
+узлы отталкиваются друг от друга, ребра притягивают свои концы, слабое
+притяжение к центру не дает компонентам связности разлетаться, а длина
+шага ограничена убывающей «температурой». У больших графов дальнее
+отталкивание считается от центров масс ячеек сетки, а точно — только внутри
+ячейки узла: O(N^1.5) вместо O(N²) на итерацию.
+
+Раскладка считается один раз на версию данных в фоновом потоке и общая
+для всех клиентов; запросы графа не ждут расчета, а получают последнюю
+готовую раскладку. После небольших изменений она не строится заново: прежние координаты
+сохраняются, новые узлы ставятся рядом со своими соседями, и несколько
+итераций двигают только измененные узлы и их соседей — картинка у клиентов
+остается узнаваемой.
+
+Сам расчет (_layout) получает только массивы NumPy, поэтому его можно
+выполнить в другом процессе (runner, см. repository.ProcessRunner).
+
+NumPy не обязателен: без него координаты не считаются (x и y — null),
+и фронтенд раскладывает граф сам.
+"""
+import logging
+import threading
+from operator import call
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy не обязателен — без него раскладку делает фронтенд
+    np = None
+
+from graph import GraphIndex
+from records import Symbols, TermRecord
+
+# Желаемое расстояние между связанными узлами (в пикселях фронтенда)
+SPACING = 150.0
+# Итераций при полной раскладке и при дораскладке измененных узлов. Графам
+# больше FULL_ITERATIONS_LIMIT узлов итераций достается меньше (∝ 1/√N, но
+# не меньше MIN_FULL_ITERATIONS) — первая раскладка остается в пределах минуты
+FULL_ITERATIONS = 60
+FULL_ITERATIONS_LIMIT = 10000
+MIN_FULL_ITERATIONS = 20
+INCREMENTAL_ITERATIONS = 30
+# Доля измененных узлов, после которой граф раскладывается заново целиком
+INCREMENTAL_RATIO = 0.2
+# До этого числа пар (двигающиеся узлы x все узлы) отталкивание считается точно
+EXACT_PAIRS = 3000 * 3000
+# Сторона сетки приближенного отталкивания: GRID_FACTOR · N^¼ ячеек, тогда
+# занятых ячеек около √N и дальнее (N · ячеек) и ближнее (ячейки · узлов в
+# ячейке²) отталкивание стоят примерно одинаково
+GRID_FACTOR = 1.2
+# Элементов во временных матрицах попарных расстояний (ограничивает память)
+CHUNK_ELEMENTS = 1 << 21
+# Притяжение к центру: при 4 плотность узлов в круге выходит равномерной
+GRAVITY = 4.0
+# Знаков после запятой в координатах ответа
+PRECISION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class GraphLayout:
+    """
+    Координаты узлов графа, согласованные с версией данных.
+
+    Координаты хранятся массивом по номерам узлов (records.Symbols), узлы
+    без координат — NaN. Расчет идет в одном фоновом потоке, как пересчет
+    аналитики: запрос графа получает последнюю готовую раскладку (или None,
+    пока ее нет) и не ждет расчета, а несколько новых версий подряд дают
+    один расчет по самой новой.
+    """
+
+    def __init__(self, spacing: float = SPACING, seed: int = 0, runner: Optional[Callable[..., Any]] = None):
+        self.spacing = spacing
+        self._seed = seed
+        # runner(функция, *аргументы) выполняет расчет (по умолчанию — в этом потоке)
+        self._runner = runner if runner is not None else call
+        self._condition = threading.Condition()
+        # Готовая раскладка: одна ссылка, чтобы читатели видели согласованное состояние
+        self._state: Optional[_LayoutState] = None
+        # Версия и граф, которые нужно разложить, и версия, которая считается сейчас
+        self._pending: Optional[tuple] = None
+        self._running: Optional[int] = None
+        # Версия, расчет которой упал: ее не пересчитываем на каждом запросе
+        self._failed: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def available(self) -> bool:
+        """Можно ли считать раскладку (установлен ли NumPy)"""
+        return np is not None
+
+    @property
+    def version(self) -> Optional[int]:
+        """Версия данных готовой раскладки (None — раскладки еще нет)"""
+        state = self._state
+        return state.version if state is not None else None
+
+    def positions(self, version: int, graph: GraphIndex) -> Optional[List[Optional[Tuple[float, float]]]]:
+        """
+        Координаты узлов графа версии version: список по номерам узлов,
+        None у номеров без координат. Если готовая раскладка старше version,
+        отдается она (у новых узлов координат нет), а новая считается в фоне.
+        None целиком, если NumPy не установлен, раскладки еще нет или она
+        посчитана для другой нумерации узлов (индексы перестроены, records.Symbols)
+        """
+        if np is None:
+            return None
+        state = self._state
+        if state is None or version > state.version:
+            self.schedule(version, graph)
+        # Номера этого снимка означают другие узлы — прежние координаты не подходят
+        if state is None or state.symbols is not graph.symbols:
+            return None
+        return state.rounded()
+
+    def schedule(self, version: int, graph: GraphIndex) -> None:
+        """Разложить граф версии version в фоне (если эта или более новая еще не готова)"""
+        if np is None:
+            return
+        with self._condition:
+            known = [
+                self._state.version if self._state is not None else None,
+                self._pending[0] if self._pending is not None else None,
+                self._running,
+                self._failed,
+            ]
+            if any(other is not None and other >= version for other in known):
+                return
+            self._pending = (version, graph)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="graph-layout", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def wait(self, version: int, timeout: Optional[float] = None) -> bool:
+        """Дождаться раскладки версии version или новее; False — не дождались"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._state is not None and self._state.version >= version, timeout
+            )
+
+    def compute(self, version: int, graph: GraphIndex) -> None:
+        """Посчитать раскладку версии version в этом потоке и опубликовать ее"""
+        state = self._state
+        symbols = graph.symbols
+        nodes = graph.nodes
+        numbers = np.fromiter(map(symbols.find, nodes), dtype=np.int64, count=len(nodes))
+        sources, targets = graph.edge_numbers()
+        previous = state.previous(symbols) if state is not None else np.full((len(symbols), 2), np.nan)
+        xy = np.full((len(symbols), 2), np.nan)
+        if len(numbers):
+            # Строки матриц расчета — только существующие узлы
+            rows = np.full(len(symbols), -1, dtype=np.int64)
+            rows[numbers] = np.arange(len(numbers))
+            edges = np.stack([
+                rows[np.frombuffer(sources, dtype=np.int32)],
+                rows[np.frombuffer(targets, dtype=np.int32)],
+            ], axis=1) if len(sources) else np.zeros((0, 2), dtype=np.int64)
+            known: Dict[str, TermRecord] = state.nodes if state is not None else {}
+            changed = np.fromiter(
+                (known.get(term_id) is not term for term_id, term in nodes.items()),
+                dtype=bool, count=len(nodes),
+            )
+            xy[numbers] = self._runner(_layout, previous[numbers], edges, changed, self.spacing, self._seed)
+        with self._condition:
+            if self._state is None or version > self._state.version:
+                self._state = _LayoutState(version, symbols, nodes, xy)
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                version, graph = self._pending
+                self._pending = None
+                self._running = version
+            try:
+                self.compute(version, graph)
+            except Exception:
+                logger.exception("Раскладка графа версии %s не посчитана", version)
+                with self._condition:
+                    self._failed = version
+            finally:
+                with self._condition:
+                    self._running = None
+
+
+class _LayoutState:
+    """Раскладка одной версии: нумерация, узлы и координаты по номерам"""
+
+    __slots__ = ("version", "symbols", "nodes", "xy", "_rounded")
+
+    def __init__(self, version: int, symbols: Symbols, nodes: Dict[str, TermRecord], xy):
+        self.version = version
+        self.symbols = symbols
+        # Узлы, для которых посчитана раскладка (словарь снимка не меняется)
+        self.nodes = nodes
+        self.xy = xy
+        self._rounded: Optional[List[Optional[Tuple[float, float]]]] = None
+
+    def rounded(self) -> List[Optional[Tuple[float, float]]]:
+        """Координаты для ответа (считаются один раз на раскладку)"""
+        if self._rounded is None:
+            self._rounded = [
+                None if x != x else (x, y)
+                for x, y in np.round(self.xy, PRECISION).tolist()
+            ]
+        return self._rounded
+
+    def previous(self, symbols: Symbols):
+        """Эти координаты по номерам symbols (NaN — координат нет)"""
+        xy = np.full((len(symbols), 2), np.nan)
+        if symbols is self.symbols:
+            xy[:len(self.xy)] = self.xy
+        else:
+            # Индексы перестроены с новой нумерацией — переносим по id
+            names = self.symbols.names
+            for number in np.flatnonzero(~np.isnan(self.xy[:, 0])).tolist():
+                new_number = symbols.find(names[number])
+                if new_number is not None:
+                    xy[new_number] = self.xy[number]
+        return xy
+
+
+def _layout(pos, edges, changed, spacing: float, seed: int):
+    """Новые координаты узлов: pos — прежние (NaN у новых), changed — измененные"""
+    count = len(pos)
+    rng = np.random.default_rng(seed)
+    radius = spacing * np.sqrt(count) / 2
+    known = ~np.isnan(pos[:, 0])
+    pos = pos.copy()
+    incremental = known.any() and changed.sum() <= INCREMENTAL_RATIO * count
+    if not incremental:
+        # Полная раскладка; прежние координаты — начальное приближение
+        missing = ~known
+        pos[missing] = _random_disk(rng, int(missing.sum()), radius)
+        movable = np.ones(count, dtype=bool)
+        iterations = max(
+            MIN_FULL_ITERATIONS,
+            round(FULL_ITERATIONS * min(1.0, np.sqrt(FULL_ITERATIONS_LIMIT / count))),
+        )
+        temperature = radius / 5
+    else:
+        _place_near_neighbors(pos, edges, ~known, rng, radius, spacing)
+        # Двигаются измененные узлы и их соседи
+        movable = changed.copy()
+        if len(edges):
+            touched = changed[edges[:, 0]] | changed[edges[:, 1]]
+            movable[edges[touched].ravel()] = True
+        iterations, temperature = INCREMENTAL_ITERATIONS, spacing
+    if movable.any():
+        _relax(pos, edges, movable, iterations, temperature, spacing)
+    return pos
+
+
+def _random_disk(rng, count: int, radius: float):
+    """count случайных точек, равномерно в круге радиуса radius"""
+    r = radius * np.sqrt(rng.random(count))
+    angle = rng.random(count) * 2 * np.pi
+    return np.stack([r * np.cos(angle), r * np.sin(angle)], axis=1)
+
+
+def _place_near_neighbors(pos, edges, missing, rng, radius: float, spacing: float) -> None:
+    """Новые узлы — в центр уже размещенных соседей (или в случайную точку круга)"""
+    if not missing.any():
+        return
+    known = ~missing
+    total = np.zeros_like(pos)
+    degree = np.zeros(len(pos))
+    if len(edges):
+        for a, b in ((0, 1), (1, 0)):
+            useful = missing[edges[:, a]] & known[edges[:, b]]
+            np.add.at(total, edges[useful, a], pos[edges[useful, b]])
+            np.add.at(degree, edges[useful, a], 1)
+    linked = missing & (degree > 0)
+    pos[linked] = total[linked] / degree[linked, None] + rng.normal(0, spacing / 2, (int(linked.sum()), 2))
+    alone = missing & (degree == 0)
+    pos[alone] = _random_disk(rng, int(alone.sum()), radius)
+
+
+def _relax(pos, edges, movable, iterations: int, temperature: float, spacing: float) -> None:
+    """Итерации силового алгоритма; меняет pos на месте только у movable"""
+    rows = np.flatnonzero(movable)
+    k2 = spacing * spacing
+    exact = len(rows) * len(pos) <= EXACT_PAIRS
+    if len(edges):
+        # Ребра, хотя бы один конец которых двигается
+        edges = edges[movable[edges[:, 0]] | movable[edges[:, 1]]]
+    for step in range(iterations):
+        if exact:
+            force = _repulsion_exact(pos, rows, k2)
+        else:
+            force = _repulsion_grid(pos, k2)[rows]
+        force -= GRAVITY * pos[rows]
+        if len(edges):
+            # Ребро тянет концы друг к другу с силой d² / spacing
+            delta = pos[edges[:, 1]] - pos[edges[:, 0]]
+            pull = delta * (np.hypot(delta[:, 0], delta[:, 1]) / spacing)[:, None]
+            for axis in (0, 1):
+                attraction = (
+                    np.bincount(edges[:, 0], pull[:, axis], len(pos))
+                    - np.bincount(edges[:, 1], pull[:, axis], len(pos))
+                )
+                force[:, axis] += attraction[rows]
+        # Шаг не длиннее текущей температуры, температура убывает линейно
+        length = np.maximum(np.hypot(force[:, 0], force[:, 1]), 1e-9)
+        limit = temperature * (1 - step / iterations)
+        pos[rows] += force * (np.minimum(length, limit) / length)[:, None]
+
+
+def _push(points, sources, weights, k2: float):
+    """
+    Отталкивание точек points от точек sources с массами weights:
+    сумма k² · масса / d в направлении от источника. Попарные матрицы
+    считаются кусками во float32 — точности для раскладки хватает
+    """
+    force = np.empty((len(points), 2))
+    if not len(sources):
+        force[:] = 0
+        return force
+    sx = sources[:, 0].astype(np.float32)
+    sy = sources[:, 1].astype(np.float32)
+    scale = (k2 * weights).astype(np.float32)
+    chunk = max(1, CHUNK_ELEMENTS // len(sources))
+    for start in range(0, len(points), chunk):
+        part = points[start:start + chunk].astype(np.float32)
+        dx = part[:, 0, None] - sx
+        dy = part[:, 1, None] - sy
+        distance2 = dx * dx
+        distance2 += dy * dy
+        np.maximum(distance2, 1e-2, out=distance2)
+        np.divide(scale, distance2, out=distance2)
+        dx *= distance2
+        dy *= distance2
+        force[start:start + chunk, 0] = dx.sum(axis=1)
+        force[start:start + chunk, 1] = dy.sum(axis=1)
+    return force
+
+
+def _repulsion_exact(pos, rows, k2: float):
+    """Отталкивание узлов rows от всех узлов (от самого себя — ноль)"""
+    return _push(pos[rows], pos, np.ones(len(pos)), k2)
+
+
+def _repulsion_grid(pos, k2: float):
+    """
+    Приближенное отталкивание всех узлов: от центров масс ячеек сетки,
+    а внутри своей ячейки — от каждого узла точно
+    """
+    size = max(2, round(GRID_FACTOR * len(pos) ** 0.25))
+    low = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - low).max()), 1e-9)
+    cell_xy = np.minimum(((pos - low) / span * size).astype(np.int64), size - 1)
+    cell = cell_xy[:, 0] * size + cell_xy[:, 1]
+    mass = np.bincount(cell, minlength=size * size).astype(float)
+    sums = np.stack([
+        np.bincount(cell, pos[:, 0], size * size),
+        np.bincount(cell, pos[:, 1], size * size),
+    ], axis=1)
+    occupied = np.flatnonzero(mass)
+    force = _push(pos, sums[occupied] / mass[occupied, None], mass[occupied], k2)
+
+    # Своя ячейка: вместо ее центра масс — точное отталкивание от соседей по ячейке
+    delta = pos - sums[cell] / mass[cell, None]
+    distance2 = np.maximum(np.einsum("ij,ij->i", delta, delta), 1e-2)
+    force -= delta * (k2 * mass[cell] / distance2)[:, None]
+    force += _push_within_cells(pos, cell, mass[occupied].astype(np.int64), k2)
+    return force
+
+
+def _push_within_cells(pos, cell, counts, k2: float):
+    """
+    Точное отталкивание между узлами одной ячейки. Ячейки идут от меньших
+    к большим, и ячейки близкого размера считаются вместе — матрицей
+    ячейка x место x место (лишние места — с нулевой массой)
+    """
+    order = np.argsort(cell, kind="stable")
+    starts = np.cumsum(counts) - counts
+    by_size = np.argsort(counts, kind="stable")
+    x = pos[order, 0].astype(np.float32)
+    y = pos[order, 1].astype(np.float32)
+    force = np.zeros((len(pos), 2))
+    first = int(np.searchsorted(counts[by_size], 2))
+    while first < len(by_size):
+        width = int(counts[by_size[first]])
+        last = first + 1
+        while last < len(by_size):
+            wider = int(counts[by_size[last]])
+            if (last - first + 1) * wider * wider > CHUNK_ELEMENTS:
+                break
+            width = wider
+            last += 1
+        group = by_size[first:last]
+        places = np.arange(width)
+        present = places < counts[group, None]
+        members = np.where(present, starts[group, None] + places, 0)
+        gx, gy = x[members], y[members]
+        dx = gx[:, :, None] - gx[:, None, :]
+        dy = gy[:, :, None] - gy[:, None, :]
+        distance2 = dx * dx
+        distance2 += dy * dy
+        np.maximum(distance2, 1e-2, out=distance2)
+        np.divide(k2 * present[:, None, :].astype(np.float32), distance2, out=distance2)
+        dx *= distance2
+        dy *= distance2
+        rows = order[members[present]]
+        force[rows, 0] = dx.sum(axis=2)[present]
+        force[rows, 1] = dy.sum(axis=2)[present]
+        first = last
+    return force
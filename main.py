@@ -1,77 +1,461 @@
-from fastapi import FastAPI, HTTPException, status
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
-from typing import List, Dict, Any
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional, Tuple, Union
+import config
+from admission import AdmissionRejected, RateLimited, WriteAdmission
+from analytics import AnalyticsUnavailable
+from assets import StaticAssets
+from cache import ResponseCache, cached_response
+from graph import CATEGORY_COLORS, DEFAULT_COLOR
+from metrics import REGISTRY, MetricsMiddleware, resident_memory_bytes
+from serialization import TERM_ADAPTER, TERM_WITH_RELATED_ADAPTER, encode_json, encode_model, json_response
 from models import (
-    Term, TermCreate, TermUpdate, TermListItem,
-    GraphData, GraphNode, GraphEdge, Message
+    Term, TermCreate, TermUpdate, TermListItem, TermWithRelated, SearchResult,
+    GraphData, GraphAnalyticsReport, CategoryFacet, Message, ImportReport, ImportLineError, ChangeFeed,
+    BatchGetRequest, BatchGetResponse, BatchRequest, BatchResponse, BatchOperationResult
 )
-from database import db
+from repository import GlossaryRepository, RepositoryTimeout, WriteOutcomeUnknown, create_repository
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Сжать статические файлы до первого запроса
+    await run_in_threadpool(get_assets)
+    yield
+    # Пулы потоков и процессов, файлы хранилища
+    if get_repository.cache_info().currsize:
+        get_repository().close()
+
 
 app = FastAPI(
     title="PWA Glossary API",
     description="API для управления глоссарием терминов Progressive Web Apps (PWA) с поддержкой семантического графа",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Подключение статических файлов для фронтенда
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Время, статус и размер каждого ответа — для /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Сколько терминов импорта применяется одной транзакцией
+IMPORT_BATCH_SIZE = 1000
+# Сколько ошибок по строкам включается в отчет об импорте
+MAX_IMPORT_ERRORS = 1000
+# Как часто (в секундах) поток изменений проверяет данные без новых событий
+# и шлет комментарий, чтобы прокси не закрыли соединение
+CHANGE_STREAM_POLL_SECONDS = 5.0
+
+# Готовые ответы для самых частых чтений; сбрасываются сменой версии данных
+response_cache = ResponseCache()
+
+
+@lru_cache(maxsize=None)
+def get_repository() -> GlossaryRepository:
+    """
+    Зависимость обработчиков: репозиторий данных (в тестах заменяется через
+    app.dependency_overrides). Создается при первом запросе, а не при
+    импорте: процессы пула расчетов импортируют главный модуль заново
+    """
+    repository = create_repository()
+    response_cache.etag_prefix = f"{repository.epoch}-"
+    return repository
+
+
+@lru_cache(maxsize=None)
+def get_assets() -> StaticAssets:
+    """Файлы фронтенда: читаются и сжимаются один раз"""
+    return StaticAssets("static")
+
+
+# Ограничение записей: частота по клиенту и число одновременных записей
+write_admission = WriteAdmission(config.WRITE_RATE, config.WRITE_BURST, config.MAX_CONCURRENT_WRITES)
+
+
+async def admit_write(request: Request):
+    """
+    Зависимость обработчиков записи: пропускает запись или отклоняет ее
+    (429 — лимит клиента, 503 — сервер перегружен записями). Клиент — адрес
+    соединения; за прокси запускайте uvicorn с --proxy-headers
+    """
+    client = request.client.host if request.client else "unknown"
+    with write_admission.admit(client) as slot:
+        try:
+            yield
+        except WriteOutcomeUnknown as exc:
+            # Ответ 504 уходит, а запись еще выполняется — место занято до ее конца
+            slot.hold_until(exc.pending)
+            raise
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Запись не допущена — клиент получает Retry-After"""
+    status_code = (
+        status.HTTP_429_TOO_MANY_REQUESTS if isinstance(exc, RateLimited)
+        else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": exc.retry_after_header},
+    )
+
+
+@app.exception_handler(RepositoryTimeout)
+async def repository_timeout_handler(request: Request, exc: RepositoryTimeout):
+    """
+    Операция с данными не уложилась в таймаут — 504, остальные запросы не
+    ждут. Запись, которая уже выполнялась, может еще примениться: в ответе
+    тогда outcome: unknown, а запись, снятая с очереди, не применена
+    (outcome: not_applied)
+    """
+    content = {"detail": str(exc)}
+    if exc.outcome is not None:
+        content["outcome"] = exc.outcome
+    return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT, content=content)
+
+
+# Показатели данных для /metrics; обновляются перед каждой выдачей метрик
+data_stats: Dict[str, int] = {"terms": 0, "edges": 0, "version": 0, "timeouts": 0}
+
+REGISTRY.value_function(
+    "response_cache_hits_total", "Ответы, отданные из кэша", lambda: response_cache.hits, "counter")
+REGISTRY.value_function(
+    "response_cache_misses_total", "Ответы, построенные заново", lambda: response_cache.misses, "counter")
+REGISTRY.value_function("glossary_terms", "Количество терминов", lambda: data_stats["terms"])
+REGISTRY.value_function("glossary_graph_edges", "Количество ребер графа", lambda: data_stats["edges"])
+REGISTRY.value_function("glossary_data_version", "Версия данных", lambda: data_stats["version"])
+REGISTRY.value_function(
+    "repository_timeouts_total", "Операции с данными, не уложившиеся в таймаут",
+    lambda: data_stats["timeouts"], "counter")
+REGISTRY.value_function(
+    "write_requests_in_flight", "Записи, которые выполняются сейчас", lambda: write_admission.in_flight)
+REGISTRY.value_function(
+    "write_requests_rate_limited_total", "Записи, отклоненные по лимиту клиента (429)",
+    lambda: write_admission.rate_limited, "counter")
+REGISTRY.value_function(
+    "write_requests_shed_total", "Записи, отклоненные из-за перегрузки (503)",
+    lambda: write_admission.shed, "counter")
+REGISTRY.value_function(
+    "process_resident_memory_bytes", "Резидентная память процесса", resident_memory_bytes)
+
+
+def cache_key(request: Request) -> Tuple:
+    """Ключ кэша: путь и параметры запроса без учета их порядка"""
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())))
 
 
 @app.get("/", response_class=HTMLResponse)
-async def root():
-    """Главная страница - редирект на фронтенд"""
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta http-equiv="refresh" content="0; url=/static/index.html">
-        <title>PWA Glossary</title>
-    </head>
-    <body>
-        <p>Redirecting to <a href="/static/index.html">frontend</a>...</p>
-    </body>
-    </html>
-    """
-
-
-@app.get("/api/terms", response_model=List[TermListItem], tags=["Термины"])
-async def get_all_terms():
-    """
-    Получить список всех терминов
-    
-    Возвращает упрощенный список всех терминов в глоссарии.
-    """
-    terms = db.get_all_terms()
-    return [
-        TermListItem(
-            id=term.id,
-            keyword=term.keyword,
-            title=term.title,
-            category=term.category
+async def root(request: Request):
+    """Главная страница — оболочка приложения, без перенаправления"""
+    return cached_response(request, get_assets().shell)
+
+
+@app.get("/sw.js", include_in_schema=False)
+async def service_worker(request: Request):
+    """Сервис-воркер; отдается из корня, чтобы управлять всем сайтом"""
+    return cached_response(request, get_assets().service_worker)
+
+
+@app.get("/static/{name:path}", include_in_schema=False)
+async def static_file(name: str, request: Request):
+    """Статические файлы; адреса с хешем содержимого кэшируются навсегда"""
+    entry = get_assets().get(name)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Файл не найден")
+    return cached_response(request, entry)
+
+
+# Поля, которые можно запросить в fields=; по умолчанию — поля TermListItem
+TERM_FIELDS = list(Term.model_fields)
+LIST_FIELDS = list(TermListItem.model_fields)
+
+
+@app.get("/api/terms", response_model=List[Dict[str, Any]], tags=["Термины"])
+async def get_all_terms(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор страницы из заголовка X-Next-Cursor"),
+    category: Optional[str] = Query(None, description="Только термины этой категории"),
+    sort: str = Query("id", description="Поле сортировки: id, title, created_at; '-' в начале — по убыванию"),
+    fields: Optional[str] = Query(None, description="Поля ответа через запятую, например id,title,definition"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
+    """
+    Получить список терминов постранично
+    
+    Возвращает упрощенный список терминов. Если есть следующая страница,
+    ее курсор передается в заголовке **X-Next-Cursor** (и ссылкой в **Link**).
+    Ответ кэшируется до изменения данных и поддерживает ETag / If-None-Match.
+    
+    - **limit**: Размер страницы (по умолчанию 100, максимум 1000)
+    - **cursor**: Курсор для получения следующей страницы
+    - **category**: Фильтр по категории
+    - **sort**: Сортировка (id, title, created_at, с префиксом "-" — по убыванию)
+    - **fields**: Набор полей в ответе (по умолчанию id, keyword, title, category)
+    """
+    selected = LIST_FIELDS
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in TERM_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Неизвестные поля: {', '.join(unknown)}"
+            )
+    
+    # Поля в порядке модели Term — как при model_dump
+    columns = [field for field in TERM_FIELDS if field in selected]
+    
+    async def build():
+        try:
+            version, (terms, next_cursor) = await repository.list_terms(limit, cursor, category, sort)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        
+        headers = {}
+        if next_cursor:
+            next_url = request.url.include_query_params(cursor=next_cursor)
+            headers["X-Next-Cursor"] = next_cursor
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        
+        body = await run_in_threadpool(
+            encode_json, [{field: getattr(term, field) for field in columns} for term in terms]
         )
-        for term in terms
-    ]
+        return version, body, headers
+    
+    entry = await response_cache.get_or_build(cache_key(request), await repository.version(), build)
+    return cached_response(request, entry)
+
+
+@app.get("/api/search", response_model=List[SearchResult], tags=["Термины"])
+async def search_terms(
+    q: str = Query(..., min_length=1, description="Поисковый запрос"),
+    limit: int = Query(20, ge=1, le=1000, description="Максимум результатов"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
+    """
+    Полнотекстовый поиск по ключевому слову, названию и определению
+    
+    - **q**: Поисковый запрос; последнее слово можно не дописывать,
+      допускается одна опечатка в слове
+    - **limit**: Максимальное количество результатов
+    
+    Результаты отсортированы по релевантности.
+    """
+    return json_response(encode_json([
+        {
+            "id": term.id,
+            "keyword": term.keyword,
+            "title": term.title,
+            "category": term.category,
+            "definition": term.definition,
+            "score": round(score, 4)
+        }
+        for term, score in await repository.search(q, limit)
+    ]))
+
+
+@app.get("/api/terms/export", tags=["Термины"])
+async def export_terms(repository: GlossaryRepository = Depends(get_repository)):
+    """
+    Выгрузить весь глоссарий в формате NDJSON
+    
+    Каждая строка — JSON-объект термина (как в GET /api/terms/{keyword}).
+    Термины читаются и отправляются пачками, без загрузки всего списка в память.
+    """
+    def encode(terms: List[Any]) -> bytes:
+        return b"".join(encode_json(term.to_dict()) + b"\n" for term in terms)
+    
+    async def generate():
+        async for terms in repository.iter_terms():
+            yield await run_in_threadpool(encode, terms)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="glossary.ndjson"'}
+    )
+
+
+@app.post("/api/terms/import", response_model=ImportReport, tags=["Термины"], dependencies=[Depends(admit_write)])
+async def import_terms(
+    request: Request,
+    mode: str = Query("error", pattern="^(error|skip|upsert)$", description="Что делать с существующими терминами: error, skip, upsert"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
+    """
+    Массовый импорт терминов из NDJSON
+    
+    Тело запроса — по одному JSON-объекту термина (как в POST /api/terms) на строку;
+    читается потоково. Термины применяются пачками, каждая пачка — одной транзакцией.
+    Ошибочные строки не прерывают импорт и перечисляются в отчете.
+    
+    - **mode**: Поведение для уже существующих ключевых слов:
+      **error** — сообщить об ошибке, **skip** — пропустить, **upsert** — перезаписать
+    """
+    report = ImportReport()
+    batch: List[Tuple[int, TermCreate]] = []
+    
+    def add_error(line: int, error: str):
+        report.failed += 1
+        if len(report.errors) < MAX_IMPORT_ERRORS:
+            report.errors.append(ImportLineError(line=line, error=error))
+    
+    def parse_line(line_no: int, raw: bytes):
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            batch.append((line_no, TermCreate.model_validate_json(raw)))
+        except ValidationError as e:
+            add_error(line_no, "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc']) or 'body'}: {err['msg']}"
+                for err in e.errors()
+            ))
+    
+    async def flush():
+        if not batch:
+            return
+        results = await repository.import_terms([term for _, term in batch], mode)
+        for (line_no, term), result in zip(batch, results):
+            if result == "created":
+                report.created += 1
+            elif result == "updated":
+                report.updated += 1
+            elif result == "skipped":
+                report.skipped += 1
+            else:
+                add_error(line_no, f"Термин с ключевым словом '{term.keyword}' уже существует")
+        batch.clear()
+    
+    line_no = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            line_no += 1
+            parse_line(line_no, raw)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+    if buffer:
+        line_no += 1
+        parse_line(line_no, buffer)
+    await flush()
+    
+    return report
+
+
+@app.post("/api/terms/batch-get", response_model=BatchGetResponse, tags=["Термины"])
+async def batch_get_terms(request: BatchGetRequest, repository: GlossaryRepository = Depends(get_repository)):
+    """
+    Получить несколько терминов одним запросом
+    
+    - **keywords**: Ключевые слова (до 1000, регистр не важен)
+    
+    Ненайденные ключевые слова перечисляются в **missing**.
+    """
+    terms = await repository.get_terms(request.keywords)
+    missing = [keyword for keyword in request.keywords if keyword.lower() not in terms]
+    return BatchGetResponse(
+        terms={term_id: term.to_term() for term_id, term in terms.items()},
+        missing=missing
+    )
+
+
+@app.post("/api/terms/batch", response_model=BatchResponse, tags=["Термины"], dependencies=[Depends(admit_write)])
+async def batch_terms(request: BatchRequest, repository: GlossaryRepository = Depends(get_repository)):
+    """
+    Создать, обновить и удалить несколько терминов одной транзакцией
+    
+    - **operations**: Операции по порядку (до 1000):
+      `{"op": "create", "term": {...}}`, `{"op": "update", "keyword": "...", "changes": {...}}`,
+      `{"op": "delete", "keyword": "..."}`
+    
+    Пакет применяется целиком или не применяется вовсе; версия данных
+    (и кэш ответов) меняется один раз на весь пакет.
+    """
+    try:
+        terms = await repository.apply_batch(request.operations)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return BatchResponse(results=[
+        BatchOperationResult(
+            op=operation.op,
+            keyword=operation.term.keyword if operation.op == "create" else operation.keyword,
+            term=term.to_term() if term is not None else None
+        )
+        for operation, term in zip(request.operations, terms)
+    ])
 
 
-@app.get("/api/terms/{keyword}", response_model=Term, tags=["Термины"])
-async def get_term(keyword: str):
+@app.get("/api/terms/{keyword}", response_model=Union[TermWithRelated, Term], tags=["Термины"])
+async def get_term(
+    keyword: str,
+    expand: Optional[str] = Query(None, pattern="^related$", description="related — добавить связанные термины"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
     """
     Получить информацию о конкретном термине по ключевому слову
     
     - **keyword**: Ключевое слово термина (регистр не важен)
+    - **expand**: `related` — включить в ответ краткие данные связанных терминов
+      (поле **related**), чтобы не запрашивать каждый из них отдельно
     """
-    term = db.get_term(keyword)
-    if not term:
+    # Термин и связанные с ним читаются из одного снимка данных
+    found = await repository.get_term(keyword, related=expand == "related")
+    if found is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Термин с ключевым словом '{keyword}' не найден"
         )
-    return term
+    term, related = found
+    if related is not None:
+        expanded = TermWithRelated.model_construct(**term.to_dict(), related=related)
+        return json_response(encode_model(TERM_WITH_RELATED_ADAPTER, expanded))
+    return json_response(encode_model(TERM_ADAPTER, term.to_term()))
 
 
-@app.post("/api/terms", response_model=Term, status_code=status.HTTP_201_CREATED, tags=["Термины"])
-async def create_term(term: TermCreate):
+@app.get("/api/terms/{keyword}/backlinks", response_model=List[TermListItem], tags=["Термины"])
+async def get_backlinks(keyword: str, repository: GlossaryRepository = Depends(get_repository)):
+    """
+    Получить термины, которые ссылаются на данный (обратные ссылки)
+    
+    - **keyword**: Ключевое слово термина (регистр не важен)
+    """
+    terms = await repository.get_backlinks(keyword)
+    if terms is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Термин с ключевым словом '{keyword}' не найден"
+        )
+    return json_response(encode_json([
+        {
+            "id": term.id,
+            "keyword": term.keyword,
+            "title": term.title,
+            "category": term.category
+        }
+        for term in terms
+    ]))
+
+
+@app.post(
+    "/api/terms", response_model=Term, status_code=status.HTTP_201_CREATED, tags=["Термины"],
+    dependencies=[Depends(admit_write)]
+)
+async def create_term(term: TermCreate, repository: GlossaryRepository = Depends(get_repository)):
     """
     Добавить новый термин в глоссарий
     
@@ -83,8 +467,8 @@ async def create_term(term: TermCreate):
     - **related_terms**: Список связанных терминов (опционально)
     """
     try:
-        new_term = db.create_term(term)
-        return new_term
+        new_term = await repository.create_term(term)
+        return new_term.to_term()
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -92,31 +476,35 @@ async def create_term(term: TermCreate):
         )
 
 
-@app.put("/api/terms/{keyword}", response_model=Term, tags=["Термины"])
-async def update_term(keyword: str, term_update: TermUpdate):
+@app.put("/api/terms/{keyword}", response_model=Term, tags=["Термины"], dependencies=[Depends(admit_write)])
+async def update_term(
+    keyword: str,
+    term_update: TermUpdate,
+    repository: GlossaryRepository = Depends(get_repository)
+):
     """
     Обновить существующий термин
     
     - **keyword**: Ключевое слово термина для обновления
     - Все поля опциональны - обновляются только переданные поля
     """
-    updated_term = db.update_term(keyword, term_update)
+    updated_term = await repository.update_term(keyword, term_update)
     if not updated_term:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Термин с ключевым словом '{keyword}' не найден"
         )
-    return updated_term
+    return updated_term.to_term()
 
 
-@app.delete("/api/terms/{keyword}", response_model=Message, tags=["Термины"])
-async def delete_term(keyword: str):
+@app.delete("/api/terms/{keyword}", response_model=Message, tags=["Термины"], dependencies=[Depends(admit_write)])
+async def delete_term(keyword: str, repository: GlossaryRepository = Depends(get_repository)):
     """
     Удалить термин из глоссария
     
     - **keyword**: Ключевое слово термина для удаления
     """
-    deleted = db.delete_term(keyword)
+    deleted = await repository.delete_term(keyword)
     if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -125,47 +513,284 @@ async def delete_term(keyword: str):
     return Message(message=f"Термин '{keyword}' успешно удален")
 
 
-@app.get("/api/graph", tags=["Граф"])
-async def get_graph_data() -> Dict[str, Any]:
+@app.get("/api/categories", response_model=List[CategoryFacet], tags=["Термины"])
+async def get_categories(request: Request, repository: GlossaryRepository = Depends(get_repository)):
+    """
+    Категории с числом терминов в каждой (для фильтра по категориям)
+    
+    Счетчики поддерживаются при каждой записи, а не считаются по всем
+    терминам. Термины без категории — элемент с **category** = null.
+    Ответ кэшируется до изменения данных и поддерживает ETag / If-None-Match.
+    """
+    async def build():
+        version, categories = await repository.get_categories()
+        facets = [
+            {"category": category, "count": count, "color": CATEGORY_COLORS.get(category, DEFAULT_COLOR)}
+            for category, count in categories
+        ]
+        return version, encode_json(facets), {}
+    
+    entry = await response_cache.get_or_build(cache_key(request), await repository.version(), build)
+    return cached_response(request, entry)
+
+
+@app.get("/api/graph", response_model=GraphData, tags=["Граф"])
+async def get_graph_data(
+    request: Request,
+    category: Optional[str] = Query(None, description="Только узлы этой категории и связи между ними"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
     """
     Получить данные семантического графа для визуализации
     
     Возвращает узлы (термины) и ребра (связи между терминами) для построения графа.
+    У узлов есть координаты серверной раскладки **x**, **y** — граф можно
+    рисовать без симуляции физики. Раскладка считается в фоне: пока она
+    не готова, у новых узлов (или у всех, если раскладки еще нет) x и y —
+    null. Ответ кэшируется до изменения данных или раскладки и
+    поддерживает ETag / If-None-Match.
+    
+    - **category**: Вернуть подграф одной категории (опционально)
     """
-    graph_data = db.get_graph_data()
-    
-    nodes = [
-        GraphNode(
-            id=node["id"],
-            label=node["label"],
-            title=node["title"],
-            definition=node["definition"],
-            source=node.get("source"),
-            category=node.get("category"),
-            group=node.get("group")
+    async def build():
+        # Узлы и ребра собираются индексом сразу в формате GraphNode/GraphEdge
+        # (с координатами раскладки) и кодируются как есть
+        version, graph_data = await repository.get_graph_data(category)
+        return version, await run_in_threadpool(encode_json, graph_data), {}
+    
+    # Готовая новая раскладка меняет ответ (и ETag) без изменения данных
+    key = (*cache_key(request), repository.layout_version)
+    entry = await response_cache.get_or_build(key, await repository.version(), build)
+    return cached_response(request, entry)
+
+
+@app.get("/api/graph/neighborhood/{keyword}", response_model=GraphData, tags=["Граф"])
+async def get_graph_neighborhood(
+    request: Request,
+    keyword: str,
+    depth: int = Query(1, ge=1, le=6, description="Радиус окрестности (число шагов по связям)"),
+    limit: int = Query(200, ge=1, le=5000, description="Максимум узлов"),
+    max_edges: int = Query(1000, ge=0, le=20000, description="Максимум ребер"),
+    direction: str = Query("both", pattern="^(out|in|both)$", description="Направление связей: out, in, both"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
+    """
+    Получить окрестность термина в семантическом графе
+    
+    Обход в ширину от термина на depth шагов; ближайшие узлы идут первыми.
+    Если результат обрезан по limit или max_edges, в ответе есть заголовок
+    **X-Truncated: true**.
+    
+    - **keyword**: Ключевое слово центрального термина
+    - **depth**: Радиус окрестности
+    - **limit**: Максимальное количество узлов
+    - **max_edges**: Максимальное количество ребер
+    - **direction**: По исходящим (out), входящим (in) или всем (both) связям
+    """
+    async def build():
+        version, result = await repository.get_neighborhood(keyword, depth, limit, max_edges, direction)
+        if result is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Термин с ключевым словом '{keyword}' не найден"
+            )
+        graph_data, truncated = result
+        headers = {"X-Truncated": "true"} if truncated else {}
+        return version, await run_in_threadpool(encode_json, graph_data), headers
+    
+    entry = await response_cache.get_or_build(cache_key(request), await repository.version(), build)
+    return cached_response(request, entry)
+
+
+@app.get("/api/graph/path", response_model=GraphData, tags=["Граф"])
+async def get_graph_path(
+    request: Request,
+    source: str = Query(..., alias="from", description="Ключевое слово начального термина"),
+    target: str = Query(..., alias="to", description="Ключевое слово конечного термина"),
+    max_depth: int = Query(8, ge=1, le=20, description="Максимальная длина пути"),
+    direction: str = Query("both", pattern="^(out|in|both)$", description="Направление связей: out, in, both"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
+    """
+    Найти кратчайший путь между двумя терминами
+    
+    Возвращает узлы пути по порядку и ребра между ними. Если пути длиной
+    не больше max_depth нет, узлы и ребра пустые.
+    
+    - **from**: Начальный термин
+    - **to**: Конечный термин
+    - **max_depth**: Максимальная длина пути
+    - **direction**: Только по направлению связей (out), против (in) или без учета направления (both)
+    """
+    async def build():
+        version, graph_data = await repository.find_path(source, target, max_depth, direction)
+        if graph_data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Термин '{source}' или '{target}' не найден"
+            )
+        return version, await run_in_threadpool(encode_json, graph_data), {}
+    
+    entry = await response_cache.get_or_build(cache_key(request), await repository.version(), build)
+    return cached_response(request, entry)
+
+
+@app.get("/api/graph/analytics", response_model=GraphAnalyticsReport, tags=["Граф"])
+async def get_graph_analytics(
+    request: Request,
+    limit: int = Query(100, ge=1, le=100000, description="Сколько терминов с наибольшим PageRank вернуть"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
+    """
+    Аналитика графа связей: центральные термины, компоненты и сообщества
+    
+    Для терминов с наибольшим PageRank возвращаются PageRank, число связей
+    (всего, входящих, исходящих), номера компоненты связности и сообщества.
+    Сводка перечисляет самые большие компоненты (и число терминов без
+    связей) и сообщества с их центральными терминами.
+    
+    Метрики считаются в фоне после изменений данных; пока новые не готовы,
+    возвращаются предыдущие — **version** указывает, для какой версии данных
+    они посчитаны. Первый расчет начинается при старте сервера; если его
+    результата еще нет через 30 с ожидания или на сервере нет NumPy — 503.
+    
+    - **limit**: Сколько терминов вернуть (по убыванию PageRank)
+    """
+    try:
+        result = await repository.get_graph_analytics()
+    except AnalyticsUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
         )
-        for node in graph_data["nodes"]
-    ]
     
-    edges = [
-        GraphEdge.model_validate({
-            "from": edge["from"],
-            "to": edge["to"],
-            "label": edge.get("label")
-        })
-        for edge in graph_data["edges"]
-    ]
+    def build():
+        return result.version, encode_json(result.to_dict(limit)), {}
+    
+    entry = await response_cache.get_or_build(cache_key(request), result.version, build)
+    return cached_response(request, entry)
+
+
+def sse_frame(event: str, data: bytes, event_id: Optional[str] = None) -> bytes:
+    """Одно сообщение Server-Sent Events"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\n".encode("utf-8") + b"data: " + data + b"\n\n"
+
+
+@app.get("/api/changes", response_model=ChangeFeed, tags=["Изменения"])
+async def get_changes(
+    since: int = Query(..., ge=0, description="Номер последнего полученного изменения (seq)"),
+    log: Optional[str] = Query(None, description="ID журнала из предыдущего ответа"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
+    """
+    Получить изменения терминов после номера since
+    
+    Каждое изменение содержит термин, его узел графа и все ребра от него
+    и к нему, так что клиент может обновить список и граф на месте, не
+    перечитывая их. Изменения других воркеров с общей SQLite базой тоже
+    приходят сюда. Если изменения после since уже недоступны (журнал
+    переполнен, сервер перезапущен, история изменений SQLite не покрывает
+    пропущенное), в ответе **reset: true** — данные нужно перечитать целиком.
+    
+    - **since**: seq последнего примененного изменения
+    - **log**: ID журнала; если он не совпадает с текущим — reset
+    """
+    log_id = repository.changes.log_id
+    changes = await repository.get_changes(since) if log in (None, log_id) else None
+    if changes is None:
+        seq, reset, bodies = await repository.change_seq(), b"true", []
+    else:
+        seq, reset, bodies = changes[-1].seq if changes else since, b"false", [c.body for c in changes]
+    return json_response(
+        b'{"log":"' + log_id.encode("ascii") + b'","seq":' + str(seq).encode("ascii")
+        + b',"reset":' + reset + b',"changes":[' + b",".join(bodies) + b"]}"
+    )
+
+
+@app.get("/api/changes/stream", tags=["Изменения"])
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Номер последнего полученного изменения (seq)"),
+    log: Optional[str] = Query(None, description="ID журнала, к которому относится since"),
+    repository: GlossaryRepository = Depends(get_repository)
+):
+    """
+    Поток изменений терминов (Server-Sent Events)
+    
+    События:
+    - **ready** — `{"log", "seq"}`: поток подключен без since, дальше идут только новые изменения
+    - **change** — изменение в формате элемента `changes` из GET /api/changes;
+      id события — `log:seq`, поэтому EventSource при переподключении
+      продолжает с места обрыва (заголовок Last-Event-ID)
+    - **reset** — `{"log", "seq"}`: часть изменений недоступна, данные нужно перечитать
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        event_log, _, event_seq = last_event_id.partition(":")
+        if event_seq.isdigit():
+            log, since = event_log, int(event_seq)
+    changes_log = repository.changes
     
-    graph_result = GraphData(nodes=nodes, edges=edges)
+    def position(event: str, seq: int) -> bytes:
+        return sse_frame(event, encode_json({"log": changes_log.log_id, "seq": seq}))
     
-    # Сериализуем с использованием алиасов для правильного формата JSON
-    return graph_result.model_dump(mode='json', by_alias=True)
+    async def events():
+        if since is None:
+            seq = await repository.change_seq()
+            yield position("ready", seq)
+        elif log not in (None, changes_log.log_id):
+            seq = await repository.change_seq()
+            yield position("reset", seq)
+        else:
+            seq = since
+        while True:
+            changes = await repository.get_changes(seq)
+            if changes is None:
+                seq = await repository.change_seq()
+                yield position("reset", seq)
+            elif changes:
+                yield b"".join(
+                    sse_frame("change", change.body, f"{changes_log.log_id}:{change.seq}")
+                    for change in changes
+                )
+                seq = changes[-1].seq
+            await changes_log.wait(seq, CHANGE_STREAM_POLL_SECONDS)
+            if changes_log.seq == seq:
+                yield b": ping\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/metrics", tags=["Система"], response_class=Response)
+async def metrics(repository: GlossaryRepository = Depends(get_repository)):
+    """
+    Метрики в формате Prometheus
+    
+    Время и размер ответов по маршрутам, запросы в работе, время операций
+    хранилища, построения графа и сериализации, попадания в кэш, число
+    терминов и ребер, память процесса. Метрики считаются в каждом процессе
+    отдельно — при нескольких воркерах собирайте их с каждого.
+    """
+    data_stats.update(await repository.stats())
+    return Response(content=REGISTRY.expose(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/api/health", tags=["Система"])
-async def health_check():
-    """Проверка работоспособности API"""
-    return {"status": "ok", "terms_count": len(db.terms)}
+async def health_check(repository: GlossaryRepository = Depends(get_repository)):
+    """
+    Проверка работоспособности API
+    
+    Показатели берутся из опубликованного снимка данных, без пула потоков и
+    без блокировки записи, поэтому ни долгое построение графа, ни запись или
+    перестройка индексов проверку не задерживают.
+    """
+    stats = await repository.stats()
+    return {"status": "ok", "terms_count": stats["terms"]}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,296 @@
+"""
+Метрики в формате Prometheus (text exposition 0.0.4) без внешних зависимостей.
+
+Счетчики и гистограммы пишутся без блокировок: у каждого потока свой
+набор ячеек (шард), и поток меняет только свои. При выдаче /metrics
+шарды всех потоков суммируются. Значения, которые дешевле посчитать
+в момент запроса (число терминов, память процесса), задаются функциями.
+"""
+import functools
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Границы корзин по умолчанию — секунды, от 100 мкс до 10 с
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Размеры ответов в байтах, от 100 Б до 10 МБ
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Набор метрик и шарды их значений по потокам"""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._local = threading.local()
+        # Шарды всех потоков: (метрика, значения меток) -> ячейка
+        self._shards: List[Dict[Tuple["_Metric", Labels], List[float]]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # Блокировка — только один раз на поток
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def _collect(self, metric: "_Metric") -> Dict[Labels, List[float]]:
+        """Значения метрики, просуммированные по шардам"""
+        totals: Dict[Labels, List[float]] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for (owner, labels), cell in list(shard.items()):
+                if owner is not metric:
+                    continue
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = list(cell)
+                else:
+                    for index, value in enumerate(cell):
+                        total[index] += value
+        return totals
+
+    def register(self, metric: "_Metric") -> "_Metric":
+        self._metrics.append(metric)
+        metric.registry = self
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> "Counter":
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> "Gauge":
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> "Histogram":
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def value_function(
+        self,
+        name: str,
+        documentation: str,
+        function: Callable[[], float],
+        kind: str = "gauge",
+    ) -> "ValueFunction":
+        """Метрика без меток, значение которой вычисляется при выдаче /metrics"""
+        return self.register(ValueFunction(name, documentation, function, kind))
+
+    def expose(self) -> bytes:
+        """Все метрики в текстовом формате Prometheus"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _Metric:
+    kind = "untyped"
+    registry: Registry
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _cell(self, labels: Labels) -> List[float]:
+        shard = self.registry._shard()
+        key = (self, labels)
+        cell = shard.get(key)
+        if cell is None:
+            cell = shard[key] = self._new_cell()
+        return cell
+
+    def _new_cell(self) -> List[float]:
+        return [0]
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(cell[0])}"
+            for labels, cell in sorted(self.registry._collect(self).items())
+        ]
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        self._cell(labels)[0] += amount
+
+
+class Gauge(_Metric):
+    """Значение, которое растет и убывает (например, число запросов в работе)"""
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        self._cell(labels)[0] += amount
+
+    def dec(self, amount: float = 1, labels: Labels = ()) -> None:
+        self._cell(labels)[0] -= amount
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам с суммой и количеством"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_cell(self) -> List[float]:
+        # Счетчики корзин (последняя — +Inf), затем сумма
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        cell = self._cell(labels)
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, cell in sorted(self.registry._collect(self).items()):
+            cumulative = 0
+            for bound, count in zip(bounds, cell):
+                cumulative += count
+                label_str = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(cell[-1])}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class ValueFunction(_Metric):
+    """Значение, вычисляемое функцией при каждой выдаче метрик"""
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float], kind: str):
+        super().__init__(name, documentation)
+        self.function = function
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.function())}"]
+
+
+def timed(histogram: Histogram, *labels: str):
+    """Декоратор: время выполнения функции — в гистограмму с метками labels"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start, labels)
+        return wrapper
+    return decorate
+
+
+def resident_memory_bytes() -> float:
+    """Резидентная память процесса (на Linux — текущая, иначе — пиковая)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:  # нет ни /proc, ни resource (Windows)
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "Запросы, которые обрабатываются сейчас")
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Время обработки запроса",
+    ("method", "route", "status"))
+HTTP_RESPONSE_SIZE = REGISTRY.histogram(
+    "http_response_size_bytes", "Размер тела ответа", ("method", "route"), SIZE_BUCKETS)
+STORAGE_OPERATION_DURATION = REGISTRY.histogram(
+    "storage_operation_duration_seconds", "Время операций хранилища", ("backend", "operation"))
+GRAPH_OPERATION_DURATION = REGISTRY.histogram(
+    "graph_operation_duration_seconds", "Время построения графа и запросов к нему", ("operation",))
+SERIALIZATION_DURATION = REGISTRY.histogram(
+    "serialization_duration_seconds", "Время кодирования ответов в JSON", ("kind",))
+
+# Метка route для запросов вне маршрутов API (статика, 404)
+UNMATCHED_ROUTE = "other"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: время, статус и размер ответа каждого HTTP-запроса.
+    Маршрут берется шаблоном (/api/terms/{keyword}), чтобы число рядов не росло
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Если ответ так и не начат, запрос завершился ошибкой
+        status = "500"
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.observe(duration, (method, route, status))
+            HTTP_RESPONSE_SIZE.observe(size, (method, route))
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 
 
@@ -57,6 +57,24 @@ class TermListItem(BaseModel):
     category: Optional[str] = None
 
 
+class TermWithRelated(Term):
+    """Термин вместе с краткими данными связанных терминов (expand=related)"""
+    related: List[TermListItem] = Field(default=[], description="Существующие связанные термины")
+
+
+class SearchResult(TermListItem):
+    """Результат полнотекстового поиска"""
+    definition: str
+    score: float = Field(..., description="Релевантность (чем больше, тем лучше)")
+
+
+class CategoryFacet(BaseModel):
+    """Категория и число терминов в ней"""
+    category: Optional[str] = Field(..., description="Название категории (null — термины без категории)")
+    count: int
+    color: str = Field(..., description="Цвет узлов категории в графе")
+
+
 class GraphNode(BaseModel):
     """Узел графа для визуализации"""
     id: str
@@ -66,6 +84,10 @@ class GraphNode(BaseModel):
     source: Optional[str] = None
     category: Optional[str] = None
     group: Optional[str] = None  # Для группировки по категориям
+    color: Optional[str] = None  # Цвет категории
+    # Координаты серверной раскладки (null — раскладку делает фронтенд)
+    x: Optional[float] = None
+    y: Optional[float] = None
 
 
 class GraphEdge(BaseModel):
@@ -88,6 +110,133 @@ class GraphData(BaseModel):
     edges: List[GraphEdge]
 
 
+class TermAnalytics(BaseModel):
+    """Метрики термина в графе связей"""
+    id: str
+    title: str
+    pagerank: float = Field(..., description="PageRank (сумма по всем терминам — 1)")
+    degree: int = Field(..., description="Число связей от термина и к нему")
+    in_degree: int = Field(..., description="Число терминов, ссылающихся на термин")
+    out_degree: int = Field(..., description="Число терминов, на которые ссылается термин")
+    component: int = Field(..., description="Номер компоненты связности (0 — самая большая)")
+    community: int = Field(..., description="Номер сообщества (0 — самое большое)")
+
+
+class GroupSize(BaseModel):
+    """Компонента связности или сообщество"""
+    id: int
+    size: int
+
+
+class ComponentsSummary(BaseModel):
+    """Компоненты слабой связности графа"""
+    count: int
+    isolated: int = Field(..., description="Терминов без единой связи")
+    largest: List[GroupSize] = Field(..., description="Самые большие компоненты")
+
+
+class CommunitySize(GroupSize):
+    """Сообщество и его центральные термины"""
+    top_terms: List[str] = Field(..., description="Термины сообщества с наибольшим PageRank")
+
+
+class CommunitiesSummary(BaseModel):
+    """Сообщества терминов (распространение меток)"""
+    count: int
+    modularity: float = Field(..., description="Модулярность разбиения")
+    largest: List[CommunitySize] = Field(..., description="Самые большие сообщества")
+
+
+class GraphAnalyticsReport(BaseModel):
+    """Аналитика графа связей"""
+    version: int = Field(..., description="Версия данных, для которой посчитаны метрики")
+    node_count: int
+    edge_count: int = Field(..., description="Связей без повторов и петель")
+    components: ComponentsSummary
+    communities: CommunitiesSummary
+    terms: List[TermAnalytics] = Field(..., description="Термины с наибольшим PageRank")
+
+
+class ImportLineError(BaseModel):
+    """Ошибка в строке импортируемого файла"""
+    line: int = Field(..., description="Номер строки (с 1)")
+    error: str = Field(..., description="Описание ошибки")
+
+
+class ImportReport(BaseModel):
+    """Итоги импорта терминов"""
+    created: int = Field(0, description="Создано новых терминов")
+    updated: int = Field(0, description="Обновлено существующих терминов")
+    skipped: int = Field(0, description="Пропущено существующих терминов")
+    failed: int = Field(0, description="Строк с ошибками")
+    errors: List[ImportLineError] = Field(default=[], description="Ошибки по строкам (первые 1000)")
+
+
+class BatchGetRequest(BaseModel):
+    """Запрос нескольких терминов сразу"""
+    keywords: List[str] = Field(..., description="Ключевые слова терминов", min_length=1, max_length=1000)
+
+
+class BatchGetResponse(BaseModel):
+    """Найденные термины по ключевым словам"""
+    terms: Dict[str, Term] = Field(..., description="Термины по ключевому слову (в нижнем регистре)")
+    missing: List[str] = Field(default=[], description="Ключевые слова, для которых термин не найден")
+
+
+class BatchOperation(BaseModel):
+    """Одна операция пакетного изменения"""
+    op: Literal["create", "update", "delete"] = Field(..., description="Вид операции")
+    keyword: Optional[str] = Field(None, description="Ключевое слово (для update и delete)")
+    term: Optional[TermCreate] = Field(None, description="Новый термин (для create)")
+    changes: Optional[TermUpdate] = Field(None, description="Изменения (для update)")
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.op == "create" and self.term is None:
+            raise ValueError("Для create нужно поле term")
+        if self.op == "update" and (self.keyword is None or self.changes is None):
+            raise ValueError("Для update нужны поля keyword и changes")
+        if self.op == "delete" and self.keyword is None:
+            raise ValueError("Для delete нужно поле keyword")
+        return self
+
+
+class BatchRequest(BaseModel):
+    """Пакет изменений, применяемый целиком или не применяемый вовсе"""
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=1000)
+
+
+class BatchOperationResult(BaseModel):
+    """Результат одной операции пакета"""
+    op: str
+    keyword: str
+    term: Optional[Term] = Field(None, description="Термин после операции (нет для delete)")
+
+
+class BatchResponse(BaseModel):
+    """Результаты операций в порядке запроса"""
+    results: List[BatchOperationResult]
+
+
+class ChangeEvent(BaseModel):
+    """Изменение одного термина в журнале изменений"""
+    seq: int = Field(..., description="Номер изменения (растет монотонно)")
+    version: int = Field(..., description="Версия данных после изменения")
+    op: Literal["create", "update", "delete"] = Field(..., description="Вид изменения")
+    id: str = Field(..., description="ID термина")
+    term: Optional[Term] = Field(None, description="Термин после изменения (нет для delete)")
+    node: Optional[GraphNode] = Field(None, description="Узел графа термина (нет для delete)")
+    edges: List[GraphEdge] = Field(default=[], description="Все ребра от термина и к нему после изменения")
+
+
+class ChangeFeed(BaseModel):
+    """Изменения после заданного номера"""
+    log: str = Field(..., description="ID журнала; номера seq сравнимы только в пределах одного журнала")
+    seq: int = Field(..., description="Номер последнего изменения — since для следующего запроса")
+    reset: bool = Field(False, description="Изменения недоступны — данные нужно перечитать целиком")
+    changes: List[ChangeEvent] = Field(default=[], description="Изменения по порядку")
+
+
 class Message(BaseModel):
     """Модель для сообщений об ошибках/успехе"""
     message: str
@@ -0,0 +1,320 @@
+"""
+Файлы хранилища в памяти: двоичный снимок и журнал изменений.
+
+Снимок — все термины одной ревизии в компактном двоичном виде: таблица
+уникальных строк (текст UTF-8 и смещения символов) и столбцы номеров строк,
+дат и связей. При чтении файл отображается в память (mmap), столбцы берутся
+как массивы без разбора, а записи TermRecord собираются напрямую — без
+валидации pydantic: в снимок попадают только уже проверенные данные.
+
+Журнал — файл, в конец которого после каждой транзакции дописывается кадр с
+ее изменениями (новые версии терминов и удаленные id). При запуске
+применяются только кадры новее ревизии снимка; уплотнение пишет новый снимок
+и оставляет в журнале лишь хвост, записанный после него.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from records import TermRecord
+
+MAGIC = b"GLOSNAP1"
+FORMAT_VERSION = 1
+
+# Заголовок снимка: сигнатура, версия формата, ревизия, эпоха данных, число
+# терминов, строк в таблице, ссылок related_terms и байт текста строк
+_HEADER = struct.Struct("<8sIxxxxQ8sQQQQ")
+# Кадр журнала: длина данных и их CRC32
+_FRAME = struct.Struct("<II")
+
+# Смещения и номера строк — 32-битные
+_MAX_INDEX = 2 ** 32 - 1
+
+# Строковые поля TermRecord в порядке столбцов снимка
+_STRING_FIELDS = ("id", "keyword", "title", "definition", "source", "category")
+# Поля записи в кадре журнала (порядок аргументов TermRecord)
+_RECORD_FIELDS = TermRecord.__slots__
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+class SnapshotError(ValueError):
+    """Файл снимка поврежден или записан в неизвестном формате"""
+
+
+class SnapshotData(NamedTuple):
+    revision: int
+    epoch: str
+    terms: List[TermRecord]
+
+
+class JournalEntry(NamedTuple):
+    """Изменения одной транзакции: новые версии терминов и удаленные id"""
+    revision: int
+    put: List[TermRecord]
+    delete: List[str]
+
+
+def _padding(size: int) -> bytes:
+    """Выравнивание секций снимка по 8 байт"""
+    return b"\0" * (-size % 8)
+
+
+def _fsync_directory(path: str) -> None:
+    """Зафиксировать на диске переименование файла в каталоге (где это возможно)"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _replace_file(path: str, chunks: Iterable[bytes]) -> int:
+    """Атомарно заменить файл: запись во временный, fsync и os.replace"""
+    temporary = f"{path}.tmp"
+    size = 0
+    with open(temporary, "wb") as file:
+        for chunk in chunks:
+            file.write(chunk)
+            size += len(chunk)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    _fsync_directory(path)
+    return size
+
+
+def _column_bytes(values: array) -> bytes:
+    if not _LITTLE_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode_snapshot(revision: int, epoch: str, terms: Iterable[TermRecord]) -> Iterator[bytes]:
+    # Номер 0 — None; равные строки (id и ссылки на него, категории,
+    # источники) попадают в таблицу один раз
+    numbers: Dict[Optional[str], int] = {None: 0}
+    strings: List[str] = [""]
+    columns = [array("I") for _ in _STRING_FIELDS]
+    created = array("q")
+    updated = array("q")
+    related_offsets = array("I", [0])
+    related = array("I")
+
+    def number(value: Optional[str]) -> int:
+        result = numbers.get(value)
+        if result is None:
+            result = numbers[value] = len(strings)
+            strings.append(value)
+        return result
+
+    for term in terms:
+        for column, field in zip(columns, _STRING_FIELDS):
+            column.append(number(getattr(term, field)))
+        created.append(term.created_us)
+        updated.append(term.updated_us)
+        related.extend(map(number, term.related_terms))
+        related_offsets.append(len(related))
+
+    offsets = array("q", accumulate(map(len, strings), initial=0))
+    if len(strings) > _MAX_INDEX or offsets[-1] > _MAX_INDEX or len(related) > _MAX_INDEX:
+        raise SnapshotError("Слишком большой снимок для 32-битных смещений")
+    text = "".join(strings).encode("utf-8")
+
+    yield _HEADER.pack(
+        MAGIC, FORMAT_VERSION, revision, epoch.encode("ascii")[:8].ljust(8, b"\0"),
+        len(created), len(strings), len(related), len(text),
+    )
+    for values in (array("I", offsets), *columns, created, updated, related_offsets, related):
+        chunk = _column_bytes(values)
+        yield chunk
+        yield _padding(len(chunk))
+    yield text
+
+
+def write_snapshot(path: str, revision: int, epoch: str, terms: Iterable[TermRecord]) -> int:
+    """Записать снимок терминов ревизии revision; возвращает размер файла"""
+    return _replace_file(path, _encode_snapshot(revision, epoch, terms))
+
+
+def _decode_snapshot(view: memoryview) -> SnapshotData:
+    if len(view) < _HEADER.size:
+        raise SnapshotError("Файл снимка обрезан")
+    magic, version, revision, epoch, count, string_count, related_count, text_size = _HEADER.unpack_from(view)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise SnapshotError("Неизвестный формат файла снимка")
+
+    position = _HEADER.size
+
+    def column(typecode: str, length: int) -> List[int]:
+        nonlocal position
+        size = length * array(typecode).itemsize
+        end = position + size
+        if end > len(view):
+            raise SnapshotError("Файл снимка обрезан")
+        if _LITTLE_ENDIAN:
+            values = view[position:end].cast(typecode).tolist()
+        else:
+            swapped = array(typecode, view[position:end])
+            swapped.byteswap()
+            values = swapped.tolist()
+        position = end + (-size % 8)
+        return values
+
+    offsets = column("I", string_count + 1)
+    ids, keywords, titles, definitions, sources, categories = (
+        column("I", count) for _ in _STRING_FIELDS
+    )
+    created = column("q", count)
+    updated = column("q", count)
+    related_offsets = column("I", count + 1)
+    related = column("I", related_count)
+    if position + text_size > len(view):
+        raise SnapshotError("Файл снимка обрезан")
+    text = str(view[position:position + text_size], "utf-8")
+
+    strings: List[Optional[str]] = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+    strings[0] = None
+    terms = [
+        TermRecord(
+            strings[ids[row]],
+            strings[keywords[row]],
+            strings[titles[row]],
+            strings[definitions[row]],
+            strings[sources[row]],
+            strings[categories[row]],
+            created[row],
+            updated[row],
+            [strings[number] for number in related[related_offsets[row]:related_offsets[row + 1]]],
+        )
+        for row in range(count)
+    ]
+    return SnapshotData(revision, epoch.rstrip(b"\0").decode("ascii"), terms)
+
+
+def read_snapshot(path: str) -> Optional[SnapshotData]:
+    """Прочитать снимок; None, если файла нет"""
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise SnapshotError("Файл снимка пуст")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            with memoryview(buffer) as view:
+                return _decode_snapshot(view)
+
+
+def _encode_entry(entry: JournalEntry) -> bytes:
+    payload = json.dumps(
+        [
+            entry.revision,
+            [[getattr(term, field) for field in _RECORD_FIELDS] for term in entry.put],
+            entry.delete,
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode_entry(payload: bytes) -> JournalEntry:
+    revision, put, delete = json.loads(payload.decode("utf-8"))
+    return JournalEntry(revision, [TermRecord(*fields) for fields in put], delete)
+
+
+class Journal:
+    """
+    Журнал изменений: файл кадров (длина, CRC32, JSON изменений транзакции),
+    открытый на дозапись. Кадр, оборванный сбоем посреди записи, при чтении
+    отбрасывается вместе со всем, что за ним.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._file = open(path, "ab")
+
+    @property
+    def size(self) -> int:
+        """Размер журнала в байтах (позиция следующего кадра)"""
+        return self._file.tell()
+
+    def read(self, after_revision: int = -1) -> List[JournalEntry]:
+        """
+        Кадры с ревизией больше after_revision. Оборванный хвост файла
+        обрезается, чтобы новые кадры шли сразу за последним целым.
+        """
+        with open(self.path, "rb") as file:
+            data = file.read()
+        entries: List[JournalEntry] = []
+        position = 0
+        while position + _FRAME.size <= len(data):
+            size, checksum = _FRAME.unpack_from(data, position)
+            start = position + _FRAME.size
+            payload = data[start:start + size]
+            if len(payload) < size or zlib.crc32(payload) != checksum:
+                break
+            try:
+                entry = _decode_entry(payload)
+            except (ValueError, TypeError):
+                break
+            if entry.revision > after_revision:
+                entries.append(entry)
+            position = start + size
+        if position < len(data):
+            self._file.truncate(position)
+            self._file.seek(position)
+        return entries
+
+    def append(self, entry: JournalEntry) -> None:
+        """Дописать кадр; после возврата (при fsync) он переживет сбой"""
+        self._file.write(_encode_entry(entry))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def drop_before(self, position: int) -> None:
+        """Оставить в журнале только кадры, начиная с позиции position"""
+        self._file.flush()
+        with open(self.path, "rb") as file:
+            file.seek(position)
+            tail = file.read()
+        self._file.close()
+        try:
+            _replace_file(self.path, (tail,))
+        finally:
+            self._file = open(self.path, "ab")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def load(snapshot_path: str, journal: Journal) -> Tuple[int, Optional[str], Dict[str, TermRecord]]:
+    """
+    Термины последней зафиксированной ревизии: снимок плюс хвост журнала.
+    Возвращает (ревизия, эпоха снимка или None, термины в порядке добавления)
+    """
+    snapshot = read_snapshot(snapshot_path)
+    revision = snapshot.revision if snapshot is not None else 0
+    terms = {term.id: term for term in snapshot.terms} if snapshot is not None else {}
+    for entry in journal.read(revision):
+        for term_id in entry.delete:
+            terms.pop(term_id, None)
+        for term in entry.put:
+            terms[term.id] = term
+        revision = entry.revision
+    return revision, snapshot.epoch if snapshot is not None else None, terms
@@ -0,0 +1,157 @@
+"""
+Компактное представление терминов в памяти.
+
+Хранилище и индексы держат термин как запись TermRecord со слотами вместо
+модели pydantic: повторяющиеся строки (id, ключевые слова связей, категории,
+источники) хранятся в одном экземпляре (sys.intern), даты — целыми
+микросекундами. Модель Term собирается только на границе API (to_term,
+to_dict). Целые номера терминов для массивов графа и поискового индекса
+выдает Symbols.
+"""
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from models import Term, TermCreate
+
+EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value: datetime) -> int:
+    """Дата (без часового пояса) в микросекундах от 1970-01-01"""
+    return (value - EPOCH) // _MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    """Дата из микросекунд от 1970-01-01"""
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+
+class TermRecord:
+    """
+    Термин во внутреннем представлении.
+
+    Для чтения атрибуты те же, что у Term (created_at и updated_at
+    вычисляются из микросекунд). Запись не меняется после создания:
+    измененный термин — новая запись (replace).
+    """
+
+    __slots__ = (
+        "id", "keyword", "title", "definition", "source", "category",
+        "created_us", "updated_us", "related_terms",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        keyword: str,
+        title: str,
+        definition: str,
+        source: Optional[str],
+        category: Optional[str],
+        created_us: int,
+        updated_us: int,
+        related_terms: Iterable[str] = (),
+    ):
+        self.id = sys.intern(id)
+        self.keyword = sys.intern(keyword)
+        self.title = title
+        self.definition = definition
+        self.source = _intern(source)
+        self.category = _intern(category)
+        self.created_us = created_us
+        self.updated_us = updated_us
+        # Ключевые слова связей — те же объекты строк, что и id терминов
+        self.related_terms = tuple(map(sys.intern, related_terms))
+
+    @classmethod
+    def create(cls, term: TermCreate, now_us: int) -> "TermRecord":
+        """Новый термин из уже провалидированных данных TermCreate"""
+        return cls(
+            id=term.keyword.lower(),
+            keyword=term.keyword,
+            title=term.title,
+            definition=term.definition,
+            source=term.source,
+            category=term.category,
+            created_us=now_us,
+            updated_us=now_us,
+            related_terms=term.related_terms or (),
+        )
+
+    @property
+    def created_at(self) -> datetime:
+        return from_micros(self.created_us)
+
+    @property
+    def updated_at(self) -> datetime:
+        return from_micros(self.updated_us)
+
+    def replace(self, **changes: Any) -> "TermRecord":
+        """Копия записи с измененными полями"""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return TermRecord(**values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Поля в порядке модели Term — как при Term.model_dump()"""
+        return {
+            "keyword": self.keyword,
+            "title": self.title,
+            "definition": self.definition,
+            "source": self.source,
+            "category": self.category,
+            "id": self.id,
+            "created_at": from_micros(self.created_us),
+            "updated_at": from_micros(self.updated_us),
+            "related_terms": list(self.related_terms),
+        }
+
+    def to_term(self) -> Term:
+        """Модель Term для ответа API"""
+        return Term.model_validate(self, from_attributes=True)
+
+    def __repr__(self) -> str:
+        return f"TermRecord(id={self.id!r}, title={self.title!r})"
+
+
+class Symbols:
+    """
+    Целые номера id терминов для компактных массивов индексов.
+
+    Таблица только растет: выданный номер не меняется, поэтому одну таблицу
+    разделяют все снимки индексов (номера, добавленные позже, старым снимкам
+    просто не встречаются). Номера удаленных терминов и ссылок на
+    несуществующие термины остаются до перестройки индексов.
+    """
+
+    def __init__(self):
+        self._numbers: Dict[str, int] = {}
+        # номер -> id
+        self.names: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def find(self, name: str) -> Optional[int]:
+        """Номер id или None, если номера у него еще нет"""
+        return self._numbers.get(name)
+
+    def number(self, name: str) -> int:
+        """Номер id (выдается при первом обращении)"""
+        number = self._numbers.get(name)
+        if number is None:
+            with self._lock:
+                number = self._numbers.get(name)
+                if number is None:
+                    number = len(self.names)
+                    self.names.append(sys.intern(name))
+                    self._numbers[self.names[number]] = number
+        return number
@@ -0,0 +1,444 @@
+"""
+Асинхронный доступ обработчиков API к данным глоссария.
+
+Обработчики FastAPI получают репозиторий через зависимость
+(main.get_repository) и только ждут его корутины — цикл событий не
+блокируется ни вводом-выводом хранилища, ни расчетами.
+
+ThreadedRepository выполняет синхронные методы Database в ограниченных пулах
+потоков: обычные чтения и записи — в одном, построение графа и аналитики —
+в отдельном, чтобы долгий расчет графа не занимал потоки остальных запросов
+(в том числе /api/health). У каждой операции есть таймаут; поток Python
+прервать нельзя: операция, которая не успела начаться, по таймауту
+снимается с очереди, а начатая доделывается в фоне. Запись, начатая до
+таймаута, может все же примениться — ее ошибка (WriteOutcomeUnknown)
+несет future операции, чтобы допуск записей (admission.py) держал место
+до ее конца.
+
+Тяжелые расчеты по массивам NumPy (раскладка и аналитика графа) Database
+передает ProcessRunner — в пул процессов, где они не держат GIL процесса
+сервера.
+"""
+import asyncio
+import multiprocessing
+import signal
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import config
+from analytics import AnalyticsResult
+from changes import Change, ChangeLog
+from database import Database
+from models import BatchOperation, TermCreate, TermListItem, TermUpdate
+from records import TermRecord
+
+
+class RepositoryTimeout(TimeoutError):
+    """
+    Операция репозитория не уложилась в свой таймаут. outcome записи:
+    not_applied — снята с очереди, не выполнялась; None — это не запись
+    """
+
+    def __init__(self, message: str, outcome: Optional[str] = None):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+class WriteOutcomeUnknown(RepositoryTimeout):
+    """
+    Запись не уложилась в таймаут, но уже выполнялась: она может еще
+    примениться. pending завершится, когда запись закончится
+    """
+
+    def __init__(self, message: str, pending: Future):
+        super().__init__(message, "unknown")
+        self.pending = pending
+
+
+class Versioned(NamedTuple):
+    """Результат чтения и версия снимка данных, из которого он прочитан"""
+    version: int
+    value: Any
+
+
+class GlossaryRepository(ABC):
+    """Асинхронный интерфейс данных глоссария для обработчиков API"""
+
+    @property
+    @abstractmethod
+    def epoch(self) -> str:
+        """Идентификатор экземпляра данных (см. StorageBackend.epoch)"""
+
+    @property
+    @abstractmethod
+    def changes(self) -> ChangeLog:
+        """Журнал изменений процесса (log_id, ожидание новых изменений)"""
+
+    @property
+    @abstractmethod
+    def layout_version(self) -> Optional[int]:
+        """Версия данных готовой раскладки графа (None — раскладки еще нет)"""
+
+    @abstractmethod
+    async def version(self) -> int:
+        """Версия данных"""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Количество терминов"""
+
+    @abstractmethod
+    async def list_terms(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+        sort: str = "id",
+    ) -> Versioned:
+        """Страница терминов и курсор следующей страницы (value — пара)"""
+
+    @abstractmethod
+    def iter_terms(self, batch_size: int = 1000) -> AsyncIterator[List[TermRecord]]:
+        """Все термины пачками из одного снимка"""
+
+    @abstractmethod
+    async def search(self, query: str, limit: int = 20) -> List[Tuple[TermRecord, float]]:
+        """Полнотекстовый поиск: термины и их релевантность"""
+
+    @abstractmethod
+    async def get_term(
+        self, keyword: str, related: bool = False
+    ) -> Optional[Tuple[TermRecord, Optional[List[TermListItem]]]]:
+        """
+        Термин и (при related) краткие данные связанных с ним, прочитанные из
+        одного снимка; None, если термина нет
+        """
+
+    @abstractmethod
+    async def get_terms(self, keywords: List[str]) -> Dict[str, TermRecord]:
+        """Найденные термины по ключевым словам"""
+
+    @abstractmethod
+    async def get_backlinks(self, keyword: str) -> Optional[List[TermRecord]]:
+        """Термины, ссылающиеся на данный; None, если термина нет"""
+
+    @abstractmethod
+    async def create_term(self, term: TermCreate) -> TermRecord:
+        """Добавить термин (ValueError, если ключевое слово занято)"""
+
+    @abstractmethod
+    async def update_term(self, keyword: str, term_update: TermUpdate) -> Optional[TermRecord]:
+        """Обновить термин; None, если его нет"""
+
+    @abstractmethod
+    async def delete_term(self, keyword: str) -> bool:
+        """Удалить термин; False, если его не было"""
+
+    @abstractmethod
+    async def import_terms(self, terms: List[TermCreate], mode: str = "error") -> List[str]:
+        """Импорт пачки терминов одной транзакцией; результат по каждому"""
+
+    @abstractmethod
+    async def apply_batch(self, operations: List[BatchOperation]) -> List[Optional[TermRecord]]:
+        """Пакет операций одной транзакцией (ValueError — пакет не применен)"""
+
+    @abstractmethod
+    async def get_categories(self) -> Versioned:
+        """Категории и число терминов в каждой"""
+
+    @abstractmethod
+    async def get_graph_data(self, category: Optional[str] = None) -> Versioned:
+        """Узлы и ребра графа (с координатами раскладки)"""
+
+    @abstractmethod
+    async def get_neighborhood(
+        self, keyword: str, depth: int, max_nodes: int, max_edges: int, direction: str = "both"
+    ) -> Versioned:
+        """Окрестность термина и признак обрезки; value None, если термина нет"""
+
+    @abstractmethod
+    async def find_path(self, source: str, target: str, max_depth: int, direction: str = "both") -> Versioned:
+        """Кратчайший путь в виде подграфа; value None, если термина нет"""
+
+    @abstractmethod
+    async def get_graph_analytics(self) -> AnalyticsResult:
+        """Метрики графа (возможно, посчитанные для предыдущей версии)"""
+
+    @abstractmethod
+    async def change_seq(self) -> int:
+        """Номер последнего изменения в журнале"""
+
+    @abstractmethod
+    async def get_changes(self, since: int) -> Optional[List[Change]]:
+        """Изменения после since; None, если данные нужно перечитать целиком"""
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, int]:
+        """
+        Показатели для /api/health и /metrics: terms, edges, version
+        опубликованного снимка и timeouts (не ждут записей)
+        """
+
+    def close(self) -> None:
+        """Освободить ресурсы"""
+
+
+def _discard_result(future: "asyncio.Future") -> None:
+    """Забрать результат брошенной операции, чтобы ее ошибка не попала в лог как потерянная"""
+    if not future.cancelled():
+        future.exception()
+
+
+def _ignore_interrupts() -> None:
+    """Ctrl+C в терминале получает вся группа процессов; рабочие пула останавливает сервер"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ProcessRunner:
+    """
+    Выполняет функцию в пуле процессов и ждет результата (вызывается из
+    рабочих потоков). Пул создается при первом вызове; процессы запускаются
+    заново (spawn), а не копируются из многопоточного процесса сервера.
+
+    Процессы spawn заново импортируют главный модуль; в скрипте без
+    if __name__ == "__main__" они не запускаются (BrokenProcessPool). Тогда,
+    как и при падении процесса пула, расчеты дальше идут в вызывающем потоке
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Пул сломан — считаем в вызывающем потоке
+        self.broken = False
+
+    def __call__(self, function: Callable[..., Any], *args: Any) -> Any:
+        if self.broken:
+            return function(*args)
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        self.processes, mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_ignore_interrupts,
+                    )
+        try:
+            return self._pool.submit(function, *args).result()
+        except BrokenProcessPool:
+            self.broken = True
+            return function(*args)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ThreadedRepository(GlossaryRepository):
+    """Репозиторий над синхронной Database: вызовы в пулах потоков с таймаутами"""
+
+    def __init__(
+        self,
+        database: Database,
+        threads: int = 8,
+        graph_threads: int = 2,
+        read_timeout: Optional[float] = 10.0,
+        write_timeout: Optional[float] = 30.0,
+        graph_timeout: Optional[float] = 60.0,
+        runner: Optional[ProcessRunner] = None,
+    ):
+        self.database = database
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix="repository")
+        self._graph_executor = ThreadPoolExecutor(graph_threads, thread_name_prefix="repository-graph")
+        self._read_timeout = read_timeout
+        self._write_timeout = write_timeout
+        self._graph_timeout = graph_timeout
+        self._runner = runner
+        # Операции, не уложившиеся в таймаут (для /metrics)
+        self.timeouts = 0
+
+    async def _call(
+        self, executor: Executor, timeout: Optional[float], function: Callable[..., Any], *args: Any,
+        write: bool = False,
+    ) -> Any:
+        pending = executor.submit(function, *args)
+        future = asyncio.wrap_future(pending)
+        try:
+            done, _ = await asyncio.wait((future,), timeout=timeout)
+        except asyncio.CancelledError:
+            # Запрос отменен (клиент ушел) — не начатая операция не нужна
+            pending.cancel()
+            raise
+        if done:
+            return future.result()
+        self.timeouts += 1
+        if function == self._pinned:
+            function = args[0]
+        name = getattr(function, "__name__", "operation")
+        # Операция еще в очереди пула — снимаем ее, она не выполнится
+        if pending.cancel():
+            raise RepositoryTimeout(
+                f"Операция {name} не началась за {timeout:g} с и отменена",
+                "not_applied" if write else None,
+            )
+        # Результат доделанной в фоне операции никому не нужен
+        future.add_done_callback(_discard_result)
+        if write:
+            raise WriteOutcomeUnknown(
+                f"Запись {name} не завершилась за {timeout:g} с и еще выполняется; "
+                "результат неизвестен — проверьте данные перед повтором",
+                pending,
+            )
+        raise RepositoryTimeout(f"Операция {name} не завершилась за {timeout:g} с")
+
+    def _read(self, function: Callable[..., Any], *args: Any):
+        return self._call(self._executor, self._read_timeout, function, *args)
+
+    def _write(self, function: Callable[..., Any], *args: Any):
+        return self._call(self._executor, self._write_timeout, function, *args, write=True)
+
+    def _graph(self, function: Callable[..., Any], *args: Any):
+        return self._call(self._graph_executor, self._graph_timeout, function, *args)
+
+    @property
+    def epoch(self) -> str:
+        return self.database.storage.epoch
+
+    @property
+    def changes(self) -> ChangeLog:
+        return self.database.changes
+
+    @property
+    def layout_version(self) -> Optional[int]:
+        return self.database.layout.version
+
+    async def version(self) -> int:
+        return await self._read(lambda: self.database.version)
+
+    async def count(self) -> int:
+        return await self._read(self.database.count)
+
+    async def list_terms(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+        sort: str = "id",
+    ) -> Versioned:
+        return await self._read(self._pinned, self.database.list_terms, limit, cursor, category, sort)
+
+    async def iter_terms(self, batch_size: int = 1000) -> AsyncIterator[List[TermRecord]]:
+        # Каждая пачка — отдельный вызов в пуле над одним снимком: у вызовов
+        # нет общего состояния, поэтому пачка, не уложившаяся в таймаут,
+        # не мешает следующим
+        read_batch = await self._read(self.database.term_batches, batch_size)
+        terms = await self._read(read_batch, None)
+        while terms:
+            yield terms
+            terms = await self._read(read_batch, terms[-1])
+
+    async def search(self, query: str, limit: int = 20) -> List[Tuple[TermRecord, float]]:
+        return await self._read(self.database.search, query, limit)
+
+    def _pinned(self, function: Callable[..., Any], *args: Any) -> Versioned:
+        """
+        Чтение из одного снимка вместе с его версией: по ней кэш ответов
+        помечает ответ, даже если запись успела пройти во время чтения
+        """
+        with self.database.read() as version:
+            return Versioned(version, function(*args))
+
+    def _term_with_related(
+        self, keyword: str, related: bool
+    ) -> Optional[Tuple[TermRecord, Optional[List[TermListItem]]]]:
+        database = self.database
+        with database.read():
+            term = database.get_term(keyword)
+            if term is None:
+                return None
+            return term, database.get_related(term) if related else None
+
+    async def get_term(
+        self, keyword: str, related: bool = False
+    ) -> Optional[Tuple[TermRecord, Optional[List[TermListItem]]]]:
+        return await self._read(self._term_with_related, keyword, related)
+
+    async def get_terms(self, keywords: List[str]) -> Dict[str, TermRecord]:
+        return await self._read(self.database.get_terms, keywords)
+
+    async def get_backlinks(self, keyword: str) -> Optional[List[TermRecord]]:
+        return await self._read(self.database.get_backlinks, keyword)
+
+    async def create_term(self, term: TermCreate) -> TermRecord:
+        return await self._write(self.database.create_term, term)
+
+    async def update_term(self, keyword: str, term_update: TermUpdate) -> Optional[TermRecord]:
+        return await self._write(self.database.update_term, keyword, term_update)
+
+    async def delete_term(self, keyword: str) -> bool:
+        return await self._write(self.database.delete_term, keyword)
+
+    async def import_terms(self, terms: List[TermCreate], mode: str = "error") -> List[str]:
+        return await self._write(self.database.import_terms, terms, mode)
+
+    async def apply_batch(self, operations: List[BatchOperation]) -> List[Optional[TermRecord]]:
+        return await self._write(self.database.apply_batch, operations)
+
+    async def get_categories(self) -> Versioned:
+        return await self._read(self._pinned, self.database.get_categories)
+
+    async def get_graph_data(self, category: Optional[str] = None) -> Versioned:
+        return await self._graph(self._pinned, self.database.get_graph_data, category)
+
+    async def get_neighborhood(
+        self, keyword: str, depth: int, max_nodes: int, max_edges: int, direction: str = "both"
+    ) -> Versioned:
+        return await self._graph(
+            self._pinned, self.database.get_neighborhood, keyword, depth, max_nodes, max_edges, direction
+        )
+
+    async def find_path(self, source: str, target: str, max_depth: int, direction: str = "both") -> Versioned:
+        return await self._graph(self._pinned, self.database.find_path, source, target, max_depth, direction)
+
+    async def get_graph_analytics(self) -> AnalyticsResult:
+        return await self._graph(self.database.get_graph_analytics)
+
+    async def change_seq(self) -> int:
+        return await self._read(lambda: self.database.change_seq)
+
+    async def get_changes(self, since: int) -> Optional[List[Change]]:
+        return await self._read(self.database.get_changes, since)
+
+    async def stats(self) -> Dict[str, int]:
+        # Опубликованный снимок читается без пула: ответ не ждет ни очередь
+        # операций, ни запись или перестройку индексов
+        return dict(self.database.published_stats(), timeouts=self.timeouts)
+
+    def close(self) -> None:
+        # Операции из очереди отменяются, а начатые дорабатывают: хранилище
+        # нельзя закрыть посреди записи
+        executors = (self._executor, self._graph_executor)
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for executor in executors:
+            executor.shutdown(wait=True)
+        if self._runner is not None:
+            self._runner.close()
+        self.database.storage.close()
+
+
+def create_repository() -> ThreadedRepository:
+    """Репозиторий над базой с бэкендом из настроек"""
+    runner = ProcessRunner(config.GRAPH_PROCESSES) if config.GRAPH_PROCESSES > 0 else None
+    return ThreadedRepository(
+        Database(runner=runner),
+        threads=config.REPOSITORY_THREADS,
+        graph_threads=config.GRAPH_THREADS,
+        read_timeout=config.READ_TIMEOUT,
+        write_timeout=config.WRITE_TIMEOUT,
+        graph_timeout=config.GRAPH_TIMEOUT,
+        runner=runner,
+    )
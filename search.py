@@ -0,0 +1,396 @@
+"""
+Полнотекстовый поиск по терминам.
+
+Инвертированный индекс по полям keyword, title и definition с нормализацией
+русского и английского текста, поиском по префиксу (автодополнение) и
+с допуском одной опечатки. Индекс обновляется инкрементально при каждом
+изменении термина, без полной перестройки, в копии (fork) опубликованного
+индекса — опубликованный читают без блокировок.
+
+Термины в индексе — целые номера (records.Symbols), веса — целые числа;
+вхождения частых слов хранятся в массивах (Postings).
+"""
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from itertools import chain, islice
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from records import Symbols, TermRecord
+from snapshot import CopyOnWrite, CowDict, CowSortedList
+
+# Вес совпадения в зависимости от поля
+FIELD_WEIGHTS = {"keyword": 3, "title": 2, "definition": 1}
+
+# Вес совпадения в зависимости от способа: точное, по префиксу, с опечаткой
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+FUZZY_MATCH = 0.5
+
+# Сколько слов словаря максимум раскрывает один префикс/опечатка
+MAX_EXPANSIONS = 50
+
+# Опечатки ищем только в словах не короче этой длины
+MIN_FUZZY_LENGTH = 4
+
+# Вхождения слов, встречающихся чаще, хранятся в Postings вместо словаря
+LARGE_POSTINGS = 64
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+_RU_SUFFIXES = sorted([
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией",
+    "ать", "ять", "ить", "еть", "ость", "ости", "ение", "ения", "ении",
+    "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ом", "ем",
+    "ам", "ям", "ах", "ях", "ов", "ев", "ей", "ия", "ию", "ья", "ью",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+], key=len, reverse=True)
+
+_EN_SUFFIXES = sorted([
+    "ations", "ation", "ings", "ing", "ies", "es", "ed", "ly", "s",
+], key=len, reverse=True)
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр и замена ё на е"""
+    return text.lower().replace("ё", "е")
+
+
+# Словарь глоссария невелик, а слова повторяются: при перестройке индекса
+# (запуск, импорт) основа почти каждого слова уже вычислена
+@lru_cache(maxsize=1 << 16)
+def stem(token: str) -> str:
+    """Легкий стеммер: отрезает типичные окончания русских и английских слов"""
+    suffixes = _RU_SUFFIXES if _CYRILLIC_RE.search(token) else _EN_SUFFIXES
+    for suffix in suffixes:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Разбить текст на нормализованные основы слов"""
+    if not text:
+        return []
+    return [stem(token) for token in _TOKEN_RE.findall(normalize(text))]
+
+
+def _deletes(word: str) -> Set[str]:
+    """Все варианты слова с одной удаленной буквой"""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Расстояние Дамерау-Левенштейна между a и b не больше 1"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return (
+            len(diff) == 2 and diff[1] == diff[0] + 1
+            and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+        )
+    if la > lb:
+        a, b = b, a
+    # b длиннее a на одну букву
+    for i in range(len(a)):
+        if a[i] != b[i]:
+            return a[i:] == b[i + 1:]
+    return True
+
+
+def _variants(word: str) -> Set[str]:
+    """
+    Ключи слова в индексе опечаток: само слово и варианты без одной буквы.
+    Короче MIN_FUZZY_LENGTH - 1 варианты не нужны — запрос их не ищет
+    """
+    return {variant for variant in _deletes(word) | {word} if len(variant) >= MIN_FUZZY_LENGTH - 1}
+
+
+# Наибольший вес вхождения в Postings (массив беззнаковых 16-битных чисел)
+MAX_WEIGHT = 0xFFFF
+
+_first = itemgetter(0)
+
+
+class Postings:
+    """
+    Вхождения частого слова: номера терминов (по возрастанию) и их веса
+    в массивах, разбитых на блоки. Копия (copy.copy) разделяет блоки
+    с оригиналом, запись копирует только затронутый блок.
+    Интерфейс — как у словаря {номер термина: вес}.
+    """
+
+    __slots__ = ("_docs", "_weights", "_owned", "_size")
+
+    BLOCK_SIZE = 1024
+
+    def __init__(self, items: Optional[Dict[int, int]] = None):
+        self._docs: List[array] = [array("i")]
+        self._weights: List[array] = [array("H")]
+        self._owned: List[bool] = [True]
+        self._size = 0
+        if items:
+            docs = sorted(items)
+            self._docs = [
+                array("i", docs[start:start + self.BLOCK_SIZE])
+                for start in range(0, len(docs), self.BLOCK_SIZE)
+            ]
+            self._weights = [array("H", (min(items[doc], MAX_WEIGHT) for doc in block)) for block in self._docs]
+            self._owned = [True] * len(self._docs)
+            self._size = len(docs)
+
+    def __copy__(self) -> "Postings":
+        clone = Postings.__new__(Postings)
+        clone._docs = list(self._docs)
+        clone._weights = list(self._weights)
+        clone._size = self._size
+        # Блоки теперь общие: первая запись с любой стороны их скопирует
+        clone._owned = [False] * len(self._docs)
+        self._owned = [False] * len(self._docs)
+        return clone
+
+    def __len__(self) -> int:
+        return self._size
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        return chain.from_iterable(map(zip, self._docs, self._weights))
+
+    def _block(self, doc: int) -> int:
+        """Блок, в котором doc есть или должен быть (пустым бывает только единственный блок)"""
+        if len(self._docs) == 1:
+            return 0
+        return max(0, bisect_right(self._docs, doc, key=_first) - 1)
+
+    def _writable(self, index: int) -> Tuple[array, array]:
+        if not self._owned[index]:
+            self._docs[index] = array("i", self._docs[index])
+            self._weights[index] = array("H", self._weights[index])
+            self._owned[index] = True
+        return self._docs[index], self._weights[index]
+
+    def __setitem__(self, doc: int, weight: int) -> None:
+        index = self._block(doc)
+        docs, weights = self._writable(index)
+        position = bisect_left(docs, doc)
+        weight = min(weight, MAX_WEIGHT)
+        if position < len(docs) and docs[position] == doc:
+            weights[position] = weight
+            return
+        docs.insert(position, doc)
+        weights.insert(position, weight)
+        self._size += 1
+        if len(docs) > 2 * self.BLOCK_SIZE:
+            # Переполненный блок делится пополам
+            half = len(docs) // 2
+            self._docs[index:index + 1] = [docs[:half], docs[half:]]
+            self._weights[index:index + 1] = [weights[:half], weights[half:]]
+            self._owned[index:index + 1] = [True, True]
+
+    def __delitem__(self, doc: int) -> None:
+        index = self._block(doc)
+        position = bisect_left(self._docs[index], doc)
+        if position == len(self._docs[index]) or self._docs[index][position] != doc:
+            raise KeyError(doc)
+        docs, weights = self._writable(index)
+        del docs[position]
+        del weights[position]
+        self._size -= 1
+        if not docs and len(self._docs) > 1:
+            del self._docs[index]
+            del self._weights[index]
+            del self._owned[index]
+
+
+class SearchIndex(CopyOnWrite):
+    """Инвертированный индекс терминов"""
+
+    def __init__(self, symbols: Optional[Symbols] = None):
+        # Номера терминов (общие с графом того же снимка)
+        self.symbols = symbols if symbols is not None else Symbols()
+        # основа слова -> {номер термина -> суммарный вес полей} (для частых слов — Postings)
+        self._postings: CowDict = CowDict()
+        # отсортированный словарь для поиска по префиксу (копируется по блокам)
+        self._vocabulary: CowSortedList = CowSortedList()
+        # вариант с удаленной буквой -> слово словаря или кортеж слов (SymSpell, расстояние 1)
+        self._delete_index: CowDict = CowDict()
+        # номер термина -> проиндексированные основы (для удаления)
+        self._doc_tokens: CowDict = CowDict()
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
+
+    def rebuild(self, terms: Iterable[TermRecord]) -> None:
+        """Построить индекс заново"""
+        self.__init__(self.symbols)
+        for term in terms:
+            self.add(term)
+
+    @staticmethod
+    def _term_tokens(term: TermRecord) -> Dict[str, int]:
+        weights: Dict[str, int] = defaultdict(int)
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for token in tokenize(getattr(term, field)):
+                weights[token] += field_weight
+        return dict(weights)
+
+    def _add_variant(self, variant: str, word: str) -> None:
+        words = self._delete_index.get(variant)
+        if words is None:
+            words = word
+        elif type(words) is str:
+            words = (words, word)
+        else:
+            words = words + (word,)
+        self._own("_delete_index")[variant] = words
+
+    def _remove_variant(self, variant: str, word: str) -> None:
+        words = self._delete_index.get(variant)
+        if words is None:
+            return
+        if type(words) is str:
+            if words == word:
+                del self._own("_delete_index")[variant]
+            return
+        remaining = tuple(w for w in words if w != word)
+        self._own("_delete_index")[variant] = remaining[0] if len(remaining) == 1 else remaining
+
+    def add(self, term: TermRecord) -> None:
+        """Добавить (или переиндексировать) термин"""
+        doc = self.symbols.number(term.id)
+        if doc in self._doc_tokens:
+            self._remove(doc)
+        weights = self._term_tokens(term)
+        tokens = []
+        for token, weight in weights.items():
+            known = self._vocabulary.find(token)
+            if known is not None:
+                # Один объект строки на слово для всех терминов
+                token = known
+            else:
+                self._own("_vocabulary").add(token)
+                for variant in _variants(token):
+                    self._add_variant(variant, token)
+            tokens.append(token)
+            postings = self._own_item("_postings", token, dict)
+            postings[doc] = weight
+            if type(postings) is dict and len(postings) > LARGE_POSTINGS:
+                self._postings[token] = Postings(postings)
+        self._own("_doc_tokens")[doc] = tuple(tokens)
+
+    def remove(self, term_id: str) -> None:
+        """Убрать термин из индекса"""
+        doc = self.symbols.find(term_id)
+        if doc is not None:
+            self._remove(doc)
+
+    def _remove(self, doc: int) -> None:
+        tokens = self._own("_doc_tokens").pop(doc, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            postings = self._own_item("_postings", token, dict)
+            del postings[doc]
+            if postings:
+                continue
+            # Слово больше не встречается — убираем его из словаря
+            del self._postings[token]
+            self._own("_vocabulary").remove(token)
+            for variant in _variants(token):
+                self._remove_variant(variant, token)
+
+    def _prefix_matches(self, prefix: str) -> List[str]:
+        vocabulary = self._vocabulary
+        matches = []
+        for word in islice(vocabulary.iter_from(vocabulary.bisect_left(prefix)), MAX_EXPANSIONS):
+            if not word.startswith(prefix):
+                break
+            matches.append(word)
+        return matches
+
+    def _fuzzy_matches(self, word: str) -> List[str]:
+        if len(word) < MIN_FUZZY_LENGTH:
+            return []
+        candidates: Set[str] = set()
+        for variant in _deletes(word) | {word}:
+            words = self._delete_index.get(variant)
+            if words is None:
+                continue
+            if type(words) is str:
+                candidates.add(words)
+            else:
+                candidates.update(words)
+        return [c for c in candidates if _within_one_edit(word, c)][:MAX_EXPANSIONS]
+
+    def _expand(self, raw: str) -> Dict[str, float]:
+        """Слова словаря, подходящие под слово запроса, с весом совпадения"""
+        expansions: Dict[str, float] = {}
+        stemmed = stem(raw)
+        for word in self._fuzzy_matches(stemmed):
+            expansions[word] = FUZZY_MATCH
+        for word in self._prefix_matches(raw):
+            expansions[word] = PREFIX_MATCH
+        if stemmed != raw:
+            for word in self._prefix_matches(stemmed):
+                expansions[word] = PREFIX_MATCH
+        if stemmed in self._postings:
+            expansions[stemmed] = EXACT_MATCH
+        return expansions
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        Найти термины по запросу.
+
+        Каждое слово запроса должно встретиться в термине (точно, по префиксу
+        или с одной опечаткой). Возвращает пары (id термина, релевантность)
+        по убыванию релевантности.
+        """
+        words = _TOKEN_RE.findall(normalize(query))
+        if not words or not self._doc_tokens:
+            return []
+
+        total_docs = len(self._doc_tokens)
+        scores: Optional[Dict[int, float]] = None
+
+        # Сначала самые редкие слова — пересечение сужается быстрее
+        expanded = [self._expand(word) for word in words]
+        expanded.sort(key=lambda ex: sum(len(self._postings[w]) for w in ex))
+
+        for expansions in expanded:
+            word_scores: Dict[int, float] = {}
+            for word, match_weight in expansions.items():
+                postings = self._postings[word]
+                idf = math.log(1 + total_docs / len(postings))
+                for doc, field_weight in postings.items():
+                    if scores is not None and doc not in scores:
+                        continue
+                    score = field_weight * idf * match_weight
+                    if score > word_scores.get(doc, 0.0):
+                        word_scores[doc] = score
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {doc: scores[doc] + s for doc, s in word_scores.items()}
+            if not scores:
+                return []
+
+        # Точное совпадение ключевого слова поднимаем наверх
+        exact_doc = self.symbols.find(query.lower().strip())
+        if exact_doc in scores:
+            scores[exact_doc] += 100.0
+
+        # При равной релевантности — по id, чтобы порядок не зависел от индекса
+        names = self.symbols.names
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], names[item[0]]))
+        return [(names[doc], score) for doc, score in best]
@@ -0,0 +1,67 @@
+"""
+Быстрая сериализация ответов API.
+
+Ответ кодируется в JSON один раз и сразу в байты: готовые словари (узлы и
+ребра графа, поля терминов) — через orjson, модели pydantic — заранее
+собранными сериализаторами TypeAdapter. Повторной валидации и сериализации
+по response_model в FastAPI при этом нет.
+"""
+import json
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from metrics import SERIALIZATION_DURATION
+from models import Term, TermWithRelated
+
+try:
+    import orjson
+except ImportError:  # orjson не обязателен — без него кодируем модулем json
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(content: Any) -> bytes:
+    """JSON в том же виде, что и JSONResponse FastAPI (даты — в ISO 8601)"""
+    start = perf_counter()
+    if orjson is not None:
+        body = orjson.dumps(content)
+    else:
+        body = json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            default=_default,
+        ).encode("utf-8")
+    SERIALIZATION_DURATION.observe(perf_counter() - start, ("json",))
+    return body
+
+
+def encode_model(adapter: TypeAdapter, value: Any) -> bytes:
+    """Модель pydantic в JSON заранее собранным сериализатором"""
+    start = perf_counter()
+    body = adapter.dump_json(value)
+    SERIALIZATION_DURATION.observe(perf_counter() - start, ("model",))
+    return body
+
+
+# Сериализаторы моделей строятся один раз при импорте
+TERM_ADAPTER = TypeAdapter(Term)
+TERM_WITH_RELATED_ADAPTER = TypeAdapter(TermWithRelated)
+
+
+def json_response(body: bytes, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Ответ из уже закодированного JSON"""
+    return Response(content=body, status_code=status_code, headers=headers,
+                    media_type="application/json")
@@ -0,0 +1,395 @@
+"""
+Снимки данных для чтения без блокировок (MVCC).
+
+Опубликованный снимок никогда не меняется: писатель работает с копией,
+а затем атомарно подменяет ссылку на текущий снимок. Читатель берет ссылку
+один раз и до конца запроса видит согласованное состояние одной ревизии.
+
+Чтобы копия не стоила O(размера данных), контейнеры копируются лениво —
+только те, что писатель действительно меняет (copy-on-write), а большие
+словари разбиты на сегменты и копируются по одному сегменту (CowDict),
+а упорядоченные списки — на блоки (CowSortedList).
+"""
+import copy
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class CowDict:
+    """
+    Словарь, копия которого (copy.copy) стоит O(числа сегментов).
+    Сегменты общие с оригиналом до первой записи в них.
+    """
+
+    __slots__ = ("_segments", "_owned", "_mask", "_size")
+
+    # Средний размер сегмента, после которого число сегментов удваивается
+    SEGMENT_SIZE = 1024
+
+    def __init__(self, items: Optional[Dict] = None):
+        self._segments: List[Dict] = [{}]
+        self._owned: List[bool] = [True]
+        self._mask = 0
+        self._size = 0
+        if items:
+            for key, value in items.items():
+                self[key] = value
+
+    def __copy__(self) -> "CowDict":
+        clone = CowDict.__new__(CowDict)
+        clone._segments = list(self._segments)
+        clone._mask = self._mask
+        clone._size = self._size
+        # Сегменты теперь общие: первая запись с любой стороны их скопирует
+        clone._owned = [False] * len(self._segments)
+        self._owned = [False] * len(self._segments)
+        return clone
+
+    def _writable(self, key) -> Dict:
+        index = hash(key) & self._mask
+        if not self._owned[index]:
+            self._segments[index] = dict(self._segments[index])
+            self._owned[index] = True
+        return self._segments[index]
+
+    def _grow(self) -> None:
+        count = len(self._segments) * 2
+        mask = count - 1
+        segments: List[Dict] = [{} for _ in range(count)]
+        for segment in self._segments:
+            for key, value in segment.items():
+                segments[hash(key) & mask][key] = value
+        self._segments = segments
+        self._owned = [True] * count
+        self._mask = mask
+
+    def __getitem__(self, key):
+        return self._segments[hash(key) & self._mask][key]
+
+    def get(self, key, default=None):
+        return self._segments[hash(key) & self._mask].get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._segments[hash(key) & self._mask]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator:
+        return chain.from_iterable(self._segments)
+
+    def keys(self) -> Iterator:
+        return iter(self)
+
+    def values(self) -> Iterator:
+        return chain.from_iterable(map(dict.values, self._segments))
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        return chain.from_iterable(map(dict.items, self._segments))
+
+    def __setitem__(self, key, value) -> None:
+        index = hash(key) & self._mask
+        if not self._owned[index]:
+            self._segments[index] = dict(self._segments[index])
+            self._owned[index] = True
+        segment = self._segments[index]
+        if key not in segment:
+            self._size += 1
+        segment[key] = value
+        if self._size > len(self._segments) * self.SEGMENT_SIZE:
+            self._grow()
+
+    def __delitem__(self, key) -> None:
+        if key not in self:
+            raise KeyError(key)
+        del self._writable(key)[key]
+        self._size -= 1
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self._size -= 1
+        return self._writable(key).pop(key)
+
+
+class CowSortedList:
+    """
+    Упорядоченный список, разбитый на блоки. Копия (copy.copy) стоит
+    O(числа блоков); блоки общие с оригиналом до первой записи в них.
+    Порядок задает функция key(элемент) (None — сами элементы); ее передают
+    в каждую операцию, так как ключи могут зависеть от другого контейнера.
+    """
+
+    __slots__ = ("_chunks", "_owned", "_size")
+
+    # Размер блока при сборке; блок вдвое больше делится пополам
+    CHUNK_SIZE = 512
+
+    def __init__(self, items: Iterable = ()):
+        """items — уже упорядоченные элементы"""
+        items = list(items)
+        size = self.CHUNK_SIZE
+        self._chunks: List[List] = [items[start:start + size] for start in range(0, len(items), size)]
+        self._owned: List[bool] = [True] * len(self._chunks)
+        self._size = len(items)
+
+    def __copy__(self) -> "CowSortedList":
+        clone = self.__class__.__new__(self.__class__)
+        clone._chunks = list(self._chunks)
+        clone._size = self._size
+        # Блоки теперь общие: первая запись с любой стороны их скопирует
+        clone._owned = [False] * len(self._chunks)
+        self._owned = [False] * len(self._chunks)
+        return clone
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator:
+        return chain.from_iterable(self._chunks)
+
+    def _writable(self, index: int) -> List:
+        if not self._owned[index]:
+            self._chunks[index] = list(self._chunks[index])
+            self._owned[index] = True
+        return self._chunks[index]
+
+    def _find(self, value, key: Optional[Callable], right: bool) -> Tuple[int, int]:
+        """Позиция (блок, смещение) для bisect_right (right) или bisect_left по значению ключа"""
+        chunks = self._chunks
+        low, high = 0, len(chunks)
+        # Первый блок, последний ключ которого больше value (не меньше — для bisect_left)
+        while low < high:
+            middle = (low + high) // 2
+            last = chunks[middle][-1]
+            if key is not None:
+                last = key(last)
+            if last < value or (right and last == value):
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(chunks):
+            return self.end()
+        bisect = bisect_right if right else bisect_left
+        return low, bisect(chunks[low], value, key=key)
+
+    def bisect_left(self, value, key: Optional[Callable] = None) -> Tuple[int, int]:
+        return self._find(value, key, False)
+
+    def bisect_right(self, value, key: Optional[Callable] = None) -> Tuple[int, int]:
+        return self._find(value, key, True)
+
+    def find(self, value):
+        """Элемент, равный value (None, если такого нет)"""
+        index, offset = self._find(value, None, False)
+        chunks = self._chunks
+        if index < len(chunks) and offset < len(chunks[index]) and chunks[index][offset] == value:
+            return chunks[index][offset]
+        return None
+
+    def end(self) -> Tuple[int, int]:
+        """Позиция после последнего элемента"""
+        chunks = self._chunks
+        return (len(chunks) - 1, len(chunks[-1])) if chunks else (0, 0)
+
+    def iter_from(self, position: Tuple[int, int]) -> Iterator:
+        """Элементы начиная с позиции"""
+        index, offset = position
+        chunks = self._chunks
+        if index < len(chunks):
+            yield from chunks[index][offset:]
+            for chunk in chunks[index + 1:]:
+                yield from chunk
+
+    def iter_before(self, position: Tuple[int, int]) -> Iterator:
+        """Элементы до позиции в обратном порядке"""
+        index, offset = position
+        chunks = self._chunks
+        if index < len(chunks):
+            yield from reversed(chunks[index][:offset])
+            for chunk in reversed(chunks[:index]):
+                yield from reversed(chunk)
+
+    def append(self, item) -> None:
+        """Добавить элемент, заведомо не меньший всех остальных"""
+        if not self._chunks or len(self._chunks[-1]) >= self.CHUNK_SIZE:
+            self._chunks.append([item])
+            self._owned.append(True)
+        else:
+            self._writable(len(self._chunks) - 1).append(item)
+        self._size += 1
+
+    def add(self, item, key: Optional[Callable] = None) -> None:
+        """Вставить элемент на его место (после равных)"""
+        if not self._chunks:
+            self.append(item)
+            return
+        index, offset = self._find(key(item) if key is not None else item, key, True)
+        chunk = self._writable(index)
+        chunk.insert(offset, item)
+        self._size += 1
+        if len(chunk) >= 2 * self.CHUNK_SIZE:
+            half = len(chunk) // 2
+            self._chunks[index:index + 1] = [chunk[:half], chunk[half:]]
+            self._owned[index:index + 1] = [True, True]
+
+    def remove(self, item, key: Optional[Callable] = None) -> bool:
+        """Убрать элемент; False, если его нет"""
+        if not self._chunks:
+            return False
+        index, offset = self._find(key(item) if key is not None else item, key, False)
+        chunk = self._chunks[index]
+        if offset == len(chunk) or chunk[offset] != item:
+            return False
+        chunk = self._writable(index)
+        del chunk[offset]
+        self._size -= 1
+        if not chunk:
+            del self._chunks[index]
+            del self._owned[index]
+        return True
+
+
+class CowOrderedDict:
+    """
+    Словарь с порядком вставки, копия которого стоит O(числа сегментов и
+    блоков): значения с номерами вставки — в CowDict, ключи по номерам
+    вставки — в CowSortedList. Замена значения не меняет места ключа.
+    """
+
+    __slots__ = ("_entries", "_order", "_next")
+
+    def __init__(self, items: Optional[Dict] = None):
+        self._entries = CowDict()
+        self._next = 0
+        keys = []
+        if items:
+            for key, value in items.items():
+                self._entries[key] = (self._next, value)
+                self._next += 1
+                keys.append(key)
+        self._order = CowSortedList(keys)
+
+    def __copy__(self) -> "CowOrderedDict":
+        clone = CowOrderedDict.__new__(CowOrderedDict)
+        clone._entries = copy.copy(self._entries)
+        clone._order = copy.copy(self._order)
+        clone._next = self._next
+        return clone
+
+    def _sequence(self, key) -> int:
+        return self._entries[key][0]
+
+    def __getitem__(self, key):
+        return self._entries[key][1]
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        return default if entry is None else entry[1]
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._order)
+
+    def keys(self) -> Iterator:
+        return iter(self._order)
+
+    def values(self) -> Iterator:
+        entries = self._entries
+        return (entries[key][1] for key in self._order)
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        entries = self._entries
+        return ((key, entries[key][1]) for key in self._order)
+
+    def __setitem__(self, key, value) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = (self._next, value)
+            self._order.append(key)
+            self._next += 1
+        else:
+            self._entries[key] = (entry[0], value)
+
+    def __delitem__(self, key) -> None:
+        if key not in self._entries:
+            raise KeyError(key)
+        self._order.remove(key, self._sequence)
+        del self._entries[key]
+
+    def pop(self, key, *default):
+        if key not in self._entries:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+
+class CopyOnWrite:
+    """
+    Основа индексов, которые можно дешево копировать для записи.
+
+    fork() возвращает копию, разделяющую с оригиналом все контейнеры.
+    Перед изменением контейнер копируется (один раз за жизнь копии), поэтому
+    оригинал, уже опубликованный в снимке, не меняется. Изменять индекс
+    можно только через _own и _own_item.
+    """
+
+    # None — объект еще не опубликован и владеет всеми контейнерами
+    _owned: Optional[Set] = None
+
+    def fork(self):
+        """Копия для писателя; оригинал после этого менять нельзя"""
+        clone = copy.copy(self)
+        clone._owned = set()
+        self._owned = set()
+        return clone
+
+    def _own(self, name: str):
+        """Контейнер-атрибут name, который можно менять"""
+        container = getattr(self, name)
+        if self._owned is not None and name not in self._owned:
+            container = copy.copy(container)
+            setattr(self, name, container)
+            self._owned.add(name)
+        return container
+
+    def _own_item(self, name: str, key, factory: Callable):
+        """Вложенный контейнер name[key] (при отсутствии создается factory()), который можно менять"""
+        container = self._own(name)
+        item = container.get(key)
+        if self._owned is None:
+            if item is None:
+                item = container[key] = factory()
+            return item
+        if item is None:
+            item = container[key] = factory()
+        elif (name, key) not in self._owned:
+            item = container[key] = copy.copy(item)
+        else:
+            return item
+        self._owned.add((name, key))
+        return item
+
+
+class Snapshot:
+    """Согласованное состояние данных одной ревизии; после публикации не меняется"""
+
+    __slots__ = ("revision", "storage", "graph", "search_index")
+
+    def __init__(self, revision: int, storage, graph, search_index):
+        self.revision = revision
+        # Представление хранилища только для чтения (см. StorageBackend.snapshot)
+        self.storage = storage
+        self.graph = graph
+        self.search_index = search_index
@@ -1,10 +1,25 @@
 const API_BASE = '/api';
+const PAGE_SIZE = 100;
+// Определение приходит вместе со списком — не нужен отдельный запрос на каждую карточку
+const TERM_LIST_FIELDS = 'id,keyword,title,category,definition';
 
 let allTerms = [];
+// Полные термины, уже загруженные для просмотра: редактирование не запрашивает их повторно
+const termDetails = new Map();
+let nextCursor = null;
+// Категории с числом терминов (GET /api/categories)
+let categoryFacets = [];
+let categoriesTimer = null;
 let currentView = 'glossary';
 let network = null;
 let nodes = null;
 let edges = null;
+// Поток изменений подключен: список и граф обновляются на месте, без перезагрузки
+let liveUpdates = false;
+let feedReady = false;
+// Изменения, пришедшие во время загрузки списка или графа, — применяются к загруженным данным
+let termChangesDuringLoad = null;
+let graphChangesDuringLoad = null;
 
 // Инициализация
 document.addEventListener('DOMContentLoaded', () => {
@@ -12,9 +27,27 @@ document.addEventListener('DOMContentLoaded', () => {
     initializeGlossary();
     initializeGraph();
     initializeModals();
+    initializeChangeFeed();
+    initializeServiceWorker();
     loadTerms();
 });
 
+// Сервис-воркер: повторный визит открывается из кэша без запросов к серверу
+function initializeServiceWorker() {
+    if (!('serviceWorker' in navigator)) {
+        return;
+    }
+    navigator.serviceWorker.register('/sw.js').catch(error => {
+        console.error('Ошибка регистрации сервис-воркера:', error);
+    });
+    // Список был показан из кэша, а на сервере данные уже новее
+    navigator.serviceWorker.addEventListener('message', (e) => {
+        if (e.data && e.data.type === 'api-updated') {
+            reloadAll();
+        }
+    });
+}
+
 // Навигация
 function initializeNavigation() {
     const navButtons = document.querySelectorAll('.nav-btn');
@@ -39,7 +72,8 @@ function switchView(view) {
         v.classList.toggle('active', v.id === `${view}-view`);
     });
     
-    if (view === 'graph') {
+    // Живой граф уже актуален — перезагружаем, только если обновлений нет
+    if (view === 'graph' && (!network || !liveUpdates)) {
         loadGraph();
     }
 }
@@ -50,18 +84,48 @@ function initializeGlossary() {
     const categoryFilter = document.getElementById('category-filter');
     const addBtn = document.getElementById('add-term-btn');
     
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    
     searchInput.addEventListener('input', filterTerms);
-    categoryFilter.addEventListener('change', filterTerms);
+    categoryFilter.addEventListener('change', () => {
+        // Без поискового запроса фильтр по категории применяет сервер
+        if (document.getElementById('search-input').value.trim()) {
+            filterTerms();
+        } else {
+            loadTerms();
+        }
+    });
     addBtn.addEventListener('click', () => openTermModal());
+    loadMoreBtn.addEventListener('click', () => loadTerms(true));
 }
 
-async function loadTerms() {
+async function loadTerms(append = false) {
     try {
-        const response = await fetch(`${API_BASE}/terms`);
-        allTerms = await response.json();
+        const params = new URLSearchParams({ limit: PAGE_SIZE, sort: 'title', fields: TERM_LIST_FIELDS });
+        const category = document.getElementById('category-filter').value;
+        if (category) {
+            params.set('category', category);
+        }
+        if (append && nextCursor) {
+            params.set('cursor', nextCursor);
+        }
+        
+        termChangesDuringLoad = [];
+        const response = await fetch(`${API_BASE}/terms?${params}`);
+        const page = await response.json();
+        nextCursor = response.headers.get('X-Next-Cursor');
+        allTerms = append ? allTerms.concat(page) : page;
+        const pending = termChangesDuringLoad;
+        termChangesDuringLoad = null;
+        pending.forEach(patchTermList);
+        
         renderTerms(allTerms);
-        updateCategoryFilter();
+        updateLoadMoreButton();
+        if (!append) {
+            loadCategories();
+        }
     } catch (error) {
+        termChangesDuringLoad = null;
         console.error('Ошибка загрузки терминов:', error);
         alert('Ошибка загрузки терминов');
     }
@@ -84,7 +148,7 @@ function renderTerms(terms) {
                 </div>
                 ${term.category ? `<span class="term-category">${escapeHtml(term.category)}</span>` : ''}
             </div>
-            <div class="term-definition">${escapeHtml(getTermDefinition(term.keyword))}</div>
+            <div class="term-definition">${escapeHtml(term.definition)}</div>
             <div class="term-actions">
                 <button class="btn-edit" onclick="event.stopPropagation(); editTerm('${term.keyword}')">Редактировать</button>
                 <button class="btn-delete" onclick="event.stopPropagation(); deleteTerm('${term.keyword}')">Удалить</button>
@@ -103,57 +167,82 @@ function renderTerms(terms) {
     });
 }
 
-function getTermDefinition(keyword) {
-    const term = allTerms.find(t => t.keyword.toLowerCase() === keyword.toLowerCase());
-    if (term) {
-        // Загрузить полное определение
-        fetch(`${API_BASE}/terms/${keyword}`)
-            .then(r => r.json())
-            .then(term => {
-                const card = document.querySelector(`[data-keyword="${keyword}"]`);
-                if (card) {
-                    const defEl = card.querySelector('.term-definition');
-                    if (defEl) {
-                        defEl.textContent = term.definition;
-                    }
-                }
-            })
-            .catch(() => {});
-    }
-    return 'Загрузка...';
+function updateLoadMoreButton() {
+    const searching = !!document.getElementById('search-input').value.trim();
+    document.getElementById('load-more-btn').style.display = nextCursor && !searching ? '' : 'none';
 }
 
+let searchTimer = null;
+let searchRequestId = 0;
+
 function filterTerms() {
-    const search = document.getElementById('search-input').value.toLowerCase();
+    // Поиск выполняется на сервере; ждем паузу в наборе, чтобы не слать запрос на каждую букву
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(applyFilters, 150);
+}
+
+async function applyFilters() {
+    const search = document.getElementById('search-input').value.trim();
     const category = document.getElementById('category-filter').value;
+    const requestId = ++searchRequestId;
     
     let filtered = allTerms;
     
     if (search) {
-        filtered = filtered.filter(term => 
-            term.keyword.toLowerCase().includes(search) ||
-            term.title.toLowerCase().includes(search)
-        );
+        try {
+            const response = await fetch(`${API_BASE}/search?q=${encodeURIComponent(search)}&limit=200`);
+            filtered = await response.json();
+        } catch (error) {
+            console.error('Ошибка поиска:', error);
+            return;
+        }
+        // Пока ждали ответ, пользователь мог изменить запрос
+        if (requestId !== searchRequestId) {
+            return;
+        }
     }
     
-    if (category) {
+    if (search && category) {
         filtered = filtered.filter(term => term.category === category);
     }
     
     renderTerms(filtered);
+    updateLoadMoreButton();
+}
+
+async function loadCategories() {
+    // Счетчики ведет сервер — не нужно загружать все термины ради списка категорий
+    try {
+        const response = await fetch(`${API_BASE}/categories`);
+        const facets = await response.json();
+        categoryFacets = facets.filter(facet => facet.category !== null);
+        updateCategoryFilter();
+    } catch (error) {
+        console.error('Ошибка загрузки категорий:', error);
+    }
+}
+
+function scheduleCategories() {
+    // Пачка изменений из потока — один запрос категорий
+    clearTimeout(categoriesTimer);
+    categoriesTimer = setTimeout(loadCategories, 500);
 }
 
 function updateCategoryFilter() {
-    const categories = [...new Set(allTerms.map(t => t.category).filter(Boolean))].sort();
     const select = document.getElementById('category-filter');
     const currentValue = select.value;
     
     select.innerHTML = '<option value="">Все категории</option>' +
-        categories.map(cat => `<option value="${escapeHtml(cat)}">${escapeHtml(cat)}</option>`).join('');
+        categoryFacets.map(facet =>
+            `<option value="${escapeHtml(facet.category)}">${escapeHtml(facet.category)} (${facet.count})</option>`
+        ).join('');
     
-    if (categories.includes(currentValue)) {
+    if (categoryFacets.some(facet => facet.category === currentValue)) {
         select.value = currentValue;
     }
+    
+    document.getElementById('categories-list').innerHTML = categoryFacets
+        .map(facet => `<option value="${escapeHtml(facet.category)}">`).join('');
 }
 
 // Граф
@@ -164,20 +253,54 @@ function initializeGraph() {
 
 async function loadGraph() {
     try {
+        graphChangesDuringLoad = [];
         const response = await fetch(`${API_BASE}/graph`);
         const data = await response.json();
         
-        updateGraphStats(data);
         renderGraph(data);
+        const pending = graphChangesDuringLoad;
+        graphChangesDuringLoad = null;
+        pending.forEach(patchGraph);
+        updateGraphStats();
     } catch (error) {
+        graphChangesDuringLoad = null;
         console.error('Ошибка загрузки графа:', error);
         alert('Ошибка загрузки графа');
     }
 }
 
-function updateGraphStats(data) {
+function updateGraphStats() {
     const stats = document.getElementById('graph-stats');
-    stats.textContent = `Узлов: ${data.nodes.length}, Связей: ${data.edges.length}`;
+    stats.textContent = `Узлов: ${nodes.length}, Связей: ${edges.length}`;
+}
+
+function toVisNode(node) {
+    const visNode = {
+        id: node.id,
+        label: node.title,
+        title: `${node.title}\n\n${node.definition}\n\n${node.source ? `Источник: ${node.source}` : ''}`,
+        group: node.category || 'Другое',
+        color: getCategoryColor(node.category)
+    };
+    // Координаты серверной раскладки; без них узел остается на прежнем месте
+    if (node.x != null && node.y != null) {
+        visNode.x = node.x;
+        visNode.y = node.y;
+    }
+    return visNode;
+}
+
+function toVisEdge(fromId, toId, label) {
+    return {
+        // Одно ребро на пару узлов — его можно найти и заменить при изменении термина
+        id: `edge_${fromId}_${toId}`,
+        from: fromId,
+        to: toId,
+        label: label || '',
+        arrows: 'to',
+        color: { color: '#666' },
+        width: 2
+    };
 }
 
 function renderGraph(data) {
@@ -191,50 +314,41 @@ function renderGraph(data) {
     }
     
     // Подготовка данных для vis-network
-    const nodesData = data.nodes.map(node => ({
-        id: node.id,
-        label: node.title,
-        title: `${node.title}\n\n${node.definition}\n\n${node.source ? `Источник: ${node.source}` : ''}`,
-        group: node.category || 'Другое',
-        color: getCategoryColor(node.category)
-    }));
+    const nodesData = data.nodes.map(toVisNode);
+    const nodeIds = new Set(nodesData.map(n => n.id));
+    const edgesById = new Map();
     
-    const edgesData = data.edges.map((edge, index) => {
+    data.edges.forEach((edge, index) => {
         // Поддержка обоих форматов: с алиасами (from/to) и без (from_id/to_id)
         const fromId = edge.from !== undefined ? edge.from : (edge.from_id !== undefined ? edge.from_id : null);
         const toId = edge.to !== undefined ? edge.to : (edge.to_id !== undefined ? edge.to_id : null);
         
         if (!fromId || !toId) {
             console.warn('Invalid edge at index', index, ':', edge);
-            return null;
+            return;
         }
         
         // Проверяем, что узлы существуют
-        const fromNodeExists = nodesData.some(n => n.id === fromId);
-        const toNodeExists = nodesData.some(n => n.id === toId);
+        const fromNodeExists = nodeIds.has(fromId);
+        const toNodeExists = nodeIds.has(toId);
         
         if (!fromNodeExists || !toNodeExists) {
             console.warn('Edge references non-existent node:', { fromId, toId, fromExists: fromNodeExists, toExists: toNodeExists });
-            return null;
+            return;
         }
         
-        return {
-            id: `edge_${fromId}_${toId}_${index}`,
-            from: fromId,
-            to: toId,
-            label: edge.label || '',
-            arrows: 'to',
-            color: { color: '#666' },
-            width: 2
-        };
-    }).filter(edge => edge !== null);
+        const visEdge = toVisEdge(fromId, toId, edge.label);
+        edgesById.set(visEdge.id, visEdge);
+    });
+    const edgesData = [...edgesById.values()];
     
     console.log('Processed edges:', edgesData);
     
-    const graphData = {
-        nodes: new vis.DataSet(nodesData),
-        edges: new vis.DataSet(edgesData)
-    };
+    nodes = new vis.DataSet(nodesData);
+    edges = new vis.DataSet(edgesData);
+    const graphData = { nodes, edges };
+    // Сервер прислал раскладку — рисуем сразу, без симуляции в браузере
+    const serverLayout = data.nodes.length > 0 && data.nodes.every(n => n.x != null && n.y != null);
     
     const options = {
         nodes: {
@@ -271,7 +385,7 @@ function renderGraph(data) {
             selectionWidth: 4
         },
         physics: {
-            enabled: true,
+            enabled: !serverLayout,
             stabilization: {
                 iterations: 200
             },
@@ -300,14 +414,121 @@ function renderGraph(data) {
     network.on('click', (params) => {
         if (params.nodes.length > 0) {
             const nodeId = params.nodes[0];
-            const node = data.nodes.find(n => n.id === nodeId);
-            if (node) {
-                viewTerm(node.id);
+            if (nodes.get(nodeId)) {
+                viewTerm(nodeId);
             }
         }
     });
 }
 
+// Живое обновление по журналу изменений сервера
+function initializeChangeFeed() {
+    if (!window.EventSource) {
+        return;
+    }
+    // При обрыве EventSource переподключается сам и продолжает с последнего события
+    const source = new EventSource(`${API_BASE}/changes/stream`);
+    source.addEventListener('open', () => { liveUpdates = true; });
+    source.addEventListener('error', () => { liveUpdates = false; });
+    source.addEventListener('ready', () => {
+        // Повторный ready — поток начат заново, пропущенные изменения неизвестны
+        if (feedReady) {
+            reloadAll();
+        }
+        feedReady = true;
+    });
+    source.addEventListener('reset', reloadAll);
+    source.addEventListener('change', (e) => applyChange(JSON.parse(e.data)));
+}
+
+function reloadAll() {
+    termDetails.clear();
+    loadTerms();
+    if (network) {
+        loadGraph();
+    }
+}
+
+function applyChange(change) {
+    // Изменение могло затронуть названия в связях других терминов
+    termDetails.clear();
+    if (termChangesDuringLoad) {
+        termChangesDuringLoad.push(change);
+    } else {
+        patchTermList(change);
+        if (document.getElementById('search-input').value.trim()) {
+            filterTerms();
+        } else {
+            renderTerms(allTerms);
+        }
+        updateLoadMoreButton();
+    }
+    scheduleCategories();
+    if (graphChangesDuringLoad) {
+        graphChangesDuringLoad.push(change);
+    } else if (nodes) {
+        patchGraph(change);
+        updateGraphStats();
+    }
+}
+
+function compareTerms(a, b) {
+    // Тот же порядок, что у сервера при sort=title: по названию, затем по id
+    if (a.title !== b.title) {
+        return a.title < b.title ? -1 : 1;
+    }
+    return a.id < b.id ? -1 : (a.id > b.id ? 1 : 0);
+}
+
+function patchTermList(change) {
+    allTerms = allTerms.filter(t => t.id !== change.id);
+    const term = change.term;
+    if (!term) {
+        return;
+    }
+    const category = document.getElementById('category-filter').value;
+    if (category && term.category !== category) {
+        return;
+    }
+    const item = Object.fromEntries(TERM_LIST_FIELDS.split(',').map(field => [field, term[field]]));
+    const position = allTerms.findIndex(t => compareTerms(item, t) < 0);
+    if (position !== -1) {
+        allTerms.splice(position, 0, item);
+    } else if (!nextCursor) {
+        allTerms.push(item);
+    }
+    // Термин за последней загруженной страницей придет вместе со следующей
+}
+
+function patchGraph(change) {
+    edges.remove(edges.getIds({ filter: e => e.from === change.id || e.to === change.id }));
+    if (change.node) {
+        const visNode = toVisNode(change.node);
+        if (!nodes.get(change.id) && visNode.x === undefined) {
+            Object.assign(visNode, positionNearNeighbors(change.edges));
+        }
+        nodes.update(visNode);
+        edges.update(change.edges.map(edge => toVisEdge(edge.from, edge.to, edge.label)));
+    } else {
+        nodes.remove(change.id);
+    }
+}
+
+function positionNearNeighbors(nodeEdges) {
+    // Новый узел из журнала изменений приходит без координат: при отключенной
+    // физике ставим его рядом со связанными узлами, пока сервер не пересчитает раскладку
+    const ids = nodeEdges.flatMap(edge => [edge.from, edge.to]).filter(id => nodes.get(id));
+    const positions = Object.values(network.getPositions(ids));
+    if (positions.length === 0) {
+        return {};
+    }
+    const jitter = () => (Math.random() - 0.5) * 100;
+    return {
+        x: positions.reduce((sum, p) => sum + p.x, 0) / positions.length + jitter(),
+        y: positions.reduce((sum, p) => sum + p.y, 0) / positions.length + jitter()
+    };
+}
+
 function getCategoryColor(category) {
     const colors = {
         'Концепция': '#3498DB',
@@ -366,10 +587,24 @@ function closeTermModal() {
     document.getElementById('term-modal').classList.remove('active');
 }
 
+async function fetchTermDetails(keyword) {
+    const key = keyword.toLowerCase();
+    if (termDetails.has(key)) {
+        return termDetails.get(key);
+    }
+    // Связанные термины приходят в том же ответе — без запроса на каждый
+    const response = await fetch(`${API_BASE}/terms/${encodeURIComponent(keyword)}?expand=related`);
+    if (!response.ok) {
+        throw new Error('Термин не найден');
+    }
+    const term = await response.json();
+    termDetails.set(key, term);
+    return term;
+}
+
 async function loadTermForEdit(keyword) {
     try {
-        const response = await fetch(`${API_BASE}/terms/${keyword}`);
-        const term = await response.json();
+        const term = await fetchTermDetails(keyword);
         
         document.getElementById('term-keyword-edit').value = term.keyword;
         document.getElementById('term-keyword').value = term.keyword;
@@ -430,9 +665,13 @@ async function handleFormSubmit(e) {
         }
         
         closeTermModal();
-        await loadTerms();
-        if (currentView === 'graph') {
-            await loadGraph();
+        // С потоком изменений список и граф обновятся сами
+        if (!liveUpdates) {
+            termDetails.clear();
+            await loadTerms();
+            if (currentView === 'graph') {
+                await loadGraph();
+            }
         }
     } catch (error) {
         alert(error.message || 'Ошибка сохранения термина');
@@ -441,15 +680,14 @@ async function handleFormSubmit(e) {
 
 async function viewTerm(keyword) {
     try {
-        const response = await fetch(`${API_BASE}/terms/${keyword}`);
-        const term = await response.json();
+        const term = await fetchTermDetails(keyword);
         
-        const relatedTermsHtml = term.related_terms.length > 0
+        const relatedTermsHtml = term.related.length > 0
             ? `<div class="term-related">
                 <h3>Связанные термины:</h3>
                 <div class="related-terms">
-                    ${term.related_terms.map(rt => 
-                        `<a href="#" class="related-term-tag" onclick="event.preventDefault(); viewTerm('${rt}'); closeViewModal();">${rt}</a>`
+                    ${term.related.map(rt => 
+                        `<a href="#" class="related-term-tag" onclick="event.preventDefault(); closeViewModal(); viewTerm('${rt.id}');">${escapeHtml(rt.title)}</a>`
                     ).join('')}
                 </div>
               </div>`
@@ -497,9 +735,12 @@ async function deleteTerm(keyword) {
             throw new Error('Ошибка удаления');
         }
         
-        await loadTerms();
-        if (currentView === 'graph') {
-            await loadGraph();
+        if (!liveUpdates) {
+            termDetails.clear();
+            await loadTerms();
+            if (currentView === 'graph') {
+                await loadGraph();
+            }
         }
     } catch (error) {
         alert('Ошибка удаления термина');
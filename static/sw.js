@@ -0,0 +1,86 @@
+// Сервис-воркер: оболочка приложения и первые страницы /api/terms из кэша.
+// Версию и адреса оболочки подставляет сервер (assets.py)
+const SHELL_VERSION = '{{SHELL_VERSION}}';
+const SHELL_URLS = ["{{SHELL_URLS}}"];
+const SHELL_CACHE = `glossary-shell-${SHELL_VERSION}`;
+const API_CACHE = 'glossary-api';
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(SHELL_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    // Оболочки прошлых версий больше не нужны
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith('glossary-shell-') && key !== SHELL_CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (request.method !== 'GET') {
+        // Запись меняет данные — сохраненные ответы API устарели
+        if (url.pathname.startsWith('/api/')) {
+            event.respondWith(fetch(request).finally(() => caches.delete(API_CACHE)));
+        }
+        return;
+    }
+    if (SHELL_URLS.includes(url.pathname)) {
+        event.respondWith(fromShell(url.pathname));
+    } else if (url.pathname === '/api/terms' && !url.searchParams.has('cursor')) {
+        event.respondWith(staleWhileRevalidate(event));
+    }
+});
+
+async function fromShell(path) {
+    // Файлы с хешем в имени не меняются; оболочка обновляется вместе с воркером
+    const cached = await caches.match(path, { cacheName: SHELL_CACHE });
+    return cached || fetch(path);
+}
+
+async function staleWhileRevalidate(event) {
+    const cache = await caches.open(API_CACHE);
+    const cached = await cache.match(event.request, { ignoreVary: true });
+    const revalidation = revalidate(cache, event.request, cached, event.clientId);
+    if (cached) {
+        event.waitUntil(revalidation.catch(() => {}));
+        return cached;
+    }
+    return revalidation;
+}
+
+async function revalidate(cache, request, cached, clientId) {
+    // Тот же ETag, что у ответа в кэше: пока версия данных прежняя, сервер отвечает 304
+    const headers = new Headers();
+    const etag = cached && cached.headers.get('ETag');
+    if (etag) {
+        headers.set('If-None-Match', etag);
+    }
+    const response = await fetch(request.url, { headers, cache: 'no-store' });
+    if (response.status === 304 && cached) {
+        return cached;
+    }
+    if (response.ok) {
+        await cache.put(request, response.clone());
+        if (cached) {
+            // Страница уже показала устаревшие данные — пусть загрузит их заново
+            const client = await self.clients.get(clientId);
+            if (client) {
+                client.postMessage({ type: 'api-updated', url: request.url });
+            }
+        }
+    }
+    return response;
+}
@@ -0,0 +1,911 @@
+"""
+Бэкенды хранения терминов.
+
+- InMemoryStorage — словарь в памяти процесса (данные теряются при перезапуске)
+- SnapshotStorage — то же хранилище в памяти, сохраняемое на диск двоичным
+  снимком и журналом изменений (persistence.py); переживает перезапуски,
+  быстро загружается, но принадлежит одному процессу
+- SQLiteStorage — файл SQLite в режиме WAL; переживает перезапуски и
+  разделяется между несколькими воркерами uvicorn на одной машине
+
+Бэкенд выбирается через config.STORAGE_BACKEND (см. create_storage).
+"""
+import queue
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+import persistence
+from metrics import STORAGE_OPERATION_DURATION, timed
+from records import TermRecord, to_micros
+from snapshot import CopyOnWrite, CowOrderedDict, CowSortedList
+
+try:
+    import fcntl
+except ImportError:  # нет на Windows — без блокировки файлов хранилища
+    fcntl = None
+
+
+# Поля, по которым можно постранично обходить термины.
+# Ключ страницы — пара (значение поля, id), она уникальна и задает стабильный порядок.
+SORT_FIELDS = ("id", "title", "created_at")
+
+SortKey = Tuple[Any, str]
+
+
+def sort_key(term: TermRecord, field: str) -> SortKey:
+    """Ключ термина для постраничного обхода по полю field"""
+    return (getattr(term, field), term.id)
+
+
+class StorageBackend(ABC):
+    """Интерфейс хранилища терминов. Ключ термина — его id (keyword в нижнем регистре)."""
+
+    @abstractmethod
+    def get(self, term_id: str) -> Optional[TermRecord]:
+        """Получить термин по id"""
+
+    @abstractmethod
+    def get_many(self, term_ids: Iterable[str]) -> Dict[str, TermRecord]:
+        """Найденные термины по id (отсутствующие id пропускаются)"""
+
+    @abstractmethod
+    def all(self) -> List[TermRecord]:
+        """Все термины в порядке добавления"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Количество терминов"""
+
+    @abstractmethod
+    def page(
+        self,
+        limit: int,
+        after: Optional[SortKey] = None,
+        category: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False,
+    ) -> List[TermRecord]:
+        """
+        Страница терминов, упорядоченных по (sort, id), строго после ключа after.
+        Стоимость зависит от размера страницы, а не от числа терминов.
+        """
+
+    @abstractmethod
+    def insert(self, term: TermRecord) -> bool:
+        """Добавить термин. Возвращает False, если id уже занят"""
+
+    @abstractmethod
+    def replace(self, term: TermRecord) -> None:
+        """Заменить существующий термин целиком"""
+
+    @abstractmethod
+    def delete(self, term_id: str) -> bool:
+        """Удалить термин. Возвращает False, если его не было"""
+
+    @abstractmethod
+    def remove_related(self, term_id: str, referrers: Iterable[str]) -> None:
+        """
+        Убрать ссылки на term_id из related_terms других терминов.
+        referrers — id терминов, которые на него ссылаются (из индекса обратных ссылок)
+        """
+
+    @abstractmethod
+    def transaction(self):
+        """Контекстный менеджер: операции внутри выполняются атомарно"""
+
+    @contextmanager
+    def read_transaction(self) -> Iterator[None]:
+        """
+        Чтения этого потока внутри блока видят одно зафиксированное
+        состояние, в том числе revision(). По умолчанию ничего не делает:
+        представление snapshot() и так не меняется
+        """
+        yield
+
+    @abstractmethod
+    def revision(self) -> int:
+        """
+        Номер ревизии данных; растет один раз за каждую транзакцию с изменениями.
+        По нему процесс замечает изменения, сделанные другими воркерами.
+        """
+
+    def changed_since(self, revision: int) -> Optional[List[str]]:
+        """
+        id терминов, измененных после ревизии revision, — по ним процесс
+        догоняет изменения других воркеров, не перестраивая индексы целиком.
+        None — история изменений с этой ревизии не сохранилась
+        """
+        return None
+
+    @property
+    @abstractmethod
+    def epoch(self) -> str:
+        """
+        Идентификатор экземпляра данных. Вместе с ревизией однозначно задает
+        состояние: у нового in-memory хранилища ревизии начинаются заново.
+        """
+
+    def snapshot(self):
+        """
+        Представление последнего зафиксированного состояния только для чтения
+        (get, get_many, all, count, page). По умолчанию — само
+        хранилище: каждое чтение видит последнюю зафиксированную транзакцию.
+        """
+        return self
+
+    def close(self) -> None:
+        """Освободить ресурсы"""
+
+
+# Функция: id термина -> ключ (значение, id); None — сортировка по самому id
+KeyFunction = Optional[Callable[[str], SortKey]]
+
+
+class _SortedKeys(CowSortedList):
+    """
+    Id терминов, упорядоченные по ключу (значение поля, id), для постраничного
+    обхода. Сами ключи не хранятся — их вычисляет функция key по записи термина.
+    Список разбит на блоки: запись копирует только блок, в который попадает
+    """
+
+    __slots__ = ()
+
+    def after(self, after: Optional[SortKey], limit: int, descending: bool, key: KeyFunction) -> List[str]:
+        bound = None if after is None else (after if key else after[1])
+        if not descending:
+            start = (0, 0) if bound is None else self.bisect_right(bound, key)
+            return list(islice(self.iter_from(start), limit))
+        end = self.end() if bound is None else self.bisect_left(bound, key)
+        return list(islice(self.iter_before(end), limit))
+
+
+class _MemoryState(CopyOnWrite):
+    """
+    Состояние in-memory хранилища одной ревизии. Опубликованное состояние
+    не меняется: транзакция изменяет его копию (fork) и публикует ее целиком.
+    Термины и упорядоченные списки копируются по сегментам и блокам, поэтому
+    запись стоит O(изменения), а не O(числа терминов).
+    """
+
+    def __init__(self):
+        self.revision = 0
+        # id -> запись, в порядке добавления
+        self.terms: CowOrderedDict = CowOrderedDict()
+        # (поле сортировки, категория или None) -> отсортированные id
+        self.sorted: Dict[Tuple[str, Optional[str]], _SortedKeys] = {}
+
+    @classmethod
+    def load(cls, revision: int, terms: Dict[str, TermRecord]) -> "_MemoryState":
+        """Состояние из готовых терминов: списки сортируются целиком, а не вставками"""
+        state = cls()
+        state.revision = revision
+        state.terms = CowOrderedDict(terms)
+        groups: Dict[Optional[str], List[str]] = {None: list(terms)}
+        for term in terms.values():
+            if term.category is not None:
+                groups.setdefault(term.category, []).append(term.id)
+        for field in SORT_FIELDS:
+            key = state._key(field)
+            for category, term_ids in groups.items():
+                state.sorted[(field, category)] = _SortedKeys(sorted(term_ids, key=key))
+        return state
+
+    def _key(self, field: str) -> KeyFunction:
+        """Ключ сортировки по полю field для id термина из этого состояния"""
+        if field == "id":
+            return None
+        terms = self.terms
+        attribute = "created_us" if field == "created_at" else field
+        return lambda term_id: (getattr(terms[term_id], attribute), term_id)
+
+    def index(self, term: TermRecord) -> None:
+        """Добавить термин в упорядоченные списки (запись уже в self.terms)"""
+        for field in SORT_FIELDS:
+            key = self._key(field)
+            for category in {None, term.category}:
+                self._own_item("sorted", (field, category), _SortedKeys).add(term.id, key)
+
+    def unindex(self, term: TermRecord) -> None:
+        """Убрать термин из упорядоченных списков (запись еще в self.terms)"""
+        for field in SORT_FIELDS:
+            key = self._key(field)
+            for category in {None, term.category}:
+                self._own_item("sorted", (field, category), _SortedKeys).remove(term.id, key)
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "get")
+    def get(self, term_id: str) -> Optional[TermRecord]:
+        return self.terms.get(term_id)
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "get_many")
+    def get_many(self, term_ids: Iterable[str]) -> Dict[str, TermRecord]:
+        terms = self.terms
+        return {term_id: terms[term_id] for term_id in term_ids if term_id in terms}
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "all")
+    def all(self) -> List[TermRecord]:
+        return list(self.terms.values())
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "count")
+    def count(self) -> int:
+        return len(self.terms)
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "page")
+    def page(
+        self,
+        limit: int,
+        after: Optional[SortKey] = None,
+        category: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False,
+    ) -> List[TermRecord]:
+        keys = self.sorted.get((sort, category))
+        if keys is None:
+            return []
+        if after is not None and isinstance(after[0], datetime):
+            after = (to_micros(after[0]), after[1])
+        term_ids = keys.after(after, limit, descending, self._key(sort))
+        return [self.terms[term_id] for term_id in term_ids]
+
+
+class InMemoryStorage(StorageBackend):
+    """
+    Хранилище в словаре Python.
+
+    Читатели берут опубликованное состояние без блокировок; транзакция
+    работает с его копией и при успехе публикует ее одной заменой ссылки,
+    при ошибке — просто отбрасывает.
+    """
+
+    def __init__(self):
+        self._state = _MemoryState()
+        # Рабочая копия текущей транзакции и поток, который ее ведет
+        self._draft: Optional[_MemoryState] = None
+        self._writer: Optional[int] = None
+        self._lock = threading.RLock()
+        # id терминов, измененных текущей транзакцией
+        self._touched: Dict[str, None] = {}
+        self._epoch = uuid.uuid4().hex[:8]
+
+    @property
+    def epoch(self) -> str:
+        return self._epoch
+
+    def _view(self) -> _MemoryState:
+        """Рабочая копия для потока транзакции, опубликованное состояние — для остальных"""
+        if self._writer == threading.get_ident():
+            return self._draft
+        return self._state
+
+    def _touch(self, term_id: str) -> None:
+        """Отметить изменение термина: ревизия растет один раз за транзакцию"""
+        if not self._touched:
+            self._draft.revision += 1
+        self._touched[term_id] = None
+
+    def _commit(self, state: _MemoryState, changed: Iterable[str]) -> None:
+        """
+        Вызывается перед публикацией состояния транзакции с изменениями
+        терминов changed. Исключение отменяет транзакцию
+        """
+
+    def snapshot(self) -> _MemoryState:
+        return self._state
+
+    def get(self, term_id: str) -> Optional[TermRecord]:
+        return self._view().get(term_id)
+
+    def get_many(self, term_ids: Iterable[str]) -> Dict[str, TermRecord]:
+        return self._view().get_many(term_ids)
+
+    def all(self) -> List[TermRecord]:
+        return self._view().all()
+
+    def count(self) -> int:
+        return self._view().count()
+
+    def page(
+        self,
+        limit: int,
+        after: Optional[SortKey] = None,
+        category: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False,
+    ) -> List[TermRecord]:
+        return self._view().page(limit, after, category, sort, descending)
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "insert")
+    def insert(self, term: TermRecord) -> bool:
+        with self.transaction():
+            state = self._draft
+            if term.id in state.terms:
+                return False
+            state._own("terms")[term.id] = term
+            state.index(term)
+            self._touch(term.id)
+            return True
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "replace")
+    def replace(self, term: TermRecord) -> None:
+        with self.transaction():
+            state = self._draft
+            old_term = state.terms.get(term.id)
+            if old_term is not None:
+                state.unindex(old_term)
+            state._own("terms")[term.id] = term
+            state.index(term)
+            self._touch(term.id)
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "delete")
+    def delete(self, term_id: str) -> bool:
+        with self.transaction():
+            state = self._draft
+            term = state.terms.get(term_id)
+            if term is None:
+                return False
+            state.unindex(term)
+            del state._own("terms")[term_id]
+            self._touch(term_id)
+            return True
+
+    @timed(STORAGE_OPERATION_DURATION, "memory", "remove_related")
+    def remove_related(self, term_id: str, referrers: Iterable[str]) -> None:
+        with self.transaction():
+            state = self._draft
+            for referrer in referrers:
+                term = state.terms.get(referrer)
+                if term is not None and term_id in term.related_terms:
+                    related = [rt for rt in term.related_terms if rt != term_id]
+                    state._own("terms")[term.id] = term.replace(related_terms=related)
+                    self._touch(term.id)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            if self._writer is not None:
+                yield
+                return
+            self._draft = self._state.fork()
+            self._writer = threading.get_ident()
+            try:
+                yield
+                if self._touched:
+                    self._commit(self._draft, self._touched)
+                    self._state = self._draft
+            finally:
+                self._writer = None
+                self._draft = None
+                self._touched = {}
+
+    def revision(self) -> int:
+        return self._view().revision
+
+
+class SnapshotStorage(InMemoryStorage):
+    """
+    Хранилище в памяти, сохраняемое на диск (форматы — в persistence.py).
+
+    Каждая транзакция перед публикацией дописывает свои изменения в журнал,
+    так что зафиксированная запись переживает перезапуск. При запуске
+    термины собираются из отображенного в память снимка и хвоста журнала без
+    валидации pydantic. Фоновый поток раз в check_interval секунд уплотняет
+    журнал, если он вырос больше compact_bytes: пишет новый снимок
+    опубликованного состояния и отрезает журнал до него. Файлы принадлежат
+    одному процессу — второй процесс с тем же путем не запустится.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fsync: bool = True,
+        compact_bytes: int = 64 << 20,
+        check_interval: float = 60.0,
+    ):
+        super().__init__()
+        self.path = path
+        self._compact_bytes = compact_bytes
+        self._file_lock = self._acquire_file_lock(f"{path}.lock")
+        self._journal = persistence.Journal(f"{path}.journal", fsync=fsync)
+        # Уплотнения идут по одному (фоновое и при закрытии)
+        self._compact_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        revision, epoch, terms = self._load()
+        self._state = _MemoryState.load(revision, terms)
+        if epoch is not None:
+            self._epoch = epoch
+        else:
+            # Первый запуск: пустой снимок закрепляет эпоху данных
+            persistence.write_snapshot(path, revision, self._epoch, terms.values())
+
+        self._compactor = threading.Thread(
+            target=self._compact_periodically, args=(check_interval,), name="storage-compactor", daemon=True,
+        )
+        self._compactor.start()
+
+    @staticmethod
+    def _acquire_file_lock(path: str):
+        """Исключительная блокировка файлов хранилища за этим процессом"""
+        lock_file = open(path, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                raise RuntimeError(f"Файлы хранилища '{path}' уже используются другим процессом")
+        return lock_file
+
+    @timed(STORAGE_OPERATION_DURATION, "snapshot", "load")
+    def _load(self) -> Tuple[int, Optional[str], Dict[str, TermRecord]]:
+        return persistence.load(self.path, self._journal)
+
+    def _commit(self, state: _MemoryState, changed: Iterable[str]) -> None:
+        # Журнал пишется до публикации: ошибка записи отменяет транзакцию
+        base = self._state.terms
+        put: List[TermRecord] = []
+        delete: List[str] = []
+        for term_id in changed:
+            term = state.terms.get(term_id)
+            if term is None:
+                if term_id in base:
+                    delete.append(term_id)
+            elif term is not base.get(term_id):
+                put.append(term)
+        self._journal.append(persistence.JournalEntry(state.revision, put, delete))
+
+    @property
+    def journal_size(self) -> int:
+        """Размер журнала в байтах"""
+        return self._journal.size
+
+    @timed(STORAGE_OPERATION_DURATION, "snapshot", "compact")
+    def compact(self) -> None:
+        """Записать снимок опубликованного состояния и отрезать журнал до него"""
+        with self._compact_lock:
+            with self._lock:
+                state = self._state
+                position = self._journal.size
+            if position == 0:
+                return
+            # Опубликованное состояние не меняется, так что снимок пишется без
+            # блокировки: записи продолжаются и дописывают журнал после position
+            persistence.write_snapshot(self.path, state.revision, self._epoch, state.terms.values())
+            with self._lock:
+                self._journal.drop_before(position)
+
+    def _compact_periodically(self, interval: float) -> None:
+        while not self._closed.wait(interval):
+            if self._journal.size >= self._compact_bytes:
+                try:
+                    self.compact()
+                except OSError:
+                    # Журнал цел — попробуем на следующем круге
+                    pass
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._compactor.join()
+        self.compact()
+        with self._lock:
+            self._journal.close()
+        self._file_lock.close()
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Хранилище в SQLite (режим WAL).
+
+    Соединения берутся из пула, так что чтения из разных потоков идут
+    параллельно, а WAL позволяет читать во время записи из другого процесса.
+    Запросы — константные строки, поэтому sqlite3 переиспользует
+    подготовленные выражения из кэша соединения.
+    Связи related_terms хранятся отдельной таблицей ребер.
+
+    Таблица changes помнит, какие термины изменены в каждой из последних
+    history ревизий: по ней другие воркеры обновляют свои индексы
+    инкрементально (changed_since).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS terms (
+            id          TEXT NOT NULL UNIQUE,
+            keyword     TEXT NOT NULL,
+            title       TEXT NOT NULL,
+            definition  TEXT NOT NULL,
+            source      TEXT,
+            category    TEXT,
+            created_at  TEXT NOT NULL,
+            updated_at  TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_terms_keyword ON terms(keyword);
+        CREATE INDEX IF NOT EXISTS idx_terms_category ON terms(category, id);
+        CREATE INDEX IF NOT EXISTS idx_terms_title ON terms(title, id);
+        CREATE INDEX IF NOT EXISTS idx_terms_created_at ON terms(created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_terms_category_title ON terms(category, title, id);
+        CREATE INDEX IF NOT EXISTS idx_terms_category_created_at ON terms(category, created_at, id);
+
+        CREATE TABLE IF NOT EXISTS related_terms (
+            term_id   TEXT NOT NULL REFERENCES terms(id) ON DELETE CASCADE,
+            position  INTEGER NOT NULL,
+            related   TEXT NOT NULL,
+            PRIMARY KEY (term_id, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_related_terms_related ON related_terms(related);
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key    TEXT PRIMARY KEY,
+            value  INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', abs(random() % 4294967296));
+
+        CREATE TABLE IF NOT EXISTS changes (
+            revision  INTEGER NOT NULL,
+            term_id   TEXT NOT NULL,
+            PRIMARY KEY (revision, term_id)
+        ) WITHOUT ROWID;
+        -- Изменения после ревизии history записаны полностью (у базы,
+        -- созданной до появления таблицы, — начиная с текущей ревизии)
+        INSERT OR IGNORE INTO meta (key, value)
+            SELECT 'history', value FROM meta WHERE key = 'revision';
+    """
+
+    TERM_COLUMNS = "id, keyword, title, definition, source, category, created_at, updated_at"
+    # Максимум id в одном запросе IN (...)
+    MAX_PARAMS = 500
+
+    SELECT_TERM = f"SELECT {TERM_COLUMNS} FROM terms WHERE id = ?"
+    SELECT_ALL_TERMS = f"SELECT {TERM_COLUMNS} FROM terms ORDER BY rowid"
+    SELECT_RELATED = "SELECT related FROM related_terms WHERE term_id = ? ORDER BY position"
+    SELECT_ALL_RELATED = "SELECT term_id, related FROM related_terms ORDER BY term_id, position"
+    COUNT_TERMS = "SELECT COUNT(*) FROM terms"
+    INSERT_TERM = f"INSERT INTO terms ({TERM_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    UPDATE_TERM = (
+        "UPDATE terms SET keyword = ?, title = ?, definition = ?, source = ?, "
+        "category = ?, created_at = ?, updated_at = ? WHERE id = ?"
+    )
+    DELETE_TERM = "DELETE FROM terms WHERE id = ?"
+    INSERT_RELATED = "INSERT INTO related_terms (term_id, position, related) VALUES (?, ?, ?)"
+    DELETE_RELATED_OF = "DELETE FROM related_terms WHERE term_id = ?"
+    DELETE_RELATED_TO = "DELETE FROM related_terms WHERE related = ?"
+    SELECT_REVISION = "SELECT value FROM meta WHERE key = 'revision'"
+    SELECT_EPOCH = "SELECT value FROM meta WHERE key = 'epoch'"
+    BUMP_REVISION = "UPDATE meta SET value = value + 1 WHERE key = 'revision'"
+    SELECT_HISTORY = "SELECT value FROM meta WHERE key = 'history'"
+    RAISE_HISTORY = "UPDATE meta SET value = max(value, ?) WHERE key = 'history'"
+    INSERT_CHANGE = "INSERT OR IGNORE INTO changes (revision, term_id) VALUES (?, ?)"
+    DELETE_CHANGES_BEFORE = "DELETE FROM changes WHERE revision <= ?"
+    SELECT_CHANGES_AFTER = (
+        "SELECT term_id FROM changes WHERE revision > ? "
+        "GROUP BY term_id ORDER BY max(revision), term_id"
+    )
+    SELECT_REFERRERS = "SELECT DISTINCT term_id FROM related_terms WHERE related = ?"
+    # Старые ревизии удаляются из changes не на каждой записи, а раз в столько ревизий
+    PRUNE_EVERY = 100
+
+    # Ключ страницы — составной (значение, id); для каждого варианта
+    # сортировки есть индекс, так что страница читается без полного прохода
+    SORT_COLUMNS = {"id": "id", "title": "title", "created_at": "created_at"}
+
+    def __init__(self, path: str, pool_size: int = 8, history: int = 10000):
+        self.path = path
+        # Сколько последних ревизий помнит таблица changes
+        self.history = max(1, history)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._connections: List[sqlite3.Connection] = []
+        self._local = threading.local()
+
+        for _ in range(max(1, pool_size)):
+            conn = self._connect()
+            self._connections.append(conn)
+            self._pool.put(conn)
+
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+            self._epoch = format(conn.execute(self.SELECT_EPOCH).fetchone()[0], "x")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            isolation_level=None,  # транзакциями управляем сами
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Соединение текущей транзакции или свободное соединение из пула"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        if getattr(self._local, "conn", None) is not None:
+            # Вложенная транзакция — просто продолжаем внешнюю
+            yield self._local.conn
+            return
+
+        conn = self._pool.get()
+        self._local.conn = conn
+        self._local.revision = None
+        try:
+            # IMMEDIATE сразу берет блокировку записи — проверка и запись
+            # не перемешаются с другим воркером
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            start = perf_counter()
+            conn.execute("COMMIT")
+            STORAGE_OPERATION_DURATION.observe(perf_counter() - start, ("sqlite", "commit"))
+        finally:
+            self._local.conn = None
+            self._local.revision = None
+            self._pool.put(conn)
+
+    def _touch(self, conn: sqlite3.Connection, term_ids: Iterable[str]) -> None:
+        """Отметить изменение терминов: ревизия растет один раз за транзакцию"""
+        revision = self._local.revision
+        if revision is None:
+            conn.execute(self.BUMP_REVISION)
+            revision = self._local.revision = conn.execute(self.SELECT_REVISION).fetchone()[0]
+            if revision % self.PRUNE_EVERY == 0:
+                conn.execute(self.DELETE_CHANGES_BEFORE, (revision - self.history,))
+                conn.execute(self.RAISE_HISTORY, (revision - self.history,))
+        conn.executemany(self.INSERT_CHANGE, [(revision, term_id) for term_id in term_ids])
+
+    @contextmanager
+    def read_transaction(self) -> Iterator[None]:
+        if getattr(self._local, "conn", None) is not None:
+            yield
+            return
+        conn = self._pool.get()
+        self._local.conn = conn
+        try:
+            conn.execute("BEGIN")
+            try:
+                # Снимок WAL фиксируется первым чтением, а не BEGIN
+                conn.execute(self.SELECT_REVISION).fetchone()
+                yield
+            finally:
+                conn.execute("COMMIT")
+        finally:
+            self._local.conn = None
+            self._pool.put(conn)
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """Согласованное чтение: несколько запросов видят один снимок базы"""
+        with self._connection() as conn:
+            own_transaction = getattr(self._local, "conn", None) is None
+            if own_transaction:
+                conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                if own_transaction:
+                    conn.execute("COMMIT")
+
+    @staticmethod
+    def _timestamp(value: datetime) -> str:
+        # Фиксированная точность — строки сортируются так же, как даты
+        return value.isoformat(timespec="microseconds")
+
+    @staticmethod
+    def _row_to_record(row, related_terms: List[str]) -> TermRecord:
+        # Данные из собственной БД уже прошли валидацию при записи
+        return TermRecord(
+            id=row[0],
+            keyword=row[1],
+            title=row[2],
+            definition=row[3],
+            source=row[4],
+            category=row[5],
+            created_us=to_micros(datetime.fromisoformat(row[6])),
+            updated_us=to_micros(datetime.fromisoformat(row[7])),
+            related_terms=related_terms,
+        )
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "get")
+    def get(self, term_id: str) -> Optional[TermRecord]:
+        with self._connection() as conn:
+            row = conn.execute(self.SELECT_TERM, (term_id,)).fetchone()
+            if row is None:
+                return None
+            related = [r[0] for r in conn.execute(self.SELECT_RELATED, (term_id,))]
+        return self._row_to_record(row, related)
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "get_many")
+    def get_many(self, term_ids: Iterable[str]) -> Dict[str, TermRecord]:
+        ids = list(dict.fromkeys(term_ids))
+        result: Dict[str, TermRecord] = {}
+        with self._read() as conn:
+            # Пачками, чтобы не упереться в лимит параметров SQLite
+            for start in range(0, len(ids), self.MAX_PARAMS):
+                chunk = ids[start:start + self.MAX_PARAMS]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT {self.TERM_COLUMNS} FROM terms WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                related = self._related_of(conn, [row[0] for row in rows])
+                for row in rows:
+                    result[row[0]] = self._row_to_record(row, related.get(row[0], []))
+        return result
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "all")
+    def all(self) -> List[TermRecord]:
+        with self._read() as conn:
+            rows = conn.execute(self.SELECT_ALL_TERMS).fetchall()
+            related: Dict[str, List[str]] = {}
+            for term_id, rel in conn.execute(self.SELECT_ALL_RELATED):
+                related.setdefault(term_id, []).append(rel)
+        return [self._row_to_record(row, related.get(row[0], [])) for row in rows]
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "count")
+    def count(self) -> int:
+        with self._connection() as conn:
+            return conn.execute(self.COUNT_TERMS).fetchone()[0]
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "page")
+    def page(
+        self,
+        limit: int,
+        after: Optional[SortKey] = None,
+        category: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False,
+    ) -> List[TermRecord]:
+        column = self.SORT_COLUMNS[sort]
+        op, order = ("<", "DESC") if descending else (">", "ASC")
+        conditions: List[str] = []
+        params: List[Any] = []
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if after is not None:
+            value, term_id = after
+            if isinstance(value, datetime):
+                value = self._timestamp(value)
+            if column == "id":
+                conditions.append(f"id {op} ?")
+                params.append(term_id)
+            else:
+                conditions.append(f"({column}, id) {op} (?, ?)")
+                params.extend((value, term_id))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order_by = f"id {order}" if column == "id" else f"{column} {order}, id {order}"
+        sql = f"SELECT {self.TERM_COLUMNS} FROM terms {where} ORDER BY {order_by} LIMIT ?"
+        params.append(limit)
+
+        with self._read() as conn:
+            rows = conn.execute(sql, params).fetchall()
+            related = self._related_of(conn, [row[0] for row in rows])
+        return [self._row_to_record(row, related.get(row[0], [])) for row in rows]
+
+    def _related_of(self, conn: sqlite3.Connection, term_ids: List[str]) -> Dict[str, List[str]]:
+        """Связанные термины для нескольких терминов одним запросом"""
+        related: Dict[str, List[str]] = {}
+        # Пачками, как в get_many: страница или пакет могут быть больше лимита параметров
+        for start in range(0, len(term_ids), self.MAX_PARAMS):
+            chunk = term_ids[start:start + self.MAX_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            for term_id, rel in conn.execute(
+                f"SELECT term_id, related FROM related_terms WHERE term_id IN ({placeholders}) "
+                "ORDER BY term_id, position",
+                chunk,
+            ):
+                related.setdefault(term_id, []).append(rel)
+        return related
+
+    def _insert_related(self, conn: sqlite3.Connection, term: TermRecord) -> None:
+        conn.executemany(
+            self.INSERT_RELATED,
+            [(term.id, pos, rel) for pos, rel in enumerate(term.related_terms)],
+        )
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "insert")
+    def insert(self, term: TermRecord) -> bool:
+        with self.transaction() as conn:
+            try:
+                conn.execute(self.INSERT_TERM, (
+                    term.id, term.keyword, term.title, term.definition,
+                    term.source, term.category,
+                    self._timestamp(term.created_at), self._timestamp(term.updated_at),
+                ))
+            except sqlite3.IntegrityError:
+                return False
+            self._insert_related(conn, term)
+            self._touch(conn, (term.id,))
+        return True
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "replace")
+    def replace(self, term: TermRecord) -> None:
+        with self.transaction() as conn:
+            conn.execute(self.UPDATE_TERM, (
+                term.keyword, term.title, term.definition, term.source, term.category,
+                self._timestamp(term.created_at), self._timestamp(term.updated_at), term.id,
+            ))
+            conn.execute(self.DELETE_RELATED_OF, (term.id,))
+            self._insert_related(conn, term)
+            self._touch(conn, (term.id,))
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "delete")
+    def delete(self, term_id: str) -> bool:
+        with self.transaction() as conn:
+            # Ребра удаляются каскадом (ON DELETE CASCADE)
+            if conn.execute(self.DELETE_TERM, (term_id,)).rowcount == 0:
+                return False
+            self._touch(conn, (term_id,))
+            return True
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "remove_related")
+    def remove_related(self, term_id: str, referrers: Iterable[str]) -> None:
+        # Индекс по related_terms.related находит ссылки сам
+        with self.transaction() as conn:
+            changed = [row[0] for row in conn.execute(self.SELECT_REFERRERS, (term_id,))]
+            if changed:
+                conn.execute(self.DELETE_RELATED_TO, (term_id,))
+                self._touch(conn, changed)
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "revision")
+    def revision(self) -> int:
+        with self._connection() as conn:
+            return conn.execute(self.SELECT_REVISION).fetchone()[0]
+
+    @timed(STORAGE_OPERATION_DURATION, "sqlite", "changed_since")
+    def changed_since(self, revision: int) -> Optional[List[str]]:
+        with self._read() as conn:
+            if revision < conn.execute(self.SELECT_HISTORY).fetchone()[0]:
+                return None
+            return [row[0] for row in conn.execute(self.SELECT_CHANGES_AFTER, (revision,))]
+
+    @property
+    def epoch(self) -> str:
+        return self._epoch
+
+    def close(self) -> None:
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+
+
+def create_storage() -> StorageBackend:
+    """Создать бэкенд хранилища согласно настройкам"""
+    if config.STORAGE_BACKEND == "memory":
+        return InMemoryStorage()
+    if config.STORAGE_BACKEND == "snapshot":
+        return SnapshotStorage(
+            config.SNAPSHOT_PATH,
+            fsync=config.SNAPSHOT_FSYNC,
+            compact_bytes=config.SNAPSHOT_COMPACT_BYTES,
+            check_interval=config.SNAPSHOT_COMPACT_INTERVAL,
+        )
+    if config.STORAGE_BACKEND == "sqlite":
+        return SQLiteStorage(
+            config.SQLITE_PATH, pool_size=config.SQLITE_POOL_SIZE, history=config.SQLITE_CHANGE_HISTORY
+        )
+    raise ValueError(f"Неизвестный бэкенд хранилища: '{config.STORAGE_BACKEND}'")
@@ -0,0 +1,80 @@
+"""
+Общие фикстуры: хранилища всех бэкендов, база над ними и клиент API,
+которому репозиторий подставляется через app.dependency_overrides.
+"""
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import WriteAdmission
+from database import Database
+from repository import ThreadedRepository
+from storage import InMemoryStorage, SnapshotStorage, SQLiteStorage
+
+BACKENDS = ("memory", "snapshot", "sqlite")
+
+
+def open_storage(backend: str, directory):
+    """Хранилище бэкенда backend с файлами в directory (прежние данные сохраняются)"""
+    if backend == "memory":
+        return InMemoryStorage()
+    if backend == "snapshot":
+        # Журнал уплотняется только при закрытии
+        return SnapshotStorage(str(directory / "glossary.snap"), fsync=False, check_interval=3600)
+    return SQLiteStorage(str(directory / "glossary.db"), pool_size=2)
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request) -> str:
+    return request.param
+
+
+@pytest.fixture
+def storage(backend, tmp_path):
+    storage = open_storage(backend, tmp_path)
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def database(storage) -> Database:
+    return Database(storage)
+
+
+@pytest.fixture
+def admission(monkeypatch) -> WriteAdmission:
+    """Допуск записей без ограничений; тесты допуска подставляют свой"""
+    admission = WriteAdmission(rate=0, burst=0, max_concurrent=0)
+    monkeypatch.setattr(main, "write_admission", admission)
+    return admission
+
+
+@pytest.fixture
+def serve(admission):
+    """serve(database, **настройки репозитория) — контекст с клиентом API поверх этой базы"""
+
+    @contextmanager
+    def serve(database: Database, **settings):
+        repository = ThreadedRepository(database, **dict({"threads": 2, "graph_threads": 1}, **settings))
+        # Кэш ответов общий для процесса: ответы прошлой базы не должны попасть в эту
+        main.response_cache.clear()
+        main.response_cache.etag_prefix = f"{repository.epoch}-"
+        main.app.dependency_overrides[main.get_repository] = lambda: repository
+        try:
+            with TestClient(main.app) as client:
+                yield client
+        finally:
+            main.app.dependency_overrides.clear()
+            main.response_cache.clear()
+            # Закрывает и хранилище; повторное закрытие ничего не делает
+            repository.close()
+
+    return serve
+
+
+@pytest.fixture
+def client(serve, database):
+    with serve(database) as client:
+        yield client
@@ -0,0 +1,75 @@
+"""Допуск записей: 429 по лимиту клиента и 503 при перегрузке, оба с Retry-After"""
+import pytest
+
+import main
+from admission import WriteAdmission
+
+pytestmark = pytest.mark.parametrize("backend", ["memory"])
+
+
+def term(number: int):
+    return {"keyword": f"limited-{number}", "title": f"Запись {number}", "definition": "Проверка допуска"}
+
+
+@pytest.fixture
+def limit(monkeypatch):
+    def limit(**settings) -> WriteAdmission:
+        admission = WriteAdmission(**dict({"rate": 0, "burst": 0, "max_concurrent": 0}, **settings))
+        monkeypatch.setattr(main, "write_admission", admission)
+        return admission
+
+    return limit
+
+
+def test_rate_limit_is_429(client, limit):
+    admission = limit(rate=0.001, burst=2)
+    assert client.post("/api/terms", json=term(1)).status_code == 201
+    assert client.post("/api/terms", json=term(2)).status_code == 201
+
+    response = client.post("/api/terms", json=term(3))
+    assert response.status_code == 429
+    # Токен появится через 1000 секунд
+    assert int(response.headers["Retry-After"]) >= 999
+    assert admission.rate_limited == 1
+    assert client.get("/api/terms/limited-3").status_code == 404
+    # Лимит — только на записи
+    assert client.get("/api/terms").status_code == 200
+    assert client.get("/api/search", params={"q": "запись"}).status_code == 200
+    assert client.put("/api/terms/pwa", json={"title": "PWA"}).status_code == 429
+    assert client.delete("/api/terms/pwa").status_code == 429
+    assert client.post("/api/terms/batch", json={"operations": [
+        {"op": "delete", "keyword": "pwa"},
+    ]}).status_code == 429
+
+
+def test_overload_is_503(client, limit):
+    admission = limit(max_concurrent=1)
+    # Одна запись уже выполняется
+    admission.in_flight = 1
+    response = client.post("/api/terms", json=term(1))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert admission.shed == 1
+    assert client.get("/api/terms/limited-1").status_code == 404
+
+    admission.in_flight = 0
+    assert client.post("/api/terms", json=term(1)).status_code == 201
+    assert admission.in_flight == 0
+
+
+def test_shed_write_keeps_client_token(client, limit):
+    admission = limit(rate=0.001, burst=1, max_concurrent=1)
+    admission.in_flight = 1
+    assert client.post("/api/terms", json=term(1)).status_code == 503
+    admission.in_flight = 0
+    # Отклоненная по перегрузке запись не потратила единственный токен
+    assert client.post("/api/terms", json=term(1)).status_code == 201
+    assert client.post("/api/terms", json=term(2)).status_code == 429
+
+
+def test_rejected_write_releases_slot(client, limit):
+    admission = limit(max_concurrent=1)
+    # Ошибка обработчика (400) тоже освобождает место
+    assert client.post("/api/terms", json=dict(term(1), keyword="pwa")).status_code == 400
+    assert admission.in_flight == 0
+    assert client.post("/api/terms", json=term(1)).status_code == 201
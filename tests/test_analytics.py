@@ -0,0 +1,126 @@
+"""Аналитика графа: расчет метрик, фоновый пересчет, ошибки и ожидание первого результата"""
+import threading
+import time
+
+import pytest
+
+import analytics
+from analytics import AnalyticsUnavailable, GraphAnalytics
+from database import Database
+from storage import InMemoryStorage
+
+pytest.importorskip("numpy")
+
+
+def eventually(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "условие не выполнилось"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def graph_at():
+    database = Database(InMemoryStorage())
+    snapshot = database._current()
+    return snapshot.revision, snapshot.graph
+
+
+def test_metrics_of_small_graph(graph_at):
+    version, graph = graph_at
+    result = analytics.compute(version, graph)
+    report = result.to_dict(100)
+    assert report["version"] == version
+    assert report["node_count"] == len(graph.nodes) == len(report["terms"])
+    assert report["edge_count"] <= graph.edge_count
+    assert sum(t["pagerank"] for t in report["terms"]) == pytest.approx(1.0)
+    ranks = [t["pagerank"] for t in report["terms"]]
+    assert ranks == sorted(ranks, reverse=True)
+    for term in report["terms"]:
+        assert term["degree"] == term["in_degree"] + term["out_degree"]
+    assert sum(c["size"] for c in report["components"]["largest"]) + report["components"]["isolated"] <= len(ranks)
+
+
+def test_prepare_computes_without_a_request():
+    database = Database(InMemoryStorage())
+    # Первый расчет запускается при создании базы, до запроса аналитики
+    eventually(lambda: database.analytics.result is not None)
+    assert database.analytics.result.version == database.version
+
+
+def test_failure_reaches_every_waiter(graph_at, monkeypatch):
+    version, graph = graph_at
+    release = threading.Event()
+
+    def failing(*args):
+        release.wait(5)
+        raise RuntimeError("расчет упал")
+
+    monkeypatch.setattr(analytics, "compute", failing)
+    graph_analytics = GraphAnalytics(delay=0, wait=10)
+    errors = []
+
+    def request():
+        try:
+            graph_analytics.get(version, graph)
+        except BaseException as exc:
+            errors.append(exc)
+
+    waiters = [threading.Thread(target=request) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.2)
+    release.set()
+    for waiter in waiters:
+        waiter.join(5)
+    assert not any(waiter.is_alive() for waiter in waiters)
+    assert len(errors) == 3 and all(isinstance(e, RuntimeError) for e in errors)
+
+    # Следующий запрос считает заново, а не получает прошлую ошибку
+    monkeypatch.undo()
+    assert graph_analytics.get(version, graph).version == version
+
+
+def test_first_result_wait_is_bounded(graph_at, monkeypatch):
+    version, graph = graph_at
+    release = threading.Event()
+    real_compute = analytics.compute
+
+    def slow(*args):
+        release.wait(5)
+        return real_compute(*args)
+
+    monkeypatch.setattr(analytics, "compute", slow)
+    graph_analytics = GraphAnalytics(delay=0, wait=0.2)
+    started = time.monotonic()
+    with pytest.raises(AnalyticsUnavailable):
+        graph_analytics.get(version, graph)
+    assert time.monotonic() - started < 2
+    release.set()
+    eventually(lambda: graph_analytics.result is not None)
+    assert graph_analytics.get(version, graph).version == version
+
+
+def test_endpoint_returns_report_and_recomputes_after_writes(client, database):
+    database.analytics.delay = 0
+    response = client.get("/api/graph/analytics", params={"limit": 3})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["version"] == database.version
+    assert report["node_count"] == 15 and len(report["terms"]) == 3
+
+    client.post("/api/terms", json={"keyword": "hub", "title": "Хаб", "definition": "x",
+                                    "related_terms": ["pwa", "https", "service-worker"]})
+    version = database.version
+
+    def recomputed():
+        report = client.get("/api/graph/analytics", params={"limit": 100}).json()
+        return report["version"] == version and report["node_count"] == 16
+
+    eventually(recomputed)
+
+
+def test_endpoint_without_numpy_is_503(client, monkeypatch):
+    monkeypatch.setattr(analytics, "np", None)
+    response = client.get("/api/graph/analytics")
+    assert response.status_code == 503
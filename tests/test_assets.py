@@ -0,0 +1,108 @@
+"""Статика: имена с хешем содержимого, заранее сжатые варианты и сборка sw.js"""
+import gzip
+import json
+import re
+
+import pytest
+
+from assets import IMMUTABLE, StaticAssets
+from cache import MIN_COMPRESS_SIZE, brotli
+
+SHELL = """<!DOCTYPE html>
+<link rel="stylesheet" href="styles.css">
+<script src="https://cdn.example.com/lib.js"></script>
+<script src="./app.js"></script>
+<a href="#top">вверх</a>
+"""
+SERVICE_WORKER = """const SHELL_VERSION = '{{SHELL_VERSION}}';
+const SHELL_URLS = ["{{SHELL_URLS}}"];
+"""
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    directory = tmp_path / "static"
+    directory.mkdir()
+    (directory / "index.html").write_text(SHELL, encoding="utf-8")
+    (directory / "sw.js").write_text(SERVICE_WORKER, encoding="utf-8")
+    (directory / "app.js").write_text("console.log('приложение');\n" * 100, encoding="utf-8")
+    (directory / "styles.css").write_text("body { margin: 0 }\n", encoding="utf-8")
+    return directory
+
+
+def test_files_get_content_hashed_urls(static_dir):
+    assets = StaticAssets(str(static_dir))
+    assert set(assets.urls) == {"app.js", "styles.css"}
+    for name, url in assets.urls.items():
+        stem, extension = name.rsplit(".", 1)
+        assert re.fullmatch(rf"/static/{stem}\.[0-9a-f]{{16}}\.{extension}", url)
+        hashed = assets.get(url[len("/static/"):])
+        assert hashed.headers == {"Cache-Control": IMMUTABLE}
+        # Прежний адрес без хеша отдает то же, но без immutable
+        plain = assets.get(name)
+        assert plain.body == hashed.body and plain.headers == {}
+    assert assets.get("missing.js") is None
+
+
+def test_shell_references_hashed_urls(static_dir):
+    assets = StaticAssets(str(static_dir))
+    shell = assets.shell.body.decode("utf-8")
+    assert f'href="{assets.urls["styles.css"]}"' in shell
+    assert f'src="{assets.urls["app.js"]}"' in shell
+    # Внешние адреса и якоря не меняются
+    assert 'src="https://cdn.example.com/lib.js"' in shell
+    assert 'href="#top"' in shell
+
+
+def test_service_worker_gets_shell_version_and_urls(static_dir):
+    assets = StaticAssets(str(static_dir))
+    service_worker = assets.service_worker.body.decode("utf-8")
+    assert "{{" not in service_worker
+    assert f"const SHELL_VERSION = '{assets.version}';" in service_worker
+    urls = json.loads(re.search(r"const SHELL_URLS = (\[.*\]);", service_worker).group(1))
+    assert urls == assets.shell_urls == ["/", *assets.urls.values()]
+
+
+def test_changed_file_changes_url_shell_and_service_worker(static_dir):
+    before = StaticAssets(str(static_dir))
+    (static_dir / "app.js").write_text("console.log('новая версия');\n", encoding="utf-8")
+    after = StaticAssets(str(static_dir))
+    assert after.urls["app.js"] != before.urls["app.js"]
+    assert after.urls["styles.css"] == before.urls["styles.css"]
+    assert after.version != before.version
+    assert after.service_worker.etag != before.service_worker.etag
+
+
+def test_large_files_are_precompressed(static_dir):
+    assets = StaticAssets(str(static_dir))
+    large = assets.get("app.js")
+    assert len(large.body) >= MIN_COMPRESS_SIZE
+    assert gzip.decompress(large.gzip_body) == large.body
+    if brotli is not None:
+        assert brotli.decompress(large.br_body) == large.body
+    # Маленький файл сжимать незачем
+    small = assets.get("styles.css")
+    assert small.gzip_body is None and small.br_body is None
+
+
+@pytest.mark.parametrize("backend", ["memory"])
+def test_served_assets(client):
+    shell = client.get("/")
+    assert shell.status_code == 200 and shell.headers["Cache-Control"] == "no-cache"
+    url = re.search(r'src="(/static/app\.[0-9a-f]{16}\.js)"', shell.text).group(1)
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == IMMUTABLE
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Content-Type"].startswith("text/javascript")
+    with open("static/app.js", "rb") as file:
+        assert response.content == file.read()
+    assert client.get(url, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    assert client.get("/static/app.js").headers["Cache-Control"] == "no-cache"
+    assert client.get("/static/missing.js").status_code == 404
+
+    service_worker = client.get("/sw.js")
+    assert service_worker.status_code == 200 and "{{" not in service_worker.text
+    assert f'"{url}"' in service_worker.text
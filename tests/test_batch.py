@@ -0,0 +1,134 @@
+"""Пакетные запросы: атомарность и откат POST /api/terms/batch, пакетное чтение"""
+import pytest
+
+
+def create(number: int, category="API", **fields):
+    term = {
+        "keyword": f"Item-{number:02d}",
+        "title": f"Элемент {(number * 7) % 13:02d}",
+        "definition": f"Определение {number}",
+        "category": category,
+        "related_terms": ["pwa"],
+    }
+    term.update(fields)
+    return {"op": "create", "term": term}
+
+
+def state(client):
+    """Данные, которые батч мог бы изменить: термины, поиск, граф и журнал"""
+    terms = client.get("/api/terms", params={"limit": 1000, "fields": "id,title,definition,related_terms"})
+    return {
+        "terms": terms.json(),
+        "etag": terms.headers["ETag"],
+        "search": client.get("/api/search", params={"q": "элемент"}).json(),
+        "graph": client.get("/api/graph").json()["edges"],
+        "changes": client.get("/api/changes", params={"since": 0}).json()["seq"],
+    }
+
+
+def test_batch_applies_all_operations_in_one_version(client):
+    before = client.get("/api/changes", params={"since": 0}).json()["seq"]
+    response = client.post("/api/terms/batch", json={"operations": [
+        create(1),
+        create(2, related_terms=["item-01"]),
+        {"op": "update", "keyword": "ITEM-01", "changes": {"title": "Первый"}},
+        {"op": "delete", "keyword": "https"},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["op"] for r in results] == ["create", "create", "update", "delete"]
+    assert results[2]["term"]["title"] == "Первый" and results[3]["term"] is None
+
+    assert client.get("/api/terms/item-01").json()["title"] == "Первый"
+    assert client.get("/api/terms/https").status_code == 404
+    assert [t["id"] for t in client.get("/api/terms/item-01/backlinks").json()] == ["item-02"]
+    # Все изменения пакета — одна версия данных
+    changes = client.get("/api/changes", params={"since": before}).json()["changes"]
+    assert len({change["version"] for change in changes}) == 1
+    assert {change["id"] for change in changes} >= {"item-01", "item-02", "https"}
+
+
+@pytest.mark.parametrize("operations", [
+    # Вторая операция невыполнима: термина нет
+    [create(1), {"op": "update", "keyword": "missing", "changes": {"title": "x"}}],
+    # Ключевое слово уже занято — в том числе созданием в этом же пакете
+    [create(1), create(1)],
+    [create(1), {"op": "create", "term": {"keyword": "PWA", "title": "x", "definition": "y"}}],
+    # Удаленный в пакете термин дальше не существует
+    [{"op": "delete", "keyword": "pwa"}, {"op": "update", "keyword": "pwa", "changes": {"title": "x"}}],
+])
+def test_invalid_batch_changes_nothing(client, operations):
+    before = state(client)
+    response = client.post("/api/terms/batch", json={"operations": operations})
+    assert response.status_code == 400
+    assert "Операция 2" in response.json()["detail"]
+    assert state(client) == before
+    assert client.get("/api/terms", headers={"If-None-Match": before["etag"]},
+                      params={"limit": 1000, "fields": "id,title,definition,related_terms"}).status_code == 304
+
+
+def test_batch_rolls_back_on_failure_midway(client, storage, monkeypatch):
+    before = state(client)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("сбой хранилища")
+
+    # Создание уже применено к черновику, когда удаление падает
+    monkeypatch.setattr(storage, "delete", fail)
+    with pytest.raises(RuntimeError):
+        client.post("/api/terms/batch", json={"operations": [
+            create(1), {"op": "update", "keyword": "pwa", "changes": {"title": "x"}},
+            {"op": "delete", "keyword": "https"},
+        ]})
+    monkeypatch.undo()
+
+    assert client.get("/api/terms/item-01").status_code == 404
+    assert client.get("/api/terms/pwa").json()["title"] != "x"
+    assert state(client) == before
+    # Блокировки освобождены: следующая запись проходит
+    assert client.post("/api/terms", json=create(1)["term"]).status_code == 201
+
+
+def test_batch_validation(client):
+    assert client.post("/api/terms/batch", json={"operations": []}).status_code == 422
+    assert client.post("/api/terms/batch", json={"operations": [{"op": "update", "keyword": "pwa"}]}).status_code == 422
+
+
+def test_batch_get_returns_found_and_missing(client):
+    response = client.post("/api/terms/batch-get", json={"keywords": ["PWA", "https", "nothing", "pwa"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(body["terms"]) == ["https", "pwa"]
+    assert body["terms"]["pwa"]["id"] == "pwa"
+    assert body["missing"] == ["nothing"]
+
+
+def test_batch_get_larger_than_sqlite_parameter_chunk(client, storage):
+    # Меньший размер пачки, чтобы и выборка терминов, и их связи шли в несколько запросов
+    storage.MAX_PARAMS = 4
+    operations = [create(n, related_terms=["pwa", f"item-{n + 1:02d}"]) for n in range(1, 12)]
+    assert client.post("/api/terms/batch", json={"operations": operations}).status_code == 200
+    keywords = [f"item-{n:02d}" for n in range(1, 12)]
+    terms = client.post("/api/terms/batch-get", json={"keywords": keywords}).json()["terms"]
+    assert sorted(terms) == keywords
+    assert all(terms[k]["related_terms"] == ["pwa", f"item-{int(k[5:]) + 1:02d}"] for k in keywords)
+    # Страница списка тоже читает связи пачками
+    page = client.get("/api/terms", params={"limit": 1000, "category": "API", "fields": "id,related_terms"}).json()
+    assert {t["id"]: t["related_terms"] for t in page if t["id"] in terms} == {
+        k: terms[k]["related_terms"] for k in keywords
+    }
+
+
+def test_expand_related(client):
+    client.post("/api/terms", json=create(1, related_terms=["pwa", "missing", "https"])["term"])
+    plain = client.get("/api/terms/item-01").json()
+    assert "related" not in plain
+    expanded = client.get("/api/terms/item-01", params={"expand": "related"}).json()
+    assert [t["id"] for t in expanded["related"]] == ["pwa", "https"]
+    assert set(expanded["related"][0]) == {"id", "keyword", "title", "category"}
+    assert client.get("/api/terms/item-01", params={"expand": "all"}).status_code == 422
+
+
+def test_batch_get_limits(client):
+    assert client.post("/api/terms/batch-get", json={"keywords": []}).status_code == 422
+    assert client.post("/api/terms/batch-get", json={"keywords": ["x"] * 1001}).status_code == 422
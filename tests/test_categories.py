@@ -0,0 +1,51 @@
+"""GET /api/categories: счетчики категорий, которые обновляются при записи"""
+from collections import Counter
+
+from graph import CATEGORY_COLORS, DEFAULT_COLOR
+
+
+def counts(client):
+    response = client.get("/api/categories")
+    assert response.status_code == 200
+    return {facet["category"]: facet["count"] for facet in response.json()}
+
+
+def test_counts_match_terms(client):
+    facets = client.get("/api/categories").json()
+    terms = client.get("/api/terms", params={"limit": 1000, "fields": "id,category"}).json()
+    assert {f["category"]: f["count"] for f in facets} == Counter(t["category"] for t in terms)
+    # По названию; без категории — в конце
+    names = [f["category"] for f in facets]
+    assert names == sorted(n for n in names if n is not None) + [n for n in names if n is None]
+    assert all(f["color"] == CATEGORY_COLORS.get(f["category"], DEFAULT_COLOR) for f in facets)
+
+
+def test_counts_follow_writes(client):
+    before = counts(client)
+    client.post("/api/terms", json={"keyword": "facet", "title": "Фасет", "definition": "x", "category": "Новая"})
+    assert counts(client) == {**before, "Новая": 1}
+
+    # Смена категории переносит термин из одного счетчика в другой
+    client.put("/api/terms/facet", json={"category": "API"})
+    assert counts(client) == {**before, "API": before.get("API", 0) + 1}
+
+    # null в правке не меняет категорию
+    client.put("/api/terms/facet", json={"category": None})
+    assert counts(client) == {**before, "API": before.get("API", 0) + 1}
+
+    client.delete("/api/terms/facet")
+    assert counts(client) == before
+
+
+def test_emptied_category_disappears(client):
+    client.post("/api/terms", json={"keyword": "lonely", "title": "Один", "definition": "x", "category": "Редкая"})
+    assert "Редкая" in counts(client)
+    client.delete("/api/terms/lonely")
+    assert "Редкая" not in counts(client)
+
+
+def test_counts_are_cached_per_version(client):
+    etag = client.get("/api/categories").headers["ETag"]
+    assert client.get("/api/categories", headers={"If-None-Match": etag}).status_code == 304
+    client.put("/api/terms/pwa", json={"title": "PWA"})
+    assert client.get("/api/categories", headers={"If-None-Match": etag}).status_code == 200
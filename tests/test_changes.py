@@ -0,0 +1,134 @@
+"""GET /api/changes: продолжение с позиции клиента и reset, когда позиция потеряна"""
+import json
+
+import pytest
+
+from changes import ChangeLog
+from conftest import open_storage
+from database import Database
+from models import TermCreate, TermUpdate
+
+
+def feed(client, since: int, log=None):
+    params = {"since": since}
+    if log is not None:
+        params["log"] = log
+    response = client.get("/api/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_fresh_log_has_no_reset(client):
+    body = feed(client, 0)
+    # Журнал начинается с пустой базы: в нем создание начальных терминов
+    assert body["reset"] is False and body["log"]
+    assert [c["op"] for c in body["changes"]] == ["create"] * 15
+    assert body["seq"] == 15
+
+
+def test_resume_returns_only_new_changes(client):
+    start = feed(client, 0)
+    client.post("/api/terms", json={"keyword": "Offline", "title": "Офлайн", "definition": "Без сети",
+                                    "related_terms": ["pwa"]})
+    client.put("/api/terms/pwa", json={"title": "PWA"})
+    client.delete("/api/terms/https")
+
+    body = feed(client, start["seq"], start["log"])
+    assert body["reset"] is False and body["log"] == start["log"]
+    changes = body["changes"]
+    assert [(c["op"], c["id"]) for c in changes[:3]] == [
+        ("create", "offline"), ("update", "pwa"), ("delete", "https"),
+    ]
+    assert [c["seq"] for c in changes] == list(range(start["seq"] + 1, body["seq"] + 1))
+    created = changes[0]
+    assert created["term"]["title"] == "Офлайн"
+    assert {"from": "offline", "to": "pwa"} in [{"from": e["from"], "to": e["to"]} for e in created["edges"]]
+    assert changes[2]["term"] is None
+
+    # С последней позиции — пусто, без reset
+    assert feed(client, body["seq"], body["log"]) == dict(body, changes=[])
+    # С середины — только хвост
+    assert [c["seq"] for c in feed(client, changes[0]["seq"], body["log"])["changes"]] == [
+        c["seq"] for c in changes[1:]
+    ]
+
+
+@pytest.mark.parametrize("shift", ["log", "ahead"])
+def test_foreign_position_is_reset(client, shift):
+    client.put("/api/terms/pwa", json={"title": "PWA"})
+    current = feed(client, 0)
+    if shift == "log":
+        # Позиция из журнала другого процесса (например, до перезапуска)
+        body = feed(client, 1, "0" * 8)
+    else:
+        body = feed(client, current["seq"] + 5, current["log"])
+    assert body["reset"] is True and body["changes"] == []
+    assert body["seq"] == current["seq"] and body["log"] == current["log"]
+    # С позиции из ответа reset клиент продолжает как обычно
+    client.put("/api/terms/pwa", json={"title": "PWA снова"})
+    assert [c["id"] for c in feed(client, body["seq"], body["log"])["changes"]] == ["pwa"]
+
+
+@pytest.mark.parametrize("backend", ["memory"])
+def test_overflowed_log_is_reset(client, database):
+    database.changes = ChangeLog(3)
+    start = feed(client, 0)
+    for number in range(5):
+        client.put("/api/terms/pwa", json={"title": f"PWA {number}"})
+    body = feed(client, start["seq"], start["log"])
+    assert body["reset"] is True and body["seq"] == start["seq"] + 5
+    # Последние три изменения еще в журнале
+    assert len(feed(client, body["seq"] - 3, body["log"])["changes"]) == 3
+
+
+def test_other_worker_changes_arrive_as_events(tmp_path, serve):
+    # Два воркера с общей SQLite базой; клиент подключен к первому
+    database = Database(open_storage("sqlite", tmp_path))
+    other = Database(open_storage("sqlite", tmp_path))
+    try:
+        with serve(database) as client:
+            start = feed(client, 0)
+            other.create_term(TermCreate(keyword="remote", title="Чужой", definition="Из другого воркера",
+                                         related_terms=["pwa"]))
+            other.update_term("pwa", TermUpdate(title="PWA"))
+            other.delete_term("https")
+
+            body = feed(client, start["seq"], start["log"])
+            assert body["reset"] is False
+            assert sorted((c["op"], c["id"]) for c in body["changes"]) == [
+                ("create", "remote"), ("delete", "https"), ("update", "pwa"),
+            ]
+            # Индексы воркера догнали чужие изменения
+            assert client.get("/api/terms/remote").status_code == 200
+            assert "remote" in [t["id"] for t in client.get("/api/terms/pwa/backlinks").json()]
+            assert "https" not in [n["id"] for n in client.get("/api/graph").json()["nodes"]]
+    finally:
+        other.storage.close()
+
+
+def test_pruned_history_is_reset(tmp_path, serve):
+    database = Database(open_storage("sqlite", tmp_path))
+    other_storage = open_storage("sqlite", tmp_path)
+    # Таблица changes помнит одну ревизию и чистится на каждой записи
+    other_storage.history, other_storage.PRUNE_EVERY = 1, 1
+    other = Database(other_storage)
+    try:
+        with serve(database) as client:
+            start = feed(client, 0)
+            for number in range(3):
+                other.update_term("pwa", TermUpdate(title=f"PWA {number}"))
+            body = feed(client, start["seq"], start["log"])
+            assert body["reset"] is True
+            assert client.get("/api/terms/pwa").json()["title"] == "PWA 2"
+            # После перестройки журнал снова ведется
+            other.update_term("pwa", TermUpdate(title="PWA 3"))
+            assert [c["id"] for c in feed(client, body["seq"], body["log"])["changes"]] == ["pwa"]
+    finally:
+        other_storage.close()
+
+
+def test_change_bodies_are_json(client):
+    client.put("/api/terms/pwa", json={"title": "PWA"})
+    for change in feed(client, 0)["changes"]:
+        assert set(change) >= {"seq", "version", "op", "id", "term", "node", "edges"}
+        json.dumps(change)
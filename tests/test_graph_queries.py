@@ -0,0 +1,92 @@
+"""Окрестность термина и путь между терминами: глубина, направление, лимиты и X-Truncated"""
+import pytest
+
+pytestmark = pytest.mark.parametrize("backend", ["memory"])
+
+# Цепочка a → b → c → d и «звезда» hub → spoke-0..4
+TERMS = {
+    "a": ["b"], "b": ["c"], "c": ["d"], "d": [],
+    "hub": [f"spoke-{number}" for number in range(5)],
+    **{f"spoke-{number}": [] for number in range(5)},
+}
+
+
+@pytest.fixture
+def graph_client(client):
+    # Сначала термины без связей, чтобы связи указывали на существующие узлы
+    for keyword in TERMS:
+        assert client.post("/api/terms", json={"keyword": keyword, "title": keyword.upper(),
+                                               "definition": "Узел тестового графа"}).status_code == 201
+    for keyword, related in TERMS.items():
+        if related:
+            assert client.put(f"/api/terms/{keyword}", json={"related_terms": related}).status_code == 200
+    return client
+
+
+def neighborhood(client, keyword: str, **params):
+    response = client.get(f"/api/graph/neighborhood/{keyword}", params=params)
+    assert response.status_code == 200
+    body = response.json()
+    return (
+        [node["id"] for node in body["nodes"]],
+        {(edge["from"], edge["to"]) for edge in body["edges"]},
+        response.headers.get("X-Truncated"),
+    )
+
+
+def path(client, source: str, target: str, **params):
+    response = client.get("/api/graph/path", params={"from": source, "to": target, **params})
+    assert response.status_code == 200
+    body = response.json()
+    return [node["id"] for node in body["nodes"]], [(edge["from"], edge["to"]) for edge in body["edges"]]
+
+
+def test_depth_and_direction(graph_client):
+    nodes, edges, truncated = neighborhood(graph_client, "b")
+    # Центр первым, затем соседи в обе стороны
+    assert nodes[0] == "b" and set(nodes) == {"a", "b", "c"}
+    assert edges == {("a", "b"), ("b", "c")} and truncated is None
+
+    assert set(neighborhood(graph_client, "b", direction="out")[0]) == {"b", "c"}
+    assert set(neighborhood(graph_client, "b", direction="in")[0]) == {"a", "b"}
+    nodes, edges, _ = neighborhood(graph_client, "a", depth=3, direction="out")
+    assert nodes == ["a", "b", "c", "d"]
+    assert edges == {("a", "b"), ("b", "c"), ("c", "d")}
+    assert neighborhood(graph_client, "d", depth=2, direction="out")[0] == ["d"]
+
+
+def test_limits_set_truncated_header(graph_client):
+    nodes, edges, truncated = neighborhood(graph_client, "hub", limit=3)
+    assert nodes[0] == "hub" and len(nodes) == 3 and truncated == "true"
+    # Ребра — только между вернувшимися узлами
+    assert all(source in nodes and target in nodes for source, target in edges)
+
+    nodes, edges, truncated = neighborhood(graph_client, "hub", max_edges=2)
+    assert len(edges) == 2 and truncated == "true"
+    assert neighborhood(graph_client, "hub", limit=6)[2] is None
+    # Ответ из кэша сохраняет заголовок
+    assert neighborhood(graph_client, "hub", limit=3)[2] == "true"
+
+
+def test_neighborhood_errors(graph_client):
+    assert graph_client.get("/api/graph/neighborhood/missing").status_code == 404
+    for params in ({"depth": 0}, {"depth": 7}, {"limit": 0}, {"direction": "up"}):
+        assert graph_client.get("/api/graph/neighborhood/a", params=params).status_code == 422
+
+
+def test_shortest_path(graph_client):
+    assert path(graph_client, "a", "d") == (["a", "b", "c", "d"], [("a", "b"), ("b", "c"), ("c", "d")])
+    assert path(graph_client, "A", "a")[0] == ["a"]
+    # Против направления связей пути нет, без учета направления — есть
+    assert path(graph_client, "d", "a", direction="out") == ([], [])
+    assert path(graph_client, "d", "a", direction="in")[0] == ["d", "c", "b", "a"]
+    assert path(graph_client, "d", "a")[0] == ["d", "c", "b", "a"]
+    # Путь длиннее max_depth не ищется
+    assert path(graph_client, "a", "d", max_depth=2) == ([], [])
+    assert path(graph_client, "a", "hub") == ([], [])
+
+
+def test_path_errors(graph_client):
+    response = graph_client.get("/api/graph/path", params={"from": "a", "to": "missing"})
+    assert response.status_code == 404
+    assert graph_client.get("/api/graph/path", params={"from": "a"}).status_code == 422
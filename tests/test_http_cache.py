@@ -0,0 +1,119 @@
+"""ETag и 304 для кэшируемых ответов: варианты сжатия, версия данных и эпоха хранилища"""
+import asyncio
+import threading
+
+import pytest
+
+from cache import ResponseCache, brotli
+from conftest import open_storage
+from database import Database
+from models import TermUpdate
+
+ENCODINGS = ["gzip", "identity"] + (["br"] if brotli is not None else [])
+
+
+def fetch(client, path="/api/terms?limit=50", encoding="identity", etag=None):
+    headers = {"Accept-Encoding": encoding}
+    if etag is not None:
+        headers["If-None-Match"] = etag
+    return client.get(path, headers=headers)
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_etag_names_encoding_variant(client, encoding):
+    response = fetch(client, encoding=encoding)
+    assert response.status_code == 200
+    assert response.headers["Vary"] == "Accept-Encoding"
+    etag = response.headers["ETag"]
+    if encoding == "identity":
+        assert "+" not in etag and "Content-Encoding" not in response.headers
+    else:
+        assert etag.endswith(f'+{encoding}"')
+        assert response.headers["Content-Encoding"] == encoding
+    # Тело одинаково во всех вариантах сжатия
+    assert response.json() == fetch(client).json()
+
+
+@pytest.mark.parametrize("stored", ENCODINGS)
+@pytest.mark.parametrize("requested", ENCODINGS)
+def test_304_across_encodings(client, stored, requested):
+    etag = fetch(client, encoding=stored).headers["ETag"]
+    response = fetch(client, encoding=requested, etag=etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert etag.startswith(response.headers["ETag"].rstrip('"'))
+
+
+def test_weak_and_listed_etags_match(client):
+    etag = fetch(client, encoding="gzip").headers["ETag"]
+    # Прокси, сжимающие ответ сами, ослабляют ETag
+    assert fetch(client, etag=f"W/{etag}").status_code == 304
+    assert fetch(client, etag=f'"other", {etag}').status_code == 304
+    assert fetch(client, etag='"other"').status_code == 200
+
+
+def test_write_invalidates_etag(client):
+    etag = fetch(client).headers["ETag"]
+    other = fetch(client, "/api/categories").headers["ETag"]
+    response = client.put("/api/terms/pwa", json={"title": "PWA"})
+    assert response.status_code == 200
+
+    response = fetch(client, etag=etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert fetch(client, "/api/categories", etag=other).status_code == 200
+    assert fetch(client, etag=response.headers["ETag"]).status_code == 304
+
+
+def test_etag_is_per_query(client):
+    etag = fetch(client, "/api/terms?limit=5").headers["ETag"]
+    assert fetch(client, "/api/terms?limit=6", etag=etag).status_code == 200
+
+
+@pytest.mark.parametrize("backend", ["memory", "snapshot", "sqlite"])
+def test_etag_survives_restart_only_with_same_data(backend, tmp_path, serve):
+    with serve(Database(open_storage(backend, tmp_path))) as client:
+        etag = fetch(client).headers["ETag"]
+
+    # Новый процесс: те же номера версий, но у памяти — новые данные (эпоха)
+    with serve(Database(open_storage(backend, tmp_path))) as client:
+        response = fetch(client, etag=etag)
+    assert response.status_code == (200 if backend == "memory" else 304)
+
+
+def test_write_during_build_keeps_etag_version(client, database, monkeypatch):
+    version = database.version
+    original = database.list_terms
+
+    def list_terms(*args):
+        # Запись другого потока проходит, пока ответ строится
+        writer = threading.Thread(target=database.update_term, args=("pwa", TermUpdate(title="Новое")))
+        writer.start()
+        writer.join()
+        return original(*args)
+
+    monkeypatch.setattr(database, "list_terms", list_terms)
+    response = fetch(client, "/api/terms?limit=50&fields=id,title")
+    monkeypatch.undo()
+    # Ответ прочитан из снимка, взятого до записи, и помечен его версией
+    titles = {t["id"]: t["title"] for t in response.json()}
+    assert titles["pwa"] != "Новое"
+    assert f"-{version}-" in response.headers["ETag"]
+
+    # Следующий запрос видит запись: старый ETag не подходит
+    response = fetch(client, "/api/terms?limit=50&fields=id,title", etag=response.headers["ETag"])
+    assert response.status_code == 200
+    assert {t["id"]: t["title"] for t in response.json()}["pwa"] == "Новое"
+    assert f"-{version + 1}-" in response.headers["ETag"]
+
+
+def test_older_build_does_not_replace_newer_entry():
+    async def scenario():
+        cache = ResponseCache()
+        newer = await cache.get_or_build("key", 5, lambda: (5, b"new", {}))
+        # Запрос, увидевший старую версию, получает свой ответ, но кэш не откатывает
+        older = await cache.get_or_build("key", 4, lambda: (4, b"old", {}))
+        assert older.body == b"old" and older.etag.startswith("4-")
+        assert await cache.get_or_build("key", 5, lambda: (5, b"rebuilt", {})) is newer
+
+    asyncio.run(scenario())
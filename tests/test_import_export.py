@@ -0,0 +1,113 @@
+"""Импорт и экспорт NDJSON через HTTP: режимы, ошибочные строки, границы кусков тела"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import main
+from database import Database
+from storage import InMemoryStorage
+
+pytestmark = pytest.mark.parametrize("backend", ["memory"])
+
+
+def ndjson(*terms) -> bytes:
+    return b"".join(json.dumps(term, ensure_ascii=False).encode("utf-8") + b"\n" for term in terms)
+
+
+def term(keyword: str, title: str = "Импортированный", **fields):
+    return {"keyword": keyword, "title": title, "definition": "Термин из файла", **fields}
+
+
+def import_body(client, body, mode: str = "error"):
+    response = client.post("/api/terms/import", params={"mode": mode}, content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_bad_lines_are_reported_with_line_numbers(client):
+    body = b"\n".join([
+        json.dumps(term("first")).encode(),
+        b"",  # пустые строки пропускаются, но считаются
+        b"{not json",
+        json.dumps({"keyword": "no-title"}).encode(),
+        json.dumps(term("second")).encode(),
+    ])
+    report = import_body(client, body)
+    assert report["created"] == 2 and report["failed"] == 2
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    assert "title" in report["errors"][1]["error"]
+    # Последняя строка без перевода строки тоже импортирована
+    assert client.get("/api/terms/second").status_code == 200
+
+
+def test_error_count_is_kept_past_reported_errors(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_IMPORT_ERRORS", 2)
+    report = import_body(client, b"x\n" * 5)
+    assert report["failed"] == 5 and len(report["errors"]) == 2
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ("error", {"created": 1, "updated": 0, "skipped": 0, "failed": 1}),
+    ("skip", {"created": 1, "updated": 0, "skipped": 1, "failed": 0}),
+    ("upsert", {"created": 1, "updated": 1, "skipped": 0, "failed": 0}),
+])
+def test_modes_for_existing_terms(client, mode, expected):
+    before = client.get("/api/terms/pwa").json()
+    report = import_body(client, ndjson(term("PWA", "Новое название"), term("fresh")), mode)
+    assert {key: report[key] for key in expected} == expected
+    title = client.get("/api/terms/pwa").json()["title"]
+    assert title == ("Новое название" if mode == "upsert" else before["title"])
+    if mode == "error":
+        assert report["errors"][0]["line"] == 1 and "PWA" in report["errors"][0]["error"]
+
+
+def test_unknown_mode_is_422(client):
+    response = client.post("/api/terms/import", params={"mode": "replace"}, content=ndjson(term("x")))
+    assert response.status_code == 422
+
+
+def test_lines_split_across_chunks(client, monkeypatch):
+    # Маленькие пачки — несколько транзакций за один импорт
+    monkeypatch.setattr(main, "IMPORT_BATCH_SIZE", 2)
+    body = ndjson(*(term(f"chunked-{number}", f"Термин №{number}") for number in range(7)))
+    sent = []
+
+    async def chunks(size: int = 5):
+        # Куски режут строки и многобайтовые символы UTF-8 посередине
+        for start in range(0, len(body), size):
+            sent.append(start)
+            yield body[start:start + size]
+
+    async def post():
+        # TestClient склеивает тело запроса, а ASGITransport передает его кусками
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/api/terms/import", content=chunks())
+
+    response = asyncio.run(post())
+    assert response.status_code == 200 and len(sent) > 1
+    report = response.json()
+    assert report["created"] == 7 and report["failed"] == 0
+    assert client.get("/api/terms/chunked-6").json()["title"] == "Термин №6"
+
+
+def test_export_round_trip(client, serve):
+    client.put("/api/terms/pwa", json={"title": "PWA", "category": "Основы"})
+    response = client.get("/api/terms/export")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("application/x-ndjson")
+    assert "glossary.ndjson" in response.headers["Content-Disposition"]
+    lines = response.content.decode("utf-8").splitlines()
+    exported = {item["id"]: item for item in map(json.loads, lines)}
+    assert len(lines) == len(exported) == client.get("/api/health").json()["terms_count"]
+    assert exported["pwa"]["title"] == "PWA"
+
+    # Выгрузка загружается в другую базу как есть
+    other = Database(InMemoryStorage())
+    with serve(other) as other_client:
+        report = import_body(other_client, response.content, "upsert")
+        assert report["failed"] == 0 and report["created"] + report["updated"] == len(lines)
+        assert other_client.get("/api/terms/pwa").json()["category"] == "Основы"
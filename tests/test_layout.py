@@ -0,0 +1,148 @@
+"""Раскладка графа: фоновый расчет, дораскладка, смена нумерации и работа без NumPy"""
+import threading
+import time
+
+import pytest
+
+import layout
+from database import Database
+from layout import GraphLayout
+from models import TermUpdate
+from storage import InMemoryStorage
+
+np = pytest.importorskip("numpy")
+
+
+def gated_runner():
+    """runner, который считает раскладку только после gate.set()"""
+    gate = threading.Event()
+
+    def runner(function, *args):
+        assert gate.wait(10)
+        return function(*args)
+
+    return gate, runner
+
+
+def snapshot_of(database: Database):
+    snapshot = database._current()
+    return snapshot.revision, snapshot.graph
+
+
+def test_small_change_moves_only_changed_node_and_neighbors():
+    database = Database(InMemoryStorage())
+    graph_layout = GraphLayout()
+    version, graph = snapshot_of(database)
+    graph_layout.compute(version, graph)
+    before = graph_layout.positions(version, graph)
+    assert before is not None and all(xy is not None for xy in before[:len(graph.nodes)])
+
+    database.update_term("pwa", TermUpdate(title="PWA"))
+    version, graph = snapshot_of(database)
+    graph_layout.compute(version, graph)
+    after = graph_layout.positions(version, graph)
+
+    symbols = graph.symbols
+    changed = symbols.find("pwa")
+    sources, targets = (np.frombuffer(numbers, dtype=np.int32) for numbers in graph.edge_numbers())
+    neighbors = set(targets[sources == changed].tolist()) | set(sources[targets == changed].tolist())
+    still = [symbols.find(term_id) for term_id in graph.nodes if symbols.find(term_id) not in neighbors | {changed}]
+    # Один измененный узел из 15 — дораскладка, а не новая раскладка целиком
+    assert still
+    assert [after[number] for number in still] == [before[number] for number in still]
+    assert after[changed] != before[changed]
+
+
+def test_renumbered_graph_gets_no_stale_coordinates():
+    graph_layout = GraphLayout()
+    version, graph = snapshot_of(Database(InMemoryStorage()))
+    graph_layout.compute(version, graph)
+
+    # Индексы другого экземпляра: те же id, но своя нумерация узлов
+    gate, runner = gated_runner()
+    other_layout = GraphLayout(runner=runner)
+    other_layout._state = graph_layout._state
+    other_version, other_graph = snapshot_of(Database(InMemoryStorage()))
+    assert other_graph.symbols is not graph.symbols
+    # Запрос со старого снимка и запрос новой версии до конца ее расчета
+    assert other_layout.positions(version - 1, other_graph) is None
+    assert other_layout.positions(version + 1, other_graph) is None
+    gate.set()
+    assert other_layout.wait(version + 1, 10)
+    positions = other_layout.positions(version + 1, other_graph)
+    assert positions is not None and all(xy is not None for xy in positions[:len(other_graph.nodes)])
+
+
+def test_positions_do_not_wait_for_layout():
+    gate, runner = gated_runner()
+    graph_layout = GraphLayout(runner=runner)
+    version, graph = snapshot_of(Database(InMemoryStorage()))
+    started = time.monotonic()
+    assert graph_layout.positions(version, graph) is None
+    assert time.monotonic() - started < 1
+    gate.set()
+    assert graph_layout.wait(version, 10)
+    assert graph_layout.version == version
+    assert graph_layout.positions(version, graph) is not None
+
+
+def test_failed_version_is_not_retried_on_every_request():
+    calls = []
+
+    def failing(function, *args):
+        calls.append(args)
+        raise RuntimeError("раскладка упала")
+
+    graph_layout = GraphLayout(runner=failing)
+    version, graph = snapshot_of(Database(InMemoryStorage()))
+    graph_layout.schedule(version, graph)
+    deadline = time.monotonic() + 10
+    while graph_layout._failed != version:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    for _ in range(3):
+        assert graph_layout.positions(version, graph) is None
+    time.sleep(0.1)
+    assert len(calls) == 1
+
+
+def test_without_numpy_coordinates_are_null(client, monkeypatch):
+    monkeypatch.setattr(layout, "np", None)
+    graph_layout = GraphLayout()
+    version, graph = snapshot_of(Database(InMemoryStorage()))
+    assert graph_layout.positions(version, graph) is None
+    assert graph_layout.version is None
+
+    response = client.get("/api/graph")
+    assert response.status_code == 200
+    nodes = response.json()["nodes"]
+    assert nodes and all(node["x"] is None and node["y"] is None for node in nodes)
+
+
+def test_endpoint_serves_previous_layout_until_new_one_is_ready(client, database):
+    gate, runner = gated_runner()
+    database.layout = GraphLayout(runner=runner)
+
+    # Раскладки еще нет — координаты null, ответ не ждет расчета
+    first = client.get("/api/graph")
+    assert all(node["x"] is None for node in first.json()["nodes"])
+    gate.set()
+    assert database.layout.wait(database.version, 10)
+
+    response = client.get("/api/graph", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200 and response.headers["ETag"] != first.headers["ETag"]
+    placed = {node["id"]: (node["x"], node["y"]) for node in response.json()["nodes"]}
+    assert all(x is not None for x, _ in placed.values())
+
+    # После записи — прежние координаты, у нового термина null до конца расчета
+    gate.clear()
+    assert client.post("/api/terms", json={"keyword": "hub", "title": "Хаб", "definition": "x",
+                                           "related_terms": ["pwa"]}).status_code == 201
+    nodes = {node["id"]: (node["x"], node["y"]) for node in client.get("/api/graph").json()["nodes"]}
+    assert nodes["hub"] == (None, None)
+    assert {term_id: xy for term_id, xy in nodes.items() if term_id != "hub"} == placed
+
+    gate.set()
+    assert database.layout.wait(database.version, 10)
+    nodes = {node["id"]: node["x"] for node in client.get("/api/graph").json()["nodes"]}
+    assert nodes["hub"] is not None
@@ -0,0 +1,122 @@
+"""Постраничный список /api/terms: курсоры, сортировки, фильтр и поля"""
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+
+def create(number: int, category="API", **fields):
+    term = {
+        "keyword": f"Item-{number:02d}",
+        "title": f"Элемент {(number * 7) % 13:02d}",
+        "definition": f"Определение {number}",
+        "category": category,
+        "related_terms": ["pwa"],
+    }
+    term.update(fields)
+    return {"op": "create", "term": term}
+
+
+def walk(client, **params):
+    """Все страницы по курсору: id по порядку и число запросов"""
+    ids, pages, cursor = [], 0, None
+    while True:
+        query = dict(params, fields="id")
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/api/terms", params=query)
+        assert response.status_code == 200
+        pages += 1
+        ids.extend(t["id"] for t in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            assert "Link" not in response.headers
+            return ids, pages
+        assert f"cursor={cursor}" in response.headers["Link"]
+
+
+@pytest.fixture
+def populated(client):
+    operations = [create(n, category=("API", "Дизайн", None)[n % 3]) for n in range(1, 24)]
+    assert client.post("/api/terms/batch", json={"operations": operations}).status_code == 200
+    client.post("/api/terms", json=create(30, title="Элемент 00")["term"])
+    terms = client.get("/api/terms", params={"limit": 1000, "fields": "id,title,category,created_at"}).json()
+    return client, terms
+
+
+@pytest.mark.parametrize("sort", ["id", "-id", "title", "-title", "created_at", "-created_at"])
+@pytest.mark.parametrize("category", [None, "API"])
+def test_cursor_walk_matches_full_order(populated, sort, category):
+    client, terms = populated
+    field = sort.lstrip("-")
+    selected = [t for t in terms if category is None or t["category"] == category]
+
+    def key(term):
+        value = datetime.fromisoformat(term[field]) if field == "created_at" else term[field]
+        return value, term["id"]
+
+    expected = [t["id"] for t in sorted(selected, key=key, reverse=sort.startswith("-"))]
+    params = {"limit": 5, "sort": sort}
+    if category:
+        params["category"] = category
+    ids, pages = walk(client, **params)
+    assert ids == expected
+    assert pages == len(expected) // 5 + 1
+
+
+def test_cursor_is_stable_under_inserts(populated):
+    client, terms = populated
+    first = client.get("/api/terms", params={"limit": 10, "fields": "id"})
+    seen = [t["id"] for t in first.json()]
+    # Термин перед курсором не появится, термин после — появится, повторов нет
+    client.post("/api/terms", json=create(0, keyword="aaa")["term"])
+    client.post("/api/terms", json=create(0, keyword="zzz")["term"])
+    client.delete(f"/api/terms/{seen[0]}")
+    rest, _ = walk(client, limit=10, cursor=first.headers["X-Next-Cursor"])
+    assert "aaa" not in rest and rest[-1] == "zzz"
+    assert not set(seen) & set(rest)
+    assert seen + rest[:-1] == sorted(t["id"] for t in terms)
+
+
+def cursor_of(value, term_id="pwa") -> str:
+    raw = json.dumps([value, term_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("sort, cursor", [
+    ("id", "garbage"),
+    ("id", "W1siYSJd"),
+    ("id", "bm90IGpzb24"),
+    ("id", cursor_of(5)),
+    ("id", cursor_of("a", 5)),
+    ("created_at", cursor_of("not a date")),
+    ("created_at", cursor_of(1700000000)),
+    # Дата с часовым поясом: хранимые даты без него
+    ("created_at", cursor_of("2024-01-01T00:00:00+03:00")),
+    ("-created_at", cursor_of("2024-01-01T00:00:00Z")),
+])
+def test_bad_cursor_is_400(client, sort, cursor):
+    assert client.get("/api/terms", params={"cursor": cursor, "sort": sort}).status_code == 400
+
+
+def test_handmade_naive_cursor_is_accepted(client):
+    response = client.get("/api/terms", params={"cursor": cursor_of("2000-01-01T00:00:00", ""),
+                                                 "sort": "created_at", "fields": "id"})
+    assert response.status_code == 200 and len(response.json()) == 15
+
+
+@pytest.mark.parametrize("sort", ["definition", "--id", "-", "id-"])
+def test_unknown_sort_is_400(client, sort):
+    assert client.get("/api/terms", params={"sort": sort}).status_code == 400
+
+
+def test_unknown_fields_are_400(client):
+    assert client.get("/api/terms", params={"fields": "id,secret"}).status_code == 400
+
+
+def test_fields_projection(client):
+    terms = client.get("/api/terms", params={"fields": "id, definition", "limit": 3}).json()
+    # Поля в порядке модели Term (id в ней после основных), а не запроса
+    assert [list(t) for t in terms] == [["definition", "id"]] * 3
+    assert list(client.get("/api/terms", params={"limit": 1}).json()[0]) == ["keyword", "title", "category", "id"]
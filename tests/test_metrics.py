@@ -0,0 +1,105 @@
+"""Метрики Prometheus: формат выдачи, суммирование по потокам и /metrics"""
+import threading
+
+import pytest
+
+from metrics import Registry, timed
+
+
+def samples(text: str):
+    """Строки выдачи без комментариев: имя с метками -> значение"""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    return values
+
+
+def test_counters_are_summed_across_threads():
+    registry = Registry()
+    counter = registry.counter("jobs_total", "Задания", ["kind"])
+
+    def work():
+        for _ in range(1000):
+            counter.inc(labels=("a",))
+        counter.inc(2, ("b",))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    text = registry.expose().decode()
+    assert "# HELP jobs_total Задания\n# TYPE jobs_total counter\n" in text
+    assert samples(text) == {'jobs_total{kind="a"}': 4000, 'jobs_total{kind="b"}': 8}
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("size_bytes", "Размер", ["route"], buckets=(10, 100))
+    for value in (5, 10, 50, 500):
+        histogram.observe(value, ("/x",))
+    assert samples(registry.expose().decode()) == {
+        'size_bytes_bucket{route="/x",le="10"}': 2,
+        'size_bytes_bucket{route="/x",le="100"}': 3,
+        'size_bytes_bucket{route="/x",le="+Inf"}': 4,
+        'size_bytes_sum{route="/x"}': 565,
+        'size_bytes_count{route="/x"}': 4,
+    }
+
+
+def test_labels_are_escaped_and_functions_read_on_expose():
+    registry = Registry()
+    gauge = registry.gauge("odd", "Метка с \\ и\nпереводом строки", ["value"])
+    gauge.inc(labels=('a"b\\c\nd',))
+    gauge.dec(3, ('a"b\\c\nd',))
+    state = {"value": 1}
+    registry.value_function("live", "Текущее значение", lambda: state["value"])
+    state["value"] = 7
+    text = registry.expose().decode()
+    assert "# HELP odd Метка с \\\\ и\\nпереводом строки" in text
+    assert 'odd{value="a\\"b\\\\c\\nd"} -2' in text
+    assert "live 7" in text
+
+
+def test_timed_records_failures_too():
+    registry = Registry()
+    histogram = registry.histogram("operation_seconds", "Время", ["operation"])
+
+    @timed(histogram, "fail")
+    def fail():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        fail()
+    assert samples(registry.expose().decode())['operation_seconds_count{operation="fail"}'] == 1
+
+
+@pytest.mark.parametrize("backend", ["memory"])
+def test_metrics_endpoint(client):
+    def current():
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        return samples(response.text)
+
+    before = current()
+    key = 'http_request_duration_seconds_count{method="GET",route="/api/terms/{keyword}",status="200"}'
+    missing = 'http_request_duration_seconds_count{method="GET",route="other",status="404"}'
+    assert client.get("/api/terms/pwa").status_code == 200
+    assert client.get("/no-such-page").status_code == 404
+    assert client.post("/api/terms", json={"keyword": "metered", "title": "Измеренный",
+                                           "definition": "x"}).status_code == 201
+    after = current()
+
+    # Маршрут — шаблоном, запросы мимо маршрутов — route="other"
+    assert after[key] == before.get(key, 0) + 1
+    assert after[missing] == before.get(missing, 0) + 1
+    health = client.get("/api/health").json()
+    assert after["glossary_terms"] == health["terms_count"]
+    assert after["glossary_data_version"] > before["glossary_data_version"]
+    assert after["write_requests_in_flight"] == 0
+    for name in ("repository_timeouts_total", "response_cache_hits_total", "process_resident_memory_bytes"):
+        assert name in after
+    assert any(name.startswith("storage_operation_duration_seconds_count{") for name in after)
@@ -0,0 +1,96 @@
+"""Восстановление хранилища snapshot после сбоя процесса: снимок плюс хвост журнала"""
+import os
+import subprocess
+import sys
+import textwrap
+
+from conftest import open_storage
+from database import Database
+from models import TermCreate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def crash_after_writes(directory, count: int) -> None:
+    """В отдельном процессе создать count терминов и упасть, не закрыв хранилище"""
+    script = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {ROOT!r})
+        from database import Database
+        from models import TermCreate
+        from storage import SnapshotStorage
+
+        storage = SnapshotStorage({str(directory / "glossary.snap")!r}, fsync=True, check_interval=3600)
+        database = Database(storage)
+        for number in range({count}):
+            database.create_term(TermCreate(
+                keyword=f"crash-{{number}}", title=f"Запись {{number}}", definition="до сбоя",
+                related_terms=["pwa"],
+            ))
+        os._exit(1)
+    """)
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=False, timeout=120)
+
+
+def crash_ids(database: Database):
+    return sorted(t.id for t in database.get_all_terms() if t.id.startswith("crash-"))
+
+
+def test_recovers_committed_writes_after_crash(tmp_path):
+    crash_after_writes(tmp_path, 3)
+    assert (tmp_path / "glossary.snap.journal").stat().st_size > 0
+
+    storage = open_storage("snapshot", tmp_path)
+    try:
+        database = Database(storage)
+        assert crash_ids(database) == ["crash-0", "crash-1", "crash-2"]
+        # Индексы построены по восстановленным данным
+        assert "crash-2" in database.graph.nodes
+        assert "crash-1" in {t.id for t in database.get_backlinks("pwa")}
+        assert "crash-1" in {t.id for t, _ in database.search("запись", 10)}
+        # Базовые термины не добавляются второй раз
+        assert database.count() == 15 + 3
+    finally:
+        storage.close()
+
+
+def test_truncated_journal_tail_is_dropped(tmp_path):
+    crash_after_writes(tmp_path, 3)
+    journal = tmp_path / "glossary.snap.journal"
+    # Сбой посреди записи последнего кадра
+    with open(journal, "r+b") as file:
+        file.truncate(journal.stat().st_size - 5)
+
+    storage = open_storage("snapshot", tmp_path)
+    try:
+        database = Database(storage)
+        assert crash_ids(database) == ["crash-0", "crash-1"]
+        revision = database.version
+        # Новый кадр пишется сразу за последним целым
+        database.create_term(TermCreate(keyword="after", title="После", definition="восстановления"))
+    finally:
+        storage.close()
+
+    storage = open_storage("snapshot", tmp_path)
+    try:
+        database = Database(storage)
+        assert crash_ids(database) == ["crash-0", "crash-1"]
+        assert database.get_term("after") is not None
+        assert database.version == revision + 1
+    finally:
+        storage.close()
+
+
+def test_corrupted_frame_stops_replay(tmp_path):
+    crash_after_writes(tmp_path, 3)
+    journal = tmp_path / "glossary.snap.journal"
+    data = bytearray(journal.read_bytes())
+    # Испорченный байт в последнем кадре: CRC не сходится, кадр не применяется
+    data[-3] ^= 0xFF
+    journal.write_bytes(bytes(data))
+
+    storage = open_storage("snapshot", tmp_path)
+    try:
+        assert crash_ids(Database(storage)) == ["crash-0", "crash-1"]
+    finally:
+        storage.close()
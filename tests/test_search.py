@@ -0,0 +1,98 @@
+"""Поиск: ранжирование по полям, префиксы, опечатки и обновление индекса"""
+import pytest
+
+from records import TermRecord
+from search import SearchIndex
+
+
+def record(term_id: str, title: str, definition: str) -> TermRecord:
+    return TermRecord(term_id, term_id, title, definition, None, None, 0, 0)
+
+
+@pytest.fixture
+def index() -> SearchIndex:
+    index = SearchIndex()
+    for term in [
+        record("cache", "Кэш", "Хранилище ответов для повторного использования"),
+        record("service-worker", "Service Worker", "Скрипт, который перехватывает запросы и работает с кэшем"),
+        record("manifest", "Манифест", "Описание приложения: имя, иконки, цвета"),
+        record("offline", "Офлайн", "Работа приложения без сети"),
+    ]:
+        index.add(term)
+    return index
+
+
+def ids(results):
+    return [term_id for term_id, _ in results]
+
+
+def test_keyword_outranks_definition(index):
+    results = index.search("кэш")
+    # Совпадение в ключевом слове и названии весит больше, чем в определении
+    assert ids(results) == ["cache", "service-worker"]
+    assert results[0][1] > results[1][1]
+
+
+def test_every_word_must_match(index):
+    assert ids(index.search("приложения сети")) == ["offline"]
+    assert index.search("приложения кэш") == []
+
+
+def test_prefix_matches_unfinished_word(index):
+    assert ids(index.search("манифе")) == ["manifest"]
+    assert ids(index.search("serv")) == ["service-worker"]
+    # Точное слово выше слова, найденного по префиксу
+    exact = index.search("кэш")[0][1]
+    prefix = index.search("кэ")[0][1]
+    assert prefix < exact
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("манифет", "manifest"),  # пропущена буква
+    ("маинфест", "manifest"),  # переставлены соседние буквы
+    ("оффлайн", "offline"),  # лишняя буква
+    ("servise", "service-worker"),  # замена буквы
+])
+def test_one_typo_is_tolerated(index, query, expected):
+    assert ids(index.search(query)) == [expected]
+
+
+def test_short_words_and_two_typos_do_not_match(index):
+    # Опечатки ищутся в словах от MIN_FUZZY_LENGTH букв; две опечатки — уже другое слово
+    assert index.search("кжш") == []
+    assert index.search("мафинет") == []
+
+
+def test_limit_and_empty_query(index):
+    assert len(index.search("приложения", limit=1)) == 1
+    assert index.search("") == []
+    assert index.search("!!!") == []
+
+
+def test_updates_and_removals_are_searchable(index):
+    index.add(record("cache", "Кэш браузера", "Копии ресурсов"))
+    assert ids(index.search("хранилище")) == []
+    assert ids(index.search("браузера")) == ["cache"]
+    index.remove("offline")
+    assert index.search("офлайн") == []
+
+
+def test_fork_does_not_change_published_index(index):
+    fork = index.fork()
+    fork.add(record("push", "Push-уведомления", "Сообщения от сервера"))
+    fork.remove("cache")
+    assert index.search("уведомления") == []
+    assert ids(index.search("кэш"))[0] == "cache"
+    assert ids(fork.search("уведомления")) == ["push"]
+    assert ids(fork.search("кэш")) == ["service-worker"]
+
+
+def test_endpoint_returns_scored_results(client):
+    response = client.get("/api/search", params={"q": "кэширование", "limit": 5})
+    assert response.status_code == 200
+    results = response.json()
+    assert 0 < len(results) <= 5
+    assert set(results[0]) == {"id", "keyword", "title", "category", "definition", "score"}
+    scores = [result["score"] for result in results]
+    assert scores == sorted(scores, reverse=True)
+    assert client.get("/api/search", params={"q": ""}).status_code == 422
@@ -0,0 +1,115 @@
+"""Одинаковое поведение бэкендов хранения: память, снимок с журналом и SQLite"""
+import pytest
+
+from conftest import open_storage
+from database import Database
+from models import BatchOperation, TermCreate, TermUpdate
+from storage import InMemoryStorage
+
+CATEGORIES = ("API", "Технология", None)
+
+
+def term(number: int, **fields) -> TermCreate:
+    data = {
+        "keyword": f"Term-{number:02d}",
+        "title": f"Термин {(number * 7) % 10} кэш",
+        "definition": f"Определение {number}: сервис воркер кэширует ответы",
+        "category": CATEGORIES[number % len(CATEGORIES)],
+        "related_terms": [f"term-{(number + 1) % 12:02d}", f"term-{(number * 5) % 12:02d}", "pwa"],
+    }
+    data.update(fields)
+    return TermCreate(**data)
+
+
+def apply_scenario(database: Database) -> None:
+    """Создание, правка, удаление со ссылками, импорт и пакет операций"""
+    for number in range(12):
+        database.create_term(term(number))
+    database.update_term("term-03", TermUpdate(category="API", related_terms=["term-04", "missing"]))
+    database.update_term("TERM-05", TermUpdate(title="Переименованный термин"))
+    database.delete_term("term-01")
+    database.delete_term("https")
+    database.import_terms([term(1, title="Вернулся"), term(2, definition="Новое определение")], mode="upsert")
+    database.apply_batch([
+        BatchOperation(op="create", term=term(20, related_terms=["term-01"])),
+        BatchOperation(op="update", keyword="term-20", changes=TermUpdate(source="https://example.com")),
+        BatchOperation(op="delete", keyword="term-07"),
+    ])
+
+
+def walk(database: Database, sort: str, category=None, limit: int = 4):
+    ids, cursor = [], None
+    while True:
+        terms, cursor = database.list_terms(limit, cursor, category, sort)
+        ids.extend(t.id for t in terms)
+        if cursor is None:
+            return ids
+
+
+def dump(database: Database):
+    """Все наблюдаемое состояние базы, кроме дат"""
+    graph = database.get_graph_data()
+    return {
+        "terms": [
+            (t.id, t.keyword, t.title, t.definition, t.source, t.category, list(t.related_terms))
+            for t in database.get_all_terms()
+        ],
+        "count": database.count(),
+        "pages": {
+            sort: walk(database, sort) for sort in ("id", "-id", "title", "-title")
+        },
+        "category_pages": walk(database, "title", category="API"),
+        "search": [(t.id, round(score, 6)) for t, score in database.search("кэш сервис", 50)],
+        "prefix_search": [t.id for t, _ in database.search("переимен", 10)],
+        "nodes": [node["id"] for node in graph["nodes"]],
+        "edges": sorted((edge["from"], edge["to"]) for edge in graph["edges"]),
+        "edge_count": database.graph.edge_count,
+        "categories": database.get_categories(),
+        "backlinks": [t.id for t in database.get_backlinks("pwa")],
+    }
+
+
+@pytest.fixture(scope="module")
+def reference():
+    database = Database(InMemoryStorage())
+    apply_scenario(database)
+    return dump(database)
+
+
+def test_backends_agree(database, reference):
+    apply_scenario(database)
+    assert dump(database) == reference
+
+
+def test_index_rebuild_matches_incremental(database):
+    apply_scenario(database)
+    incremental = dump(database)
+    database._snapshot = database._build_snapshot()
+    assert dump(database) == incremental
+
+
+@pytest.mark.parametrize("backend", ["snapshot", "sqlite"])
+def test_reopen_restores_data(backend, tmp_path):
+    storage = open_storage(backend, tmp_path)
+    database = Database(storage)
+    apply_scenario(database)
+    before, revision, epoch = dump(database), database.version, storage.epoch
+    storage.close()
+
+    storage = open_storage(backend, tmp_path)
+    try:
+        database = Database(storage)
+        assert dump(database) == before
+        assert (database.version, storage.epoch) == (revision, epoch)
+    finally:
+        storage.close()
+
+
+def test_missing_and_conflicts(database):
+    assert database.get_term("nothing") is None
+    assert database.update_term("nothing", TermUpdate(title="x")) is None
+    assert database.delete_term("nothing") is False
+    with pytest.raises(ValueError):
+        database.create_term(term(0, keyword="PWA"))
+    assert database.import_terms([term(0, keyword="pwa")], mode="skip") == ["skipped"]
+    assert database.import_terms([term(0, keyword="pwa")]) == ["conflict"]
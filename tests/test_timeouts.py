@@ -0,0 +1,119 @@
+"""Таймауты репозитория: 504, исход записи, место в допуске записей и health без ожидания записи"""
+import threading
+import time
+
+import pytest
+
+import main
+from admission import WriteAdmission
+from conftest import open_storage
+from database import Database
+from models import TermUpdate
+
+memory_only = pytest.mark.parametrize("backend", ["memory"])
+
+TERM = {"keyword": "slow", "title": "Медленный", "definition": "Проверка таймаута"}
+
+
+def eventually(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "условие не выполнилось"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+    yield gate
+    # Освобождаем потоки пула, даже если тест упал
+    gate.set()
+
+
+@pytest.fixture
+def limited(monkeypatch) -> WriteAdmission:
+    admission = WriteAdmission(rate=0, burst=0, max_concurrent=1)
+    monkeypatch.setattr(main, "write_admission", admission)
+    return admission
+
+
+def repository_of(client):
+    return main.app.dependency_overrides[main.get_repository]()
+
+
+@memory_only
+def test_slow_read_is_504(serve, database: Database, gate, monkeypatch):
+    get_term = database.get_term
+    monkeypatch.setattr(database, "get_term", lambda keyword: gate.wait(5) and get_term(keyword))
+    with serve(database, read_timeout=0.2) as client:
+        response = client.get("/api/terms/pwa")
+        assert response.status_code == 504
+        assert "outcome" not in response.json()
+        assert repository_of(client).timeouts == 1
+        # Остальные запросы не ждут зависшую операцию
+        assert client.get("/api/health").status_code == 200
+        gate.set()
+
+
+@memory_only
+def test_started_write_keeps_slot_until_it_finishes(serve, database: Database, gate, limited, monkeypatch):
+    create_term = database.create_term
+    monkeypatch.setattr(database, "create_term", lambda term: gate.wait(5) and create_term(term))
+    with serve(database, write_timeout=0.2) as client:
+        response = client.post("/api/terms", json=TERM)
+        assert response.status_code == 504
+        assert response.json()["outcome"] == "unknown"
+        # Запись еще выполняется: место занято, новая запись — 503
+        assert limited.in_flight == 1
+        assert client.put("/api/terms/pwa", json={"title": "PWA"}).status_code == 503
+
+        gate.set()
+        eventually(lambda: limited.in_flight == 0)
+        # Запись, получившая 504, все же применилась
+        assert client.get("/api/terms/slow").status_code == 200
+        assert client.put("/api/terms/pwa", json={"title": "PWA"}).status_code == 200
+
+
+@memory_only
+def test_queued_write_is_cancelled(serve, database: Database, gate, limited):
+    with serve(database, threads=1, write_timeout=0.2) as client:
+        # Единственный поток пула занят
+        repository_of(client)._executor.submit(gate.wait, 5)
+        response = client.post("/api/terms", json=TERM)
+        assert response.status_code == 504
+        assert response.json()["outcome"] == "not_applied"
+        assert limited.in_flight == 0
+
+        gate.set()
+        assert client.get("/api/terms/slow").status_code == 404
+        assert client.post("/api/terms", json=TERM).status_code == 201
+
+
+def test_health_does_not_wait_for_write_lock(tmp_path, serve, gate):
+    database = Database(open_storage("sqlite", tmp_path))
+    other = Database(open_storage("sqlite", tmp_path))
+    held = threading.Event()
+
+    def hold_write_lock():
+        # Долгая запись или перестройка индексов этого воркера
+        with database._write_lock:
+            held.set()
+            gate.wait(5)
+
+    try:
+        with serve(database, read_timeout=1) as client:
+            version = client.get("/api/health").json()
+            # Другой воркер изменил данные: догонять их пришлось бы под блокировкой
+            other.update_term("pwa", TermUpdate(title="PWA"))
+            holder = threading.Thread(target=hold_write_lock)
+            holder.start()
+            assert held.wait(5)
+            started = time.monotonic()
+            response = client.get("/api/health")
+            assert response.status_code == 200 and response.json() == version
+            assert client.get("/metrics").status_code == 200
+            assert time.monotonic() - started < 1
+            gate.set()
+            holder.join(5)
+    finally:
+        other.storage.close()